@@ -295,6 +295,13 @@ _default_values = {'positions': ((3,), world_point_type, 'positions',
                                  ArrayTypeDivideOnSplit),
                    'partition_coeff': ((), np.float64, 'partition_coeff', 0),
                    'droplet_avg_size': ((), np.float64, 'droplet_avg_size', 0),
+
+                   # the grid cell each element was found in the last time
+                   # it was located on the current / wind grid -- where the
+                   # next search starts. -1 if not known.
+                   'current_cell_hint': ((), np.int32, 'current_cell_hint',
+                                         -1),
+                   'wind_cell_hint': ((), np.int32, 'wind_cell_hint', -1),
                    }
 
 
@@ -273,12 +273,17 @@ cdef class CyCatsMover(CyCurrentMover):
         :returns: none
         """
         cdef OSErr err
-
-        N = len(ref_points)
-
-        err = self.cats.get_move(N, model_time, step_len,
-                                 &ref_points[0], &delta[0], &LE_status[0],
-                                 spill_type, 0)
+        cdef int N = len(ref_points)
+        cdef unsigned long c_time = model_time
+        cdef unsigned long c_step_len = step_len
+        cdef WorldPoint3D *ref = &ref_points[0]
+        cdef WorldPoint3D *c_delta = &delta[0]
+        cdef short *status = <short *>&LE_status[0]
+
+        # the C++ code only works on the arrays passed in
+        with nogil:
+            err = self.cats.get_move(N, c_time, c_step_len, ref, c_delta,
+                                     status, spill_type, 0)
         if err == 1:
             raise ValueError('Make sure numpy arrays for ref_points, delta, '
                              'and windages are defined')
@@ -6,6 +6,7 @@ have crossed land on the raster map
 """
 
 import cython
+from cython.parallel import prange
 
 import numpy as np
 from gnome.utilities.geometry.cy_point_in_polygon import points_in_poly
@@ -41,7 +42,7 @@ cdef int32_t c_overlap_grid(int32_t m,
                             int32_t y1,
                             int32_t x2,
                             int32_t y2,
-                            ):
+                            ) nogil:
     """
     check if the line segment from pt1 to pt could overlap the grid of
     size (m,n).
@@ -74,7 +75,7 @@ cdef bool c_find_first_pixel( uint8_t* grid,
                              int32_t *prev_y,
                              int32_t *hit_x,
                              int32_t *hit_y,
-                             ):
+                             ) nogil:
     """
     Marches along the grid to see if the LE movement crosses land
     
@@ -157,7 +158,9 @@ cdef bool c_find_first_pixel( uint8_t* grid,
                     pt1_y = y0-sy
                     pt2_x = x0-sx
                     pt2_y = y0
-                    try: # replace with real check???
+                    # the adjacent points may be off the grid
+                    if (pt1_y >= 0 and pt1_y < n and
+                        pt2_x >= 0 and pt2_x < m):
                         if ( (grid[pt1_x * n + pt1_y] == 1) and #is the y-adjacent point on land?
                              (grid[pt2_x * n + pt2_y] == 1)     #is the x-adjacent point on land?
                             ):
@@ -165,8 +168,6 @@ cdef bool c_find_first_pixel( uint8_t* grid,
                             hit_y[0] = pt1_y # we have to pick one -- this is arbitrary
                             #return (*prev_x, *prev_y), (*hit_x, *hit_y)
                             return True
-                    except IndexError:
-                        pass
 
     # if we get here, no hit
     return False
@@ -286,6 +287,96 @@ def check_land(cnp.ndarray[uint8_t, ndim=2, mode='c'] grid not None,
                 positions[i, 1] = end_positions[i, 1]
         return None
 
+cdef bool c_in_water_cell(uint8_t* grid,
+                          int32_t m,
+                          int32_t n,
+                          int32_t ratio,
+                          int32_t* pos,
+                          int32_t* end_pos,
+                          ) nogil:
+    """
+    returns True if the start and end positions are in the same cell of a
+    coarse grid, and that cell is water (or off the grid), so the LE can't
+    have hit land.
+    """
+    cdef int32_t x0 = div(pos[0], ratio).quot
+    cdef int32_t y0 = div(pos[1], ratio).quot
+
+    if x0 != div(end_pos[0], ratio).quot or y0 != div(end_pos[1], ratio).quot:
+        return False
+
+    if x0 < 0 or x0 >= m or y0 < 0 or y0 >= n:
+        return True
+
+    return grid[x0 * n + y0] == 0
+
+
+cdef void c_check_le_layers(uint8_t** grids,
+                            int32_t* widths,
+                            int32_t* heights,
+                            int32_t* ratios,
+                            int32_t num_ratios,
+                            int32_t* pos,
+                            int32_t* end_pos,
+                            int16_t* status_code,
+                            int32_t* last_water_pos,
+                            ) nogil:
+    """
+    land-check a single LE, walking down the layers from the coarsest.
+
+    pos, end_pos, status_code and last_water_pos point to the data of
+    the LE, and are altered in place.
+    """
+    cdef int32_t prev_x, prev_y, hit_x, hit_y, ratio
+    cdef int32_t layer = 0
+    cdef bool did_hit
+
+    if status_code[0] == type_defs.OILSTAT_ONLAND:
+        return
+
+    # cheap pre-pass: if the LE starts and ends in the same water-only
+    # square on the coarsest grid, it can't hit land
+    if c_in_water_cell(grids[0], widths[0], heights[0], ratios[0],
+                       pos, end_pos):
+        pos[0] = end_pos[0]
+        pos[1] = end_pos[1]
+        return
+
+    #begin the walk. If a hit is registered on the current grid, drop down one level and continue the walk.
+    #If a hit is registered on the lowest level, then LE has landed.
+    while True:
+        ratio = ratios[layer]
+        did_hit = c_find_first_pixel(grids[layer],
+                                     widths[layer],
+                                     heights[layer],
+                                     div(pos[0], ratio).quot,
+                                     div(pos[1], ratio).quot,
+                                     div(end_pos[0], ratio).quot,
+                                     div(end_pos[1], ratio).quot,
+                                     &prev_x,
+                                     &prev_y,
+                                     &hit_x,
+                                     &hit_y,
+                                     )
+        if did_hit:
+            if layer == num_ratios - 1:
+                # hit on the lowest layer (confirmed land hit)
+                last_water_pos[0] = prev_x
+                last_water_pos[1] = prev_y
+                end_pos[0] = hit_x
+                end_pos[1] = hit_y
+                status_code[0] = type_defs.OILSTAT_ONLAND
+                return
+            else:
+                # possible hit, go down a layer and try again
+                layer += 1
+        else:
+            # didn't hit land -- can move the LE
+            pos[0] = end_pos[0]
+            pos[1] = end_pos[1]
+            return
+
+
 ## called by a method in gnome.map.RasterMap class
 @cython.boundscheck(False)
 @cython.wraparound(False)
@@ -294,7 +385,9 @@ def check_land_layers(grid_layers,
                 cnp.ndarray[int32_t, ndim=2, mode='c'] positions,
                 cnp.ndarray[int32_t, ndim=2, mode='c'] end_positions,
                 cnp.ndarray[int16_t, ndim=1, mode='c'] status_codes,
-                cnp.ndarray[int32_t, ndim=2, mode='c'] last_water_positions):
+                cnp.ndarray[int32_t, ndim=2, mode='c'] last_water_positions,
+                int num_threads=0,
+                int chunk_size=256):
         """
         do the actual land-checking
 
@@ -304,82 +397,65 @@ def check_land_layers(grid_layers,
         
         This version will look through multiple layers of raster map
 
+        The walks of the LEs are independent, so they are done without the
+        GIL, in chunks of chunk_size LEs spread over num_threads threads.
+        num_threads=0 uses the OpenMP default (usually the number of cores),
+        num_threads=1 does them all in the calling thread. If the extension
+        was built without OpenMP, it is always single threaded.
         """
-        cdef int32_t  prev_x, prev_y, hit_x, hit_y, cur_ratio, layer, coarse_pos_x, num_ratios
-        cdef uint32_t i, num_le
-        cdef int32_t m, n
-        cdef bool did_hit
-        cdef int32_t* coarse_pos = <int32_t*> PyMem_Malloc (2*sizeof(int32_t))
-        cdef int32_t* coarse_end = <int32_t*> PyMem_Malloc (2*sizeof(int32_t))
+        cdef Py_ssize_t i, num_le
+        cdef int32_t num_ratios
 
+        num_le = positions.shape[0]
         num_ratios = grid_ratios.shape[0]
+
+        if num_le == 0:
+            return
+
         cdef uint8_t** dataptrs = <uint8_t**> PyMem_Malloc(num_ratios*sizeof(uint8_t *))
         cdef int32_t* widths = <int32_t*> PyMem_Malloc(num_ratios*sizeof(int32_t))
         cdef int32_t* heights = <int32_t*> PyMem_Malloc(num_ratios*sizeof(int32_t))
 
-        cdef cnp.ndarray[uint8_t, ndim=2, mode="c"] grid_arr
-        for i in range(num_ratios):
-            grid_arr = grid_layers[i]
-            widths[i] = grid_layers[i].shape[0]
-            heights[i] = grid_layers[i].shape[1]
-            dataptrs[i] = &grid_arr[0,0]
-
-        num_le = positions.shape[0]
-
-        for i in range(num_le):
-            #if the LE is on land, or if it starts and ends in the same water-only square on the coarsest grid, skip this LE
-            if status_codes[i] == type_defs.OILSTAT_ONLAND:
-                continue
+        cdef int32_t* ratios = &grid_ratios[0]
+        cdef int32_t* pos = &positions[0, 0]
+        cdef int32_t* end_pos = &end_positions[0, 0]
+        cdef int16_t* codes = &status_codes[0]
+        cdef int32_t* last_water = &last_water_positions[0, 0]
 
-            layer = 0
-            #begin the walk. If a hit is registered on the current grid, drop down one level and continue the walk.
-            #If a hit is registered on the lowest level, then LE has landed.
-            while True:
-                coarse_pos[0] = div(positions[i,0], grid_ratios[layer]).quot
-                coarse_pos[1] = div(positions[i,1], grid_ratios[layer]).quot
-                coarse_end[0] = div(end_positions[i,0], grid_ratios[layer]).quot
-                coarse_end[1] = div(end_positions[i,1], grid_ratios[layer]).quot
-                cur_ratio = grid_ratios[layer]
-                did_hit = c_find_first_pixel(dataptrs[layer],
-                                         widths[layer],
-                                         heights[layer],
-                                         coarse_pos[0],
-                                         coarse_pos[1],
-                                         coarse_end[0],
-                                         coarse_end[1],
-                                         &prev_x,
-                                         &prev_y,
-                                         &hit_x,
-                                         &hit_y,
-                                         )
-                if did_hit:
-                    if layer == num_ratios - 1:
-                        # hit on the lowest layer (confirmed land hit)
-                        last_water_positions[i, 0] = prev_x
-                        last_water_positions[i, 1] = prev_y
-                        end_positions[i,0] = hit_x
-                        end_positions[i,1] = hit_y
-                        status_codes[i] = type_defs.OILSTAT_ONLAND
-                        break
-                    else:
-                        # possible hit, go down a layer and try again
-                        layer += 1
-                        coarse_pos[0] = div(positions[i,0], grid_ratios[layer]).quot
-                        coarse_pos[1] = div(positions[i,1], grid_ratios[layer]).quot
-                        coarse_end[0] = div(end_positions[i,0], grid_ratios[layer]).quot
-                        coarse_end[1] = div(end_positions[i,1], grid_ratios[layer]).quot
+        cdef cnp.ndarray[uint8_t, ndim=2, mode="c"] grid_arr
+        try:
+            for i in range(num_ratios):
+                grid_arr = grid_layers[i]
+                widths[i] = grid_layers[i].shape[0]
+                heights[i] = grid_layers[i].shape[1]
+                dataptrs[i] = &grid_arr[0,0]
+
+            with nogil:
+                if num_threads == 1:
+                    for i in range(num_le):
+                        c_check_le_layers(dataptrs, widths, heights,
+                                          ratios, num_ratios,
+                                          &pos[2 * i], &end_pos[2 * i],
+                                          &codes[i], &last_water[2 * i])
+                elif num_threads > 1:
+                    for i in prange(num_le, num_threads=num_threads,
+                                    schedule='dynamic', chunksize=chunk_size):
+                        c_check_le_layers(dataptrs, widths, heights,
+                                          ratios, num_ratios,
+                                          &pos[2 * i], &end_pos[2 * i],
+                                          &codes[i], &last_water[2 * i])
                 else:
-                    # didn't hit land -- can move the LE
-                    positions[i, 0] = end_positions[i, 0]
-                    positions[i, 1] = end_positions[i, 1]
-                    break
-
-        PyMem_Free(coarse_pos)
-        PyMem_Free(coarse_end)
-        PyMem_Free(dataptrs)
-        PyMem_Free(widths)
-        PyMem_Free(heights)
-        
+                    for i in prange(num_le,
+                                    schedule='dynamic', chunksize=chunk_size):
+                        c_check_le_layers(dataptrs, widths, heights,
+                                          ratios, num_ratios,
+                                          &pos[2 * i], &end_pos[2 * i],
+                                          &codes[i], &last_water[2 * i])
+        finally:
+            PyMem_Free(dataptrs)
+            PyMem_Free(widths)
+            PyMem_Free(heights)
+
         
 def move_particles(cnp.ndarray[cnp.float64_t, ndim=2, mode='c'] positions not None,
                  cnp.ndarray[cnp.float64_t, ndim=2, mode='c'] end_positions not None,
@@ -22,6 +22,7 @@ from wind import Wind, WindSchema, constant_wind, wind_from_values
 from running_average import RunningAverage, RunningAverageSchema
 from gridded_objects_base import PyGrid, GridSchema
 from grid import Grid
+from snapshot import EnvironmentSnapshot
 # from gnome.environment.environment_objects import IceAwareCurrentSchema
 
 
@@ -50,5 +51,6 @@ __all__ = [Environment,
            IceAwareWind,
            TemperatureTS,
            env_from_netCDF,
-           ice_env_from_netCDF
+           ice_env_from_netCDF,
+           EnvironmentSnapshot
            ]
@@ -1,3 +1,4 @@
+import os
 import datetime
 import StringIO
 import copy
@@ -10,6 +11,10 @@ from colander import (SchemaNode, SequenceSchema,
 import gridded
 
 from gnome.utilities import serializable
+from gnome.utilities.time_slice_cache import TimeSliceCache
+from gnome.utilities.cell_hints import HintedCellTree, cell_hints
+from gnome.utilities.plan_cache import InterpolationPlanCache
+from gnome.utilities.cell_lookup import CellLookupTable
 from gnome.persist import base_schema
 
 
@@ -106,7 +111,68 @@ class Time(gridded.time.Time, serializable.Serializable):
             fd.write(t.strftime('%c') + '\n')
 
 
-class Grid_U(gridded.grids.Grid_U, serializable.Serializable):
+class PlanCachingGrid(object):
+    """
+    Mixin for the grids: the face indexes and interpolation weights of a
+    set of points are kept by the grid, so all the variables on it use the
+    same ones, rather than each locating the points again.
+    """
+    plan_cache_size = 8
+
+    @property
+    def plan_cache(self):
+        if getattr(self, '_plan_cache', None) is None:
+            self._plan_cache = InterpolationPlanCache(self.plan_cache_size)
+
+        return self._plan_cache
+
+    def _cached_plan(self, name, points, args, kwargs):
+        compute = getattr(super(PlanCachingGrid, self), name)
+        points = np.asarray(points)
+
+        if points.ndim < 2:
+            # a single point -- not worth the hash
+            return compute(points, *args, **kwargs)
+
+        # with cell hints set, a cached plan doesn't update the hints --
+        # they are just a bit staler next time.
+        return self.plan_cache.get(name, points, args, kwargs,
+                                   lambda: compute(points, *args, **kwargs))
+
+    def locate_faces(self, points, *args, **kwargs):
+        return self._cached_plan('locate_faces', points, args, kwargs)
+
+    def interpolation_alphas(self, points, *args, **kwargs):
+        return self._cached_plan('interpolation_alphas', points, args, kwargs)
+
+
+class CellLookupGrid(object):
+    """
+    Mixin for the grids: optionally locate the points with a
+    CellLookupTable rather than the cell tree.
+
+    The table is saved next to the grid file, if it can be, and loaded
+    from there next time.
+    """
+    use_cell_lookup = False
+
+    def _cell_lookup_path(self, name):
+        filename = getattr(self, 'filename', None)
+
+        if isinstance(filename, basestring) and os.path.isfile(filename):
+            return '{0}.{1}_lookup'.format(filename, name)
+        else:
+            return None
+
+    def _attach_cell_lookup(self, tree, nodes, faces, name):
+        'add a lookup table to a HintedCellTree, if use_cell_lookup is set'
+        if self.use_cell_lookup and tree.lookup is None:
+            tree.lookup = CellLookupTable.for_grid(
+                nodes, faces, self._cell_lookup_path(name))
+
+
+class Grid_U(CellLookupGrid, PlanCachingGrid, gridded.grids.Grid_U,
+             serializable.Serializable):
 
     _state = copy.deepcopy(serializable.Serializable._state)
     _schema = GridSchema
@@ -139,6 +205,40 @@ class Grid_U(gridded.grids.Grid_U, serializable.Serializable):
 
         return rv
 
+    def build_celltree(self, *args, **kwargs):
+        super(Grid_U, self).build_celltree(*args, **kwargs)
+
+        if not isinstance(self._tree, HintedCellTree):
+            self._tree = HintedCellTree(self._tree, self.nodes, self.faces)
+
+        self._attach_cell_lookup(self._tree, self.nodes, self.faces, 'face')
+
+    def build_cell_lookup(self):
+        """
+        locate the points with a CellLookupTable from now on
+        """
+        self.use_cell_lookup = True
+
+        if getattr(self, '_tree', None) is None:
+            self.build_celltree()
+        else:
+            self._attach_cell_lookup(self._tree, self.nodes, self.faces,
+                                     'face')
+
+    def cell_hints(self, hints):
+        """
+        context manager: locate points near the cells in hints first.
+
+        :param hints: per element array of face indexes, -1 if not known.
+                      It is updated with the faces found.
+
+        Only used for arrays of points the same length as hints.
+        """
+        if getattr(self, '_tree', None) is None:
+            self.build_celltree()
+
+        return cell_hints([self._tree], hints)
+
     def get_cells(self):
         return self.nodes[self.faces]
 
@@ -173,7 +273,8 @@ class Grid_U(gridded.grids.Grid_U, serializable.Serializable):
         return json_
 
 
-class Grid_S(gridded.grids.Grid_S, serializable.Serializable):
+class Grid_S(CellLookupGrid, PlanCachingGrid, gridded.grids.Grid_S,
+             serializable.Serializable):
 
     _state = copy.deepcopy(serializable.Serializable._state)
     _schema = GridSchema
@@ -216,6 +317,45 @@ class Grid_S(gridded.grids.Grid_S, serializable.Serializable):
 
         return rv
 
+    def build_celltree(self, grid='node', *args, **kwargs):
+        super(Grid_S, self).build_celltree(grid, *args, **kwargs)
+
+        tree, nodes, faces = self._cell_trees[grid][:3]
+        if not isinstance(tree, HintedCellTree):
+            tree = HintedCellTree(tree, nodes, faces)
+            self._cell_trees[grid] = ((tree,) +
+                                      tuple(self._cell_trees[grid][1:]))
+
+        self._attach_cell_lookup(tree, nodes, faces, grid)
+
+    def build_cell_lookup(self):
+        """
+        locate the points with CellLookupTables from now on -- one per grid
+        of the staggered grid
+        """
+        self.use_cell_lookup = True
+
+        if 'node' not in getattr(self, '_cell_trees', {}):
+            self.build_celltree('node')
+
+        for grid, cell_tree in self._cell_trees.items():
+            self._attach_cell_lookup(*(cell_tree[:3] + (grid,)))
+
+    def cell_hints(self, hints):
+        """
+        context manager: locate points near the cells in hints first.
+
+        :param hints: per element array of face indexes, -1 if not known.
+                      It is updated with the faces found.
+
+        Only the node grid uses the hints -- the face indexes of the other
+        grids of a staggered grid don't match.
+        """
+        if 'node' not in getattr(self, '_cell_trees', {}):
+            self.build_celltree('node')
+
+        return cell_hints([self._cell_trees['node'][0]], hints)
+
     def get_cells(self):
         if not hasattr(self, '_cell_trees'):
             self.build_celltree()
@@ -400,6 +540,61 @@ class Variable(gridded.Variable, serializable.Serializable):
                                      'grid': PyGrid,
                                      'depth': Depth})
 
+    # number of time slices of the data kept in memory
+    time_cache_size = 4
+
+    def __init__(self, *args, **kwargs):
+        """
+        Same as gridded.Variable, plus:
+
+        :param time_cache_size: number of decoded time slices of the data
+                                to keep in memory. 0 to read them from the
+                                file every time.
+        :type time_cache_size: int
+        """
+        self.time_cache_size = kwargs.pop('time_cache_size',
+                                          self.time_cache_size)
+
+        super(Variable, self).__init__(*args, **kwargs)
+
+        self._init_time_cache()
+
+    def _init_time_cache(self):
+        """
+        wrap the data in a TimeSliceCache, if it is read from a file and
+        has more than one time
+        """
+        data = getattr(self, 'data', None)
+
+        if (self.time_cache_size > 0 and
+                data is not None and
+                not isinstance(data, (np.ndarray, TimeSliceCache)) and
+                self.time is not None and
+                len(self.time.data) > 1 and
+                len(getattr(data, 'shape', ())) > 1 and
+                data.shape[0] == len(self.time.data)):
+            self.data = TimeSliceCache(data, max_slices=self.time_cache_size)
+
+    @property
+    def time_cache(self):
+        """
+        The TimeSliceCache of the data -- it has the hit and miss counters
+        in cache_info. None if the data is not cached.
+        """
+        data = getattr(self, 'data', None)
+
+        return data if isinstance(data, TimeSliceCache) else None
+
+    def at_times(self, points, times, *args, **kwargs):
+        '''
+        the results of at() for each of the times, stacked -- a TxNx1 array
+
+        The points are located once: the face indexes and interpolation
+        weights are in the grid's plan cache after the first time, and the
+        time slices in the time slice cache.
+        '''
+        return _stack_times(self, points, times, *args, **kwargs)
+
     @classmethod
     def new_from_dict(cls, dict_):
         if 'data' not in dict_:
@@ -444,30 +639,123 @@ class VectorVariable(gridded.VectorVariable, serializable.Serializable):
 
         return super(VectorVariable, cls).new_from_dict(dict_)
 
-    def get_data_vectors(self):
+    @property
+    def time_cache_info(self):
+        """
+        cache_info of the time slice caches of the component variables,
+        in the order of the variables. None for the ones that aren't cached.
+        """
+        return [v.time_cache.cache_info
+                if getattr(v, 'time_cache', None) is not None else None
+                for v in self.variables]
+
+    def at_times(self, points, times, *args, **kwargs):
         '''
-        return array of shape (time_slices, len_linearized_data,2)
-        first is magnitude, second is direction
+        the results of at() for each of the times, stacked -- a TxNxk array.
+        See Variable.at_times()
         '''
-        raw_u = self.variables[0].data[:]
-        raw_v = self.variables[1].data[:]
+        return _stack_times(self, points, times, *args, **kwargs)
+
+    @property
+    def num_data_slices(self):
+        'number of time slices of the data'
+        return len(self.variables[0].data)
+
+    def get_data_vector(self, time_index, stride=1):
+        '''
+        return array of shape (2, len_linearized_data) of the u and v of
+        one time slice, as float32. Only that slice is read.
+
+        :param time_index: index of the time slice. Negative indexes count
+                           from the end.
+
+        :param stride=1: decimation -- every stride'th point of the grid,
+                         in each direction for a structured grid.
+        '''
+        num_slices = self.num_data_slices
+        if not -num_slices <= time_index < num_slices:
+            raise IndexError('time index {0} out of range for {1} time slices'
+                             .format(time_index, num_slices))
+
+        raw_u = self.variables[0].data[time_index]
+        raw_v = self.variables[1].data[time_index]
 
         if self.depth is not None:
-            raw_u = raw_u[:, self.depth.surface_index]
-            raw_v = raw_v[:, self.depth.surface_index]
+            raw_u = raw_u[self.depth.surface_index]
+            raw_v = raw_v[self.depth.surface_index]
 
         if np.any(np.array(raw_u.shape) != np.array(raw_v.shape)):
             # must be roms-style staggered
-            raw_u = (raw_u[:, 0:-1, :] + raw_u[:, 1:, :]) / 2
-            raw_v = (raw_v[:, :, 0:-1] + raw_v[:, :, 1:]) / 2
+            raw_u = (raw_u[0:-1, :] + raw_u[1:, :]) / 2
+            raw_v = (raw_v[:, 0:-1] + raw_v[:, 1:]) / 2
+
+        if stride > 1:
+            decimate = (slice(None, None, stride),) * raw_u.ndim
+            raw_u = raw_u[decimate]
+            raw_v = raw_v[decimate]
+
+        r = np.empty((2, raw_u.size), dtype=np.float32)
+        r[0] = np.ravel(raw_u)
+        r[1] = np.ravel(raw_v)
+
+        return r
 
-        raw_u = raw_u.reshape(raw_u.shape[0], -1)
-        raw_v = raw_v.reshape(raw_v.shape[0], -1)
-        r = np.stack((raw_u, raw_v))
+    def iter_data_vectors(self, stride=1, start=0, stop=None):
+        '''
+        generator of the arrays of shape (2, len_linearized_data) of each
+        time slice from start up to stop, as get_data_vector() returns
+        them. Only one time slice is in memory at a time.
+        '''
+        for time_index in range(*slice(start, stop)
+                                .indices(self.num_data_slices)):
+            yield self.get_data_vector(time_index, stride=stride)
 
-        return np.ascontiguousarray(r, np.float32)
+    def get_data_vectors(self, stride=1):
+        '''
+        return array of shape (2, time_slices, len_linearized_data) of the
+        u and v of all the time slices, as float32.
+
+        The data is read one time slice at a time, so only the float32
+        result is held in memory, not the whole of the raw data. With no
+        time slices it is an empty (2, 0, len_linearized_data) array.
+        '''
+        r = np.empty((2, self.num_data_slices, self._data_vector_size(stride)),
+                     dtype=np.float32)
+
+        for time_index, vector in enumerate(self.iter_data_vectors(stride)):
+            r[:, time_index] = vector
+
+        return r
+
+    def _data_vector_size(self, stride=1):
+        '''
+        len_linearized_data of get_data_vector(), from the shapes of the
+        data -- nothing is read
+        '''
+        u_shape = self.variables[0].data.shape[1:]
+        v_shape = self.variables[1].data.shape[1:]
+
+        if self.depth is not None:
+            u_shape = u_shape[1:]
+            v_shape = v_shape[1:]
+
+        if u_shape != v_shape:
+            # roms-style staggered -- averaged to the centers
+            u_shape = (u_shape[0] - 1,) + u_shape[1:]
+
+        if stride > 1:
+            u_shape = [-(-n // stride) for n in u_shape]
+
+        return int(np.prod(u_shape))
 
     def get_metadata(self):
         json_ = {}
         json_['data_location'] = self.grid.infer_location(self.variables[0].data)
         return json_
+
+
+def _stack_times(obj, points, times, *args, **kwargs):
+    'obj.at() at each of the times, as a TxNxk array'
+    return np.stack([obj.at(points, t, *args, **kwargs)
+                     .reshape(len(points), -1)
+                     for t in times])
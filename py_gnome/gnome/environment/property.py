@@ -127,6 +127,23 @@ class EnvProp(serializable.Serializable):
         '''
         raise NotImplementedError()
 
+    def at_times(self, points, times, *args, **kwargs):
+        '''
+        Find the value of the property at positions P at each of the
+        times T
+
+        :param points: Coordinates to be queried (P)
+        :param times: The times at which to query these points (T)
+        :type times: sequence of datetime.datetime objects
+
+        Other arguments are as for at().
+
+        :return: the results of at() for each time, stacked -- a TxNx1
+                 array
+        '''
+        return np.stack([self.at(points, t, *args, **kwargs)
+                         for t in times])
+
     def in_units(self, unit):
         '''
         Returns a full cpy of this property in the units specified.
@@ -300,3 +317,14 @@ class VectorProp(serializable.Serializable):
         '''
         return np.column_stack([var.at(*args, **kwargs)
                                 for var in self.variables])
+
+    def at_times(self, points, times, *args, **kwargs):
+        '''
+            Find the value of the property at positions P at each of the
+            times T -- see EnvProp.at_times()
+
+            :return: returns a TxNx2 array of interpolated values
+        '''
+        return np.concatenate([var.at_times(points, times, *args, **kwargs)
+                               .reshape(len(times), len(points), -1)
+                               for var in self.variables], axis=-1)
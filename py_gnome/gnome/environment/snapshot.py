@@ -0,0 +1,181 @@
+'''
+The environment values used by the weatherers during one time step.
+
+Each weatherer gets the wind speed, waves and water properties it needs on
+its own, for every weathering substep, though they are the same for all
+the weatherers at a given time and set of positions. The model keeps an
+EnvironmentSnapshot that computes each of them once per (substep time,
+positions), and clears it at the start of each time step.
+
+The model also gives the snapshot the times of the weathering substeps, so
+the wind speed at a set of positions is computed for all of them with one
+at_times() call.
+
+The forecast and uncertain containers can be weathered at the same time
+(see Model.concurrent_containers), so the values are looked up and added
+with a lock.
+'''
+import threading
+
+import numpy as np
+
+from gnome.utilities.plan_cache import InterpolationPlanCache
+
+
+class EnvironmentSnapshot(object):
+    '''
+    Values computed from the environment objects, keyed by the object, the
+    name of the value, the model time and the positions. All values are in
+    SI units.
+
+    Arrays are returned as copies, as some weatherers modify them.
+    '''
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+        # the weathering substep times of the time step
+        self.times = []
+
+    def __getstate__(self):
+        'the values and the lock are not copied or pickled'
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def cache_info(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'values': len(self._values)}
+
+    def clear(self):
+        'drop all the values -- the model calls this every time step'
+        with self._lock:
+            self._values.clear()
+            self.times = []
+
+    def set_times(self, times):
+        '''
+        set the times the weatherers will ask for the values at in this time
+        step -- the start times of the weathering substeps
+        '''
+        self.times = list(times)
+
+    def get(self, env, name, points, model_time, compute):
+        '''
+        the named value of env at points and model_time, computed with
+        compute() if it is not in the snapshot
+
+        :param env: the environment object the value comes from
+        :param name: hashable name of the value -- include any arguments
+                     that change it.
+        :param points: positions, or None if the value doesn't depend on
+                       them
+        :param model_time: the time, or None if the value doesn't depend on
+                           it
+        :param compute: function with no arguments that returns the value
+        '''
+        if points is not None:
+            points = InterpolationPlanCache.points_key(points)
+
+        key = (id(env), name, model_time, points)
+
+        with self._lock:
+            # the object is kept with its values, so its id can't be reused
+            _env, value = self._values.get(key, (None, None))
+
+            if _env is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if _env is None:
+            value = compute()
+
+            with self._lock:
+                self._values[key] = (env, value)
+
+        return _copy(value)
+
+    def wind_speed(self, wind, points, model_time, format='r',
+                   fill_value=1.0):
+        '''
+        wind speed (m/s) of wind at points, with the masked values filled
+
+        If model_time is one of the substep times, the speed at all of them
+        is computed at once, with wind.at_times()
+        '''
+        name = ('wind_speed', format, fill_value)
+
+        if (len(self.times) > 1 and model_time in self.times and
+                hasattr(wind, 'at_times')):
+            self._wind_speed_at_times(wind, name, points, format, fill_value)
+
+        def compute():
+            retval = wind.at(points, model_time, format=format)
+
+            if isinstance(retval, np.ma.MaskedArray):
+                return retval.filled(fill_value)
+            else:
+                return retval
+
+        return self.get(wind, name, points, model_time, compute)
+
+    def _wind_speed_at_times(self, wind, name, points, format, fill_value):
+        'add the wind speed at all the substep times, if it is not there'
+        points_key = InterpolationPlanCache.points_key(points)
+        times = list(self.times)
+        keys = [(id(wind), name, t, points_key) for t in times]
+
+        with self._lock:
+            if all([key in self._values for key in keys]):
+                return
+
+        speeds = wind.at_times(points, times, format=format)
+
+        if isinstance(speeds, np.ma.MaskedArray):
+            speeds = speeds.filled(fill_value)
+
+        with self._lock:
+            for key, speed in zip(keys, speeds):
+                if key not in self._values:
+                    self._values[key] = (wind, speed)
+
+    def waves(self, waves, points, model_time):
+        '''
+        Waves.get_value() at points and model_time -- wave height, peak
+        period, whitecap fraction and dissipative wave energy
+        '''
+        return self.get(waves, 'waves', points, model_time,
+                        lambda: waves.get_value(points, model_time))
+
+    def emulsification_wind(self, waves, points, model_time):
+        'Waves.get_emulsification_wind() at points and model_time'
+        return self.get(waves, 'emulsification_wind', points, model_time,
+                        lambda: waves.get_emulsification_wind(points,
+                                                              model_time))
+
+    def water(self, water, attr, unit=None):
+        '''
+        water property attr -- temperature, density, kinematic_viscosity,
+        etc, in SI units if unit is None
+        '''
+        return self.get(water, ('water', attr, unit), None, None,
+                        lambda: water.get(attr, unit))
+
+
+def _copy(value):
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    elif isinstance(value, tuple):
+        return tuple([_copy(v) for v in value])
+    else:
+        return value
@@ -1,4 +1,5 @@
 import copy
+import datetime
 from numbers import Number
 import collections
 import warnings
@@ -196,6 +197,44 @@ class TimeSeriesProp(EnvProp, serializable.Serializable):
 
         return np.full((points.shape[0], 1), value, dtype=np.float64)
 
+    def at_times(self, points, times, units=None, extrapolate=False,
+                 **kwargs):
+        '''
+            Interpolates this property to the given points at each of the
+            given times, in one pass. The same as calling at() for each
+            time, but the time interpolation and the unit conversion are
+            done for all the times at once.
+
+            :param points: A Nx2 array of lon,lat points
+
+            :param times: A sequence of datetime objects
+
+            :param units: The units that the result would be converted to
+
+            :returns: A TxNx1 array
+        '''
+        times = np.asarray(times, dtype='datetime64[us]').reshape(-1)
+
+        if len(self.time) == 1:
+            # single time time series (constant)
+            values = np.full((len(times),), self.data, dtype=np.float64)
+        else:
+            if not extrapolate and len(times) > 0:
+                self.time.valid_time(times.min().astype(datetime.datetime))
+                self.time.valid_time(times.max().astype(datetime.datetime))
+
+            # clamps to the end values outside of the time series, as at()
+            # does
+            t_data = np.asarray(self.time.data, dtype='datetime64[us]')
+            values = np.interp(times.astype(np.float64),
+                               t_data.astype(np.float64),
+                               np.asarray(self.data, dtype=np.float64))
+
+        if units is not None and units != self.units:
+            values = unit_conversion.convert(self.units, units, values)
+
+        return np.repeat(values.reshape(-1, 1, 1), points.shape[0], axis=1)
+
     def is_constant(self):
         return len(self.data) == 1
 
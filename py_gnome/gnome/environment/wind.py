@@ -508,6 +508,47 @@ class Wind(serializable.Serializable, Timeseries, Environment):
             ret_data = gridded.utilities._align_results_to_spatial_data(ret_data, points)
         return ret_data
 
+    def at_times(self, points, times, format='r-theta', extrapolate=True,
+                 _auto_align=True):
+        '''
+        Returns the value of the wind at the specified points at each of the
+        specified times -- the results of at() for each time, stacked, so a
+        TxNxk array, or TxN for the single value formats.
+
+        All the times are looked up in the time series with one call, and
+        the unit conversion is done once.
+
+        :param points: Nx2 or Nx3 array of positions (lon, lat, [z]).
+        :param times: sequence of datetimes to be queried
+        :param format: String describing the data and organization.
+        :param extrapolate: extrapolation on/off (ignored for now)
+        '''
+        if points is None:
+            points = np.array((0,0)).reshape(-1,2)
+        pts = gridded.utilities._reorganize_spatial_data(points)
+
+        if format in ('r-theta', 'uv'):
+            # all the columns, as at() returns them
+            f, columns = format, slice(None)
+        elif format in ('u', 'v', 'r', 'theta'):
+            f = 'uv' if format in ('u', 'v') else 'r-theta'
+            columns = 0 if format in ('u', 'r') else 1
+        else:
+            raise ValueError('invalid format {0}'.format(format))
+
+        times = list(times)
+        data = self.get_wind_data(times, 'm/s', f)['value']
+
+        ret_data = np.zeros((len(times),) + pts.shape, dtype='float64')
+        ret_data[:, :, :2] = data[:, None, :]
+        ret_data = ret_data[:, :, columns]
+
+        if _auto_align:
+            ret_data = np.stack([gridded.utilities
+                                 ._align_results_to_spatial_data(r, points)
+                                 for r in ret_data])
+        return ret_data
+
     def set_speed_uncertainty(self, up_or_down=None):
         '''
         This function shifts the wind speed values in our time series
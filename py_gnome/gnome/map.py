@@ -38,6 +38,8 @@ from gnome.utilities.projections import (FlatEarthProjection,
                                          RectangularGridProjection,
                                          RegularGridProjection)
 from gnome.utilities.map_canvas import MapCanvas
+from gnome.utilities.raster_cache import (default_cache as
+                                          default_raster_cache)
 from gnome.utilities.serializable import Serializable, Field
 from gnome.utilities.file_tools import haz_files
 from gnome.utilities.file_tools.osgeo_helpers import (ogr_layers)
@@ -45,8 +47,8 @@ from gnome.utilities.file_tools.osgeo_helpers import (ogr_features)
 from gnome.utilities.file_tools.osgeo_helpers import (ogr_open_file)
 
 from gnome.utilities.geometry.polygons import PolygonSet
-from gnome.utilities.geometry.cy_point_in_polygon import (points_in_poly,
-                                                          point_in_poly)
+from gnome.utilities.geometry.poly_index import PolygonGridIndex
+from gnome.utilities.geometry.cy_point_in_polygon import points_in_poly
 
 from gnome.cy_gnome.cy_land_check import check_land_layers, move_particles
 
@@ -55,6 +57,37 @@ import gnome.map
 from gnome.persist import base_schema
 
 
+def coarsen_bitmap(bitmap, ratio):
+    """
+    Builds a coarser version of a land-water bitmap: each cell of the
+    result covers a ratio x ratio block of cells in bitmap, and is 1 if
+    any of them is non-zero.
+
+    If the bitmap size is not a multiple of ratio, the cells on the far
+    edges cover the partial blocks that are left.
+
+    :param bitmap: the (W, H) bitmap to coarsen
+    :type bitmap: numpy array of uint8
+
+    :param ratio: number of bitmap cells per coarse cell in each direction
+    :type ratio: int
+
+    :returns: (ceil(W / ratio), ceil(H / ratio)) numpy array of uint8
+    """
+    ratio = int(ratio)
+
+    # reduce the blocks of columns first, then the blocks of rows
+    # reduceat() takes care of the partial blocks on the edges
+    cols = np.logical_or.reduceat(bitmap,
+                                  np.arange(0, bitmap.shape[1], ratio),
+                                  axis=1)
+    layer = np.logical_or.reduceat(cols,
+                                   np.arange(0, bitmap.shape[0], ratio),
+                                   axis=0)
+
+    return np.ascontiguousarray(layer, dtype=np.uint8)
+
+
 class GnomeMapSchema(base_schema.ObjType):
     map_bounds = base_schema.LongLatBounds(missing=drop)
     spillable_area = base_schema.PolygonSet(missing=drop)
@@ -208,6 +241,37 @@ class GnomeMap(Serializable):
 
         return False
 
+    @property
+    def _map_bounds_index(self):
+        """
+        grid index of the map_bounds polygon, for fast on_map tests.
+        It is built the first time it is needed, and rebuilt if map_bounds
+        changes.
+        """
+        index = self.__dict__.get('_bounds_index')
+
+        if index is None or not index.matches(self.map_bounds):
+            index = self._bounds_index = PolygonGridIndex(self.map_bounds)
+
+        return index
+
+    @property
+    def _spillable_area_index(self):
+        """
+        grid indexes of the spillable_area polygons -- like
+        _map_bounds_index
+        """
+        indexes = self.__dict__.get('_spillable_indexes', [])
+        polys = ([] if self.spillable_area is None
+                 else [poly.points for poly in self.spillable_area])
+
+        if (len(indexes) != len(polys) or
+                not all([i.matches(p) for i, p in zip(indexes, polys)])):
+            indexes = self._spillable_indexes = [PolygonGridIndex(p)
+                                                 for p in polys]
+
+        return indexes
+
     def on_map(self, coords):
         """
         :param coords: location for test.
@@ -223,7 +287,7 @@ class GnomeMap(Serializable):
         """
         coords = np.asarray(coords, dtype=world_point_type)
 
-        return points_in_poly(self.map_bounds, coords)
+        return self._map_bounds_index.contains(coords)
 
     def on_land(self, coord):
         """
@@ -253,19 +317,27 @@ class GnomeMap(Serializable):
         """
         :param coord: location for test.
         :type coord: 3-tuple of floats: (long, lat, depth)
+                     or an Nx3 array
 
         :return:
          - True if the point is an allowable spill position
          - False if the point is not an allowable spill position
+         - a bool array, if an Nx3 array of points is passed in
 
         .. note:: it could be either off the map, or in a location that
                   spills aren't allowed
         """
-        for poly in self.spillable_area:
-            if points_in_poly(poly.points, coord):
-                return True
+        coords = np.asarray(coord, dtype=world_point_type)
+        points = coords.reshape(-1, 3)
 
-        return False
+        allowable = np.zeros((len(points),), dtype=np.bool)
+        for index in self._spillable_area_index:
+            allowable |= index.contains(points)
+
+        if coords.shape == (3,):
+            return bool(allowable[0])
+        else:
+            return allowable
 
     def _set_off_map_status(self, spill):
         """
@@ -277,7 +349,7 @@ class GnomeMap(Serializable):
         :type spill:  :class:`gnome.spill_container.SpillContainer`
         """
         next_positions = spill['next_positions']
-        status_codes = spill['status_codes']
+        status_codes = spill.get_writable('status_codes')
         off_map = np.logical_not(self.on_map(next_positions))
         if len(next_positions) != 0 and np.all(off_map):
             self.logger.warn("All particles left the map this timestep.")
@@ -321,6 +393,17 @@ class GnomeMap(Serializable):
         """
         pass
 
+    def refloat_draws_random(self, spill_container):
+        """
+        True if refloat_elements() draws random numbers for the spill
+        container -- the model uses it to move the forecast and uncertain
+        containers at the same time.
+
+        .. note::
+            This map class has no land, and so never draws.
+        """
+        return False
+
     def resurface_airborne_elements(self, spill_container):
         """
         Takes any elements that are left above the water surface (z < 0.0)
@@ -335,6 +418,8 @@ class GnomeMap(Serializable):
             add vertical movement that adds up to over the surface. e.g rise
             velocity.
         """
+        # the movers have written next_positions, so it isn't shared with
+        # a snapshot, and can be changed in place
         next_positions = spill_container['next_positions']
 
         np.maximum(next_positions[:, 2], 0.0, out=next_positions[:, 2])
@@ -474,7 +559,7 @@ class ParamMap(GnomeMap):
           coord is 3-d, but the concept of "on the map" is 2-d in this context,
           so depth is ignored.
         """
-        return points_in_poly(self.map_bounds, coord)
+        return self._map_bounds_index.contains(coord)
 
     def on_land(self, coord):
         """
@@ -528,7 +613,7 @@ class ParamMap(GnomeMap):
         :type spill:  :class:`gnome.spill_container.SpillContainer`
         """
         next_positions = spill['next_positions']
-        status_codes = spill['status_codes']
+        status_codes = spill.get_writable('status_codes')
         off_map = np.logical_not(self.on_map(next_positions))
 
         # let model decide if we want to remove elements marked as off-map
@@ -554,9 +639,9 @@ class ParamMap(GnomeMap):
         self._set_off_map_status(sc)
 
         start_pos = sc['positions']
-        next_pos = sc['next_positions']
-        status_codes = sc['status_codes']
-        last_water_positions = sc['last_water_positions']
+        next_pos = sc.get_writable('next_positions')
+        status_codes = sc.get_writable('status_codes')
+        last_water_positions = sc.get_writable('last_water_positions')
 
         # beached = 1xN numpy array of bool, elem is true if on water
         # and next pos is on land
@@ -573,6 +658,14 @@ class ParamMap(GnomeMap):
         sc.mass_balance['off_maps'] += \
             sc['mass'][sc['status_codes'] == oil_status.off_maps].sum()
 
+    def refloat_draws_random(self, spill_container):
+        """
+        True if refloat_elements() draws random numbers for the spill
+        container: the refloating is random, and there are elements on land
+        """
+        return (self._refloat_halflife > 0.0 and
+                np.any(spill_container['status_codes'] == oil_status.on_land))
+
     def refloat_elements(self, spill_container, time_step):
         """
         This method performs the re-float logic -- changing the element
@@ -606,9 +699,10 @@ class ParamMap(GnomeMap):
         if r_idx.size > 0:
             # check is not required, but why do this operation if no particles
             # need to be refloated
-            spill_container['positions'][r_idx] = \
+            spill_container.get_writable('positions')[r_idx] = \
                 spill_container['last_water_positions'][r_idx]
-            spill_container['status_codes'][r_idx] = oil_status.in_water
+            spill_container.get_writable('status_codes')[r_idx] = \
+                oil_status.in_water
 
     def update_from_dict(self, data):
         if ('center' in data.keys() or
@@ -661,6 +755,12 @@ class RasterMap(GnomeMap):
 
     land_flag = 1
 
+    # number of threads used to check for land hits
+    # 1 checks them in the calling thread, 0 uses the OpenMP default --
+    # usually the number of cores, which is too many when several models
+    # run at once, as with the ModelBroadcaster
+    land_check_threads = 1
+
     def __init__(self, bitmap_array, projection, **kwargs):
         """
         create a new RasterMap
@@ -695,7 +795,22 @@ class RasterMap(GnomeMap):
                    This is only used when loading object from save file.
 
         :type id: string
+
+        :param layers: The coarse raster layers, if they have already been
+                       built, with bitmap_array last. Used for rasters
+                       loaded from a RasterCache.
+        :type layers: list of numpy arrays of uint8
+
+        :param land_check_threads: number of threads used to check for land
+                                   hits. Default is 1, to check them in the
+                                   calling thread. 0 uses the OpenMP
+                                   default.
+        :type land_check_threads: int
         """
+        layers = kwargs.pop('layers', None)
+        self.land_check_threads = kwargs.pop('land_check_threads',
+                                             self.land_check_threads)
+
         refloat_halflife = kwargs.pop('refloat_halflife', 1)
         self._refloat_halflife = refloat_halflife * self.seconds_in_hour
 
@@ -708,7 +823,11 @@ class RasterMap(GnomeMap):
         else:
             self.ratios = np.array((16, 1,), dtype=np.int32)
 
-        self.build_coarser_bitmaps()
+        if layers is not None and len(layers) == len(self.ratios):
+            self.layers = np.array(list(layers[:-1]) + [self.basebitmap])
+        else:
+            self.build_coarser_bitmaps()
+
         self.projection = projection
 
         GnomeMap.__init__(self, **kwargs)
@@ -736,26 +855,106 @@ class RasterMap(GnomeMap):
         In the end, if the scale decreases to 1:1 and there's still a land hit,
         then land was hit.
         """
-        self.layers = []
-        base_w = self.basebitmap.shape[0]
-        base_h = self.basebitmap.shape[1]
-
-        for ratio in self.ratios[:-1]:
-            genned_layer = np.zeros((int(math.ceil(float(base_w) / ratio)),
-                                     int(math.ceil(float(base_h) / ratio))),
-                                    dtype=np.uint8, order='C')
+        self.layers = [self.basebitmap]
 
-            for j in range(0, genned_layer.shape[1]):
-                for i in range(0, genned_layer.shape[0]):
-                    genned_layer[i, j] = np.any(self.basebitmap[i * ratio:
-                                                                (i + 1) * ratio, j * ratio:
-                                                                (j + 1) * ratio])
+        # build from the finest layer to the coarsest -- each coarse layer
+        # can be built from the previous one if the ratios are multiples
+        finer, finer_ratio = self.basebitmap, 1
+        for ratio in self.ratios[-2::-1]:
+            if ratio % finer_ratio == 0:
+                layer = coarsen_bitmap(finer, ratio // finer_ratio)
+            else:
+                layer = coarsen_bitmap(self.basebitmap, ratio)
 
-            self.layers.append(genned_layer)
+            self.layers.insert(0, layer)
+            finer, finer_ratio = layer, ratio
 
-        self.layers.append(self.basebitmap)
         self.layers = np.array(self.layers)
 
+    def _init_from_land_polys(self, filename, land_polys, raster_size,
+                              raster_cache, **kwargs):
+        """
+        Rasterize the land polygons, and initialize the RasterMap with
+        the raster.
+
+        If a raster_cache is given, the raster is looked up in it first, so
+        it is only built once for a given data file and raster_size.
+
+        :param filename: the data file the land polygons were read from
+        :param land_polys: PolygonSet of land (and lake) polygons
+        :param raster_size: total number of pixels in the raster
+        :param raster_cache: RasterCache object, or None to not cache
+
+        kwargs are passed on to RasterMap.__init__()
+        """
+        BB = land_polys.bounding_box
+
+        # stretch the bounding box, to get approximate aspect ratio in
+        # projected coords.
+        aspect_ratio = (np.cos(BB.Center[1] * np.pi / 180) *
+                        (BB.Width / BB.Height))
+
+        w = int(np.sqrt(raster_size * aspect_ratio))
+        h = int(raster_size / w)
+
+        key = None
+        if raster_cache is not None:
+            key = raster_cache.make_key(filename,
+                                        self.__class__.__name__,
+                                        raster_size,
+                                        np.asarray(BB,
+                                                   dtype=np.float64).tolist())
+            cached = raster_cache.load(key, filename)
+
+            if cached is not None:
+                layers, viewport, image_size = cached
+
+                RasterMap.__init__(self, layers[-1],
+                                   FlatEarthProjection(viewport, image_size),
+                                   layers=layers,
+                                   **kwargs)
+                return
+
+        canvas = MapCanvas(image_size=(w, h),
+                           preset_colors=None,
+                           background_color='water',
+                           viewport=BB)
+        # color doesn't matter here, only index
+        canvas.add_colors((('water', (0, 255, 255)),  # aqua
+                           ('land', (255, 204, 153)),  # brown
+                           ))
+        canvas.clear_background()
+
+        # draw the land to the background
+        for poly in land_polys:
+            # fixme -- this should be something like "land"
+            if poly.metadata[2] == '1':
+                canvas.draw_polygon(poly,
+                                    line_color='land',
+                                    fill_color='land',
+                                    line_width=1,
+                                    background=True)
+            # fixme -- this should be something like "lake"
+            elif poly.metadata[2] == '2':
+                # this is a lake, draw as water
+                canvas.draw_polygon(poly,
+                                    line_color='water',
+                                    fill_color='water',
+                                    line_width=1,
+                                    background=True)
+
+        # just for testing
+        # canvas.save_background("raster_map_test.png")
+
+        # get the basebitmap as a numpy array:
+        bitmap_array = canvas.back_asarray()
+
+        RasterMap.__init__(self, bitmap_array, canvas.projection, **kwargs)
+
+        if key is not None:
+            raster_cache.save(key, filename,
+                              self.layers, canvas.viewport, (w, h))
+
     @property
     def refloat_halflife(self):
         return self._refloat_halflife / self.seconds_in_hour
@@ -793,6 +992,21 @@ class RasterMap(GnomeMap):
                 coord[0] >= shape[0] or
                 coord[1] >= shape[1])
 
+    def _off_bitmap_array(self, coords):
+        """
+        which of these pixel coordinates are off the basebitmap
+
+        :param coords: pixel coords
+        :type coords: Nx2 numpy int array
+
+        returns: a (N,) array of bools - true for points off the basebitmap
+        """
+        shape = self.basebitmap.shape
+        return ((coords[:, 0] < 0) |
+                (coords[:, 1] < 0) |
+                (coords[:, 0] >= shape[0]) |
+                (coords[:, 1] >= shape[1]))
+
     def _on_land_pixel(self, coord):
         """
         returns 1 if the point is on land, 0 otherwise
@@ -814,15 +1028,22 @@ class RasterMap(GnomeMap):
         """
         :param coord: (long, lat, depth) location -- depth is ignored here.
         :type coord: 3-tuple of floats -- (long, lat, depth)
+                     or an Nx3 array
 
         :return:
          - 1 if point on land
          - 0 if not on land
+         - a bool array, if an Nx3 array of points is passed in
 
         .. note:: to_pixel() converts to array of points...
         """
-        return self._on_land_pixel(self.projection.to_pixel(coord,
-                                                            asint=True)[0])
+        coords = np.asarray(coord, dtype=world_point_type)
+        pixels = self.projection.to_pixel(coords, asint=True)
+
+        if coords.shape == (3,):
+            return self._on_land_pixel(pixels[0])
+        else:
+            return self._on_land_pixel_array(pixels)
 
     def _on_land_pixel_array(self, coords):
         """
@@ -832,20 +1053,23 @@ class RasterMap(GnomeMap):
         :type coords:  Nx2 numpy int array
 
         returns: a (N,) array of bools - true for particles that are on land
+
+        Points off the basebitmap are not on land.
         """
-        mask = map(point_in_poly, [self.map_bounds] * len(coords), coords)
-        racpy = np.copy(coords)[mask]
-        mskgph = self.basebitmap[racpy[:, 0], racpy[:, 1]]
+        coords = np.asarray(coords).reshape(-1, 2)
+        on_bitmap = ~self._off_bitmap_array(coords)
 
-        chrmgph = np.array([0] * len(coords))
-        chrmgph[np.array(mask)] = mskgph
+        on_land = np.zeros((len(coords),), dtype=np.bool)
+        on_land[on_bitmap] = (self.basebitmap[coords[on_bitmap, 0],
+                                              coords[on_bitmap, 1]] &
+                              self.land_flag)
 
-        return chrmgph
+        return on_land
 
     def _in_water_pixel(self, coord):
         # if  off the basebitmap, so must be in water,
         # unless not on map, which should have already been checked.
-        if not self._off_bitmap:
+        if self._off_bitmap(coord):
             return True
         else:
             return not self.basebitmap[coord[0], coord[1]] & self.land_flag
@@ -855,17 +1079,25 @@ class RasterMap(GnomeMap):
         checks if it's on the map, first.
             (depth is ignored in this version)
 
-        :param coord: (lon, lat, depth) coordinate
+        :param coord: (lon, lat, depth) coordinate, or an Nx3 array of them
 
-        :return: true if the point given by coord is in the water
+        :return: true if the point given by coord is in the water, or a
+                 bool array if an Nx3 array of points is passed in
         """
-        if not self.on_map(coord):
-            return False
+        coords = np.asarray(coord, dtype=world_point_type)
+
+        if coords.shape == (3,):
+            if not self.on_map(coords):
+                return False
+            else:
+                # to_pixel makes a NX2 array
+                return self._in_water_pixel(self.projection
+                                            .to_pixel(coords, asint=True)[0])
         else:
-            # to_pixel makes a NX2 array
-            return self._in_water_pixel(self.projection.to_pixel(coord,
-                                                                 asint=True)[0]
-                                        )
+            pixels = self.projection.to_pixel(coords, asint=True)
+
+            return (self.on_map(coords) &
+                    ~self._on_land_pixel_array(pixels))
 
     def beach_elements(self, sc):
         """
@@ -889,9 +1121,9 @@ class RasterMap(GnomeMap):
         # If beached, it won't move, if not, then we can use it?
 
         start_pos = sc['positions']
-        next_pos = sc['next_positions']
-        status_codes = sc['status_codes']
-        last_water_positions = sc['last_water_positions']
+        next_pos = sc.get_writable('next_positions')
+        status_codes = sc.get_writable('status_codes')
+        last_water_positions = sc.get_writable('last_water_positions')
 
         # transform to pixel coords:
         # NOTE: must be integers!
@@ -925,6 +1157,14 @@ class RasterMap(GnomeMap):
         sc.mass_balance['off_maps'] += \
             sc['mass'][sc['status_codes'] == oil_status.off_maps].sum()
 
+    def refloat_draws_random(self, spill_container):
+        """
+        True if refloat_elements() draws random numbers for the spill
+        container: the refloating is random, and there are elements on land
+        """
+        return (self._refloat_halflife > 0.0 and
+                np.any(spill_container['status_codes'] == oil_status.on_land))
+
     def refloat_elements(self, spill_container, time_step):
         """
         This method performs the re-float logic -- changing the element
@@ -961,9 +1201,10 @@ class RasterMap(GnomeMap):
         if r_idx.size > 0:
             # check is not required, but why do this operation if no particles
             # need to be refloated
-            spill_container['positions'][r_idx] = \
+            spill_container.get_writable('positions')[r_idx] = \
                 spill_container['last_water_positions'][r_idx]
-            spill_container['status_codes'][r_idx] = oil_status.in_water
+            spill_container.get_writable('status_codes')[r_idx] = \
+                oil_status.in_water
 
     def _check_land_layers(self, raster_map_layers, ratios,
                            positions, end_positions,
@@ -971,14 +1212,15 @@ class RasterMap(GnomeMap):
         """
         Do the actual land-checking.
         This method simply calls a Cython version:
-            gnome.cy_gnome.cy_land_check.check_land()
+            gnome.cy_gnome.cy_land_check.check_land_layers()
 
         The arguments 'status_codes', 'positions' and 'last_water_positions'
         are altered in place.
         """
         check_land_layers(raster_map_layers, ratios,
                           positions, end_positions,
-                          status_codes, last_water_positions)
+                          status_codes, last_water_positions,
+                          num_threads=self.land_check_threads)
 
     def allowable_spill_position(self, coord):
         """
@@ -987,8 +1229,21 @@ class RasterMap(GnomeMap):
         .. note::
             This may not be the same as in_water!
 
-        :param coord: (lon, lat, depth) coordinate
+        :param coord: (lon, lat, depth) coordinate, or an Nx3 array of them
+
+        :returns: a bool array if an Nx3 array of points is passed in
         """
+        coords = np.asarray(coord, dtype=world_point_type)
+
+        if coords.shape != (3,):
+            allowable = self.on_map(coords) & ~self.on_land(coords)
+
+            if self.spillable_area is not None:
+                allowable &= (super(RasterMap, self)
+                              .allowable_spill_position(coords))
+
+            return allowable
+
         if self.on_map(coord):
             if not self.on_land(coord):
                 if self.spillable_area is None:
@@ -1053,8 +1308,15 @@ class MapFromBNA(RasterMap):
         :param id: unique ID of the object. Using UUID as a string.
                    This is only used when loading object from save file.
         :type id: string
+
+        :param raster_cache: where to look for the raster, if it has been
+                             built before, and save it if it hasn't.
+                             Defaults to None, to not cache the raster,
+                             unless GNOME_RASTER_CACHE_DIR is set.
+        :type raster_cache: :class:`gnome.utilities.raster_cache.RasterCache`
         """
         self.filename = filename
+        raster_cache = kwargs.pop('raster_cache', default_raster_cache())
 
         # fixme: do some file type checking here.
         polygons = haz_files.ReadBNA(filename, 'PolygonSet')
@@ -1109,53 +1371,12 @@ class MapFromBNA(RasterMap):
         # versus what the user entered. if this is within spillable_area for
         # BNA, then include it? else ignore
 
-        # stretch the bounding box, to get approximate aspect ratio in
-        # projected coords.
-        aspect_ratio = (np.cos(BB.Center[1] * np.pi / 180) *
-                        (BB.Width / BB.Height))
-
-        w = int(np.sqrt(raster_size * aspect_ratio))
-        h = int(raster_size / w)
-
-        canvas = MapCanvas(image_size=(w, h),
-                           preset_colors=None,
-                           background_color='water',
-                           viewport=BB)
-        # color doesn't matter here, only index
-        canvas.add_colors((('water', (0, 255, 255)),  # aqua
-                           ('land', (255, 204, 153)),  # brown
-                           ))
-        canvas.clear_background()
-
-        # draw the land to the background
-        for poly in land_polys:
-            # fixme -- this should be something like "land"
-            if poly.metadata[2] == '1':
-                canvas.draw_polygon(poly,
-                                    line_color='land',
-                                    fill_color='land',
-                                    line_width=1,
-                                    background=True)
-            # fixme -- this should be something like "lake"
-            elif poly.metadata[2] == '2':
-                # this is a lake, draw as water
-                canvas.draw_polygon(poly,
-                                    line_color='water',
-                                    fill_color='water',
-                                    line_width=1,
-                                    background=True)
-
-        # just for testing
-        # canvas.save_background("raster_map_test.png")
-
-        # get the basebitmap as a numpy array:
-        bitmap_array = canvas.back_asarray()
-
-        RasterMap.__init__(self, bitmap_array, canvas.projection,
-                           map_bounds=map_bounds,
-                           spillable_area=spillable_area,
-                           land_polys=land_polys,
-                           **kwargs)
+        self._init_from_land_polys(filename, land_polys, raster_size,
+                                   raster_cache,
+                                   map_bounds=map_bounds,
+                                   spillable_area=spillable_area,
+                                   land_polys=land_polys,
+                                   **kwargs)
         return None
 
     def to_geojson(self):
@@ -1251,8 +1472,15 @@ class MapFromUGrid(RasterMap):
         :param id: unique ID of the object. Using UUID as a string.
                    This is only used when loading object from save file.
         :type id: string
+
+        :param raster_cache: where to look for the raster, if it has been
+                             built before, and save it if it hasn't.
+                             Defaults to None, to not cache the raster,
+                             unless GNOME_RASTER_CACHE_DIR is set.
+        :type raster_cache: :class:`gnome.utilities.raster_cache.RasterCache`
         """
         self.filename = filename
+        raster_cache = kwargs.pop('raster_cache', default_raster_cache())
 
         grid = pyugrid.UGrid.from_ncfile(filename)
 
@@ -1298,54 +1526,12 @@ class MapFromUGrid(RasterMap):
 
         map_bounds = kwargs.pop('map_bounds', map_bounds)
 
-        # stretch the bounding box, to get approximate aspect ratio in
-        # projected coords.
-        aspect_ratio = (np.cos(BB.Center[1] * np.pi / 180) *
-                        (BB.Width / BB.Height))
-
-        w = int(np.sqrt(raster_size * aspect_ratio))
-        h = int(raster_size / w)
-
-        canvas = MapCanvas(image_size=(w, h),
-                           preset_colors=None,
-                           background_color='water',
-                           viewport=BB,
-                           )
-        # color doesn't matter here, only index
-        canvas.add_colors((('water', (0, 255, 255)),  # aqua
-                           ('land', (255, 204, 153)),  # brown
-                           ))
-        canvas.clear_background()
-
-        # draw the land to the background
-        for poly in land_polys:
-            # fixme -- this should be something like "land"
-            if poly.metadata[2] == '1':
-                canvas.draw_polygon(poly,
-                                    line_color='land',
-                                    fill_color='land',
-                                    line_width=1,
-                                    background=True)
-            # fixme -- this should be something like "lake"
-            elif poly.metadata[2] == '2':
-                # this is a lake, draw as water
-                canvas.draw_polygon(poly,
-                                    line_color='water',
-                                    fill_color='water',
-                                    line_width=1,
-                                    background=True)
-
-        # just for testing
-        # canvas.save_background("raster_map_test.png")
-
-        # get the basebitmap as a numpy array:
-        bitmap_array = canvas.back_asarray()
-
-        RasterMap.__init__(self, bitmap_array, canvas.projection,
-                           map_bounds=map_bounds,
-                           spillable_area=spillable_area,
-                           land_polys=land_polys,
-                           ** kwargs)
+        self._init_from_land_polys(filename, land_polys, raster_size,
+                                   raster_cache,
+                                   map_bounds=map_bounds,
+                                   spillable_area=spillable_area,
+                                   land_polys=land_polys,
+                                   **kwargs)
 
         return None
 
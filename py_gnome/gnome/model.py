@@ -1,10 +1,12 @@
 #!/usr/bin/env python
 import os
+import re
 import shutil
 from datetime import datetime, timedelta
 import copy
 import inspect
 import zipfile
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
@@ -12,12 +14,14 @@ from colander import (SchemaNode,
                       String, Float, Int, Bool, List,
                       drop, OneOf)
 
-from gnome.environment import Environment
+from gnome.environment import Environment, EnvironmentSnapshot
 
 import gnome.utilities.cache
 from gnome.utilities.time_utils import round_time
 from gnome.utilities.orderedcollection import OrderedCollection
 from gnome.utilities.serializable import Serializable, Field
+from gnome.utilities.query import SpillDataQuery
+from gnome.utilities.container_pipeline import ContainerPipeline, no_random
 
 from gnome.basic_types import oil_status, fate
 from gnome.spill_container import SpillContainerPair
@@ -29,6 +33,7 @@ from gnome.weatherers import (weatherer_sort,
                               FayGravityViscous,
                               Langmuir)
 from gnome.outputters import Outputter, NetCDFOutput, WeatheringOutput
+from gnome.outputters.outputter import post_run_steps
 from gnome.persist import (extend_colander,
                            validators,
                            References,
@@ -205,7 +210,9 @@ class Model(Serializable):
                  cache_enabled=False,
                  name=None,
                  mode=None,
-                 location=[]):
+                 location=[],
+                 cache_background_write=False,
+                 memmap_cache=False):
         '''
         Initializes a model.
         All arguments have a default.
@@ -232,10 +239,20 @@ class Model(Serializable):
         :param mode='Gnome': The runtime 'mode' that the model should use.
                              This is a value that the Web Client uses to
                              decide which UI views it should present.
+
+        :param cache_background_write=False: Flag for writing the cache to
+                                             disk in a background thread,
+                                             while the next step is computed.
+
+        :param memmap_cache=False: Flag for caching the steps in memory
+                                   mapped column files (MemmapElementCache),
+                                   which are faster to read the output from
+                                   after the run.
         '''
         self.__restore__(time_step, start_time, duration,
                          weathering_substeps,
-                         uncertain, cache_enabled, map, name, mode, location)
+                         uncertain, cache_enabled, map, name, mode, location,
+                         cache_background_write, memmap_cache)
 
         self._register_callbacks()
 
@@ -258,7 +275,8 @@ class Model(Serializable):
 
     def __restore__(self, time_step, start_time, duration,
                     weathering_substeps, uncertain, cache_enabled, map,
-                    name, mode, location):
+                    name, mode, location, cache_background_write=False,
+                    memmap_cache=False):
         '''
         Take out initialization that does not register the callback here.
         This is because new_from_dict will use this to restore the model _state
@@ -272,9 +290,26 @@ class Model(Serializable):
         # contains both certain/uncertain spills
         self.spills = SpillContainerPair(uncertain)
 
-        self._cache = gnome.utilities.cache.ElementCache()
+        if memmap_cache:
+            cache_class = gnome.utilities.cache.MemmapElementCache
+        else:
+            cache_class = gnome.utilities.cache.ElementCache
+
+        self._cache = cache_class(background_write=cache_background_write)
         self._cache.enabled = cache_enabled
 
+        # environment values shared by the weatherers during a time step
+        self._env_snapshot = EnvironmentSnapshot()
+
+        # if True, the uncertain spill container is moved and weathered in
+        # a worker thread, at the same time as the forecast one
+        self.concurrent_containers = False
+        self._pipeline = ContainerPipeline()
+
+        # if True, the weatherers all work on the same fate data views, which
+        # are written back to the data arrays once, after the last one
+        self.fuse_weathering = True
+
         # list of output objects
         self.outputters = OrderedCollection(dtype=Outputter)
 
@@ -381,6 +416,49 @@ class Model(Serializable):
     def cache_enabled(self, enabled):
         self._cache.enabled = enabled
 
+    @property
+    def cache_background_write(self):
+        '''
+        If True, the cache is written to disk in a background thread, so the
+        next step is computed while the last one is written
+        '''
+        return self._cache.background_write
+
+    @cache_background_write.setter
+    def cache_background_write(self, background_write):
+        self._cache.background_write = background_write
+
+    @property
+    def memmap_cache(self):
+        '''
+        If True, the steps are cached in memory mapped column files
+        (MemmapElementCache) rather than a file per step. Changing it
+        rewinds the model.
+        '''
+        return isinstance(self._cache,
+                          gnome.utilities.cache.MemmapElementCache)
+
+    @memmap_cache.setter
+    def memmap_cache(self, memmap_cache):
+        if memmap_cache == self.memmap_cache:
+            return
+
+        if memmap_cache:
+            cache_class = gnome.utilities.cache.MemmapElementCache
+        else:
+            cache_class = gnome.utilities.cache.ElementCache
+
+        old_cache = self._cache
+        old_cache.rewind()
+
+        self._cache = cache_class(background_write=old_cache.background_write)
+        self._cache.enabled = old_cache.enabled
+
+        for outputter in self.outputters:
+            outputter.cache = self._cache
+
+        self.rewind()
+
     @property
     def has_weathering_uncertainty(self):
         return (any([w.on for w in self.weatherers]) and
@@ -754,12 +832,17 @@ class Model(Serializable):
         '''
         sets up everything for the current time_step:
         '''
+        # the environment changes with time -- and the element positions
+        self._env_snapshot.clear()
+
         # initialize movers differently if model uncertainty is on
         for m in self.movers:
             for sc in self.spills.items():
                 m.prepare_for_model_step(sc, self.time_step, self.model_time)
 
         for w in self.weatherers:
+            w.env_snapshot = self._env_snapshot
+
             for sc in self.spills.items():
                 # maybe we will setup a super-sampling step here???
                 w.prepare_for_model_step(sc, self.time_step, self.model_time)
@@ -778,30 +861,52 @@ class Model(Serializable):
          - calls the beaching code to beach the elements that need beaching.
          - sets the new position
         '''
-        for sc in self.spills.items():
-            if sc.num_released > 0:  # can this check be removed?
+        # can this check be removed?
+        containers = [sc for sc in self.spills.items() if sc.num_released > 0]
+
+        ops = [(self._start_move, self.map.refloat_draws_random)]
+        ops.extend([(self._mover_op(m), m.draws_random) for m in self.movers])
+        ops.append((self._finish_move, no_random))
 
-                # possibly refloat elements
-                self.map.refloat_elements(sc, self.time_step)
+        self._run_on_containers(ops, containers)
 
-                # reset next_positions
-                (sc['next_positions'])[:] = sc['positions']
+    def _start_move(self, sc):
+        # possibly refloat elements
+        self.map.refloat_elements(sc, self.time_step)
 
-                # loop through the movers
-                for m in self.movers:
-                    delta = m.get_move(sc, self.time_step, self.model_time)
-                    sc['next_positions'] += delta
+        # reset next_positions
+        sc.get_writable('next_positions')[:] = sc['positions']
 
-                self.map.beach_elements(sc)
+    def _mover_op(self, mover):
+        def move(sc):
+            delta = mover.get_move(sc, self.time_step, self.model_time)
+            sc.get_writable('next_positions')[:] += delta
 
-                # let model mark these particles to be removed
-                tbr_mask = sc['status_codes'] == oil_status.off_maps
-                sc['status_codes'][tbr_mask] = oil_status.to_be_removed
+        return move
 
-                self._update_fate_status(sc)
+    def _finish_move(self, sc):
+        self.map.beach_elements(sc)
+
+        # let model mark these particles to be removed
+        tbr_mask = sc['status_codes'] == oil_status.off_maps
+        sc.get_writable('status_codes')[tbr_mask] = oil_status.to_be_removed
+
+        self._update_fate_status(sc)
+
+        # the final move to the new positions
+        sc.get_writable('positions')[:] = sc['next_positions']
+
+    def _run_on_containers(self, ops, containers=None):
+        '''
+        do the (func, draws) operations on each spill container -- at the
+        same time for the forecast and uncertain containers if
+        concurrent_containers is True. See ContainerPipeline
+        '''
+        if containers is None:
+            containers = self.spills.items()
 
-                # the final move to the new positions
-                (sc['positions'])[:] = sc['next_positions']
+        self._pipeline.run(ops, containers,
+                           concurrent=self.concurrent_containers)
 
     def _update_fate_status(self, sc):
         '''
@@ -813,7 +918,7 @@ class Model(Serializable):
         '''
         if 'fate_status' in sc:
             non_w_mask = sc['status_codes'] == oil_status.on_land
-            sc['fate_status'][non_w_mask] = fate.non_weather
+            sc.get_writable('fate_status')[non_w_mask] = fate.non_weather
 
     def weather_elements(self):
         '''
@@ -829,21 +934,42 @@ class Model(Serializable):
           'super-sample' the model time step so that it will be replaced
           with many smaller time steps.  We'll have to see if this pans
           out in practice.
+        - if fuse_weathering is True, the weathered data is only written
+          back to the data arrays after the last weatherer, or when the
+          elements being weathered change.
 
         '''
         if len(self.weatherers) == 0:
             # if no weatherers then mass_components array may not be defined
             return
 
-        for sc in self.spills.items():
-            # elements may have beached to update fate_status
+        substeps = self._split_into_substeps()
+
+        # the wind is found for all the substeps at once
+        self._env_snapshot.set_times([t for t, _dt in substeps])
+
+        ops = [(self._start_weathering, no_random)]
+        ops.extend([(self._weatherer_op(w, substeps), no_random)
+                    for w in self.weatherers])
+
+        try:
+            self._run_on_containers(ops)
+        finally:
+            for sc in self.spills.items():
+                sc.defer_fate_dataview_updates(False)
 
-            sc.reset_fate_dataview()
+    def _start_weathering(self, sc):
+        # elements may have beached to update fate_status
+        sc.reset_fate_dataview()
+        sc.defer_fate_dataview_updates(self.fuse_weathering)
 
-            for w in self.weatherers:
-                for model_time, time_step in self._split_into_substeps():
-                    # change 'mass_components' in weatherer
-                    w.weather_elements(sc, time_step, model_time)
+    def _weatherer_op(self, weatherer, substeps):
+        def weather(sc):
+            for model_time, time_step in substeps:
+                # change 'mass_components' in weatherer
+                weatherer.weather_elements(sc, time_step, model_time)
+
+        return weather
 
     def _split_into_substeps(self):
         '''
@@ -878,25 +1004,24 @@ class Model(Serializable):
 
         Output data
         '''
-        for mover in self.movers:
-            for sc in self.spills.items():
-                mover.model_step_is_done(sc)
-
-        for w in self.weatherers:
-            for sc in self.spills.items():
-                w.model_step_is_done(sc)
+        self._run_on_containers([(obj.model_step_is_done, no_random)
+                                 for obj in list(self.movers) +
+                                 list(self.weatherers)])
 
         for outputter in self.outputters:
             outputter.model_step_is_done()
 
-        for sc in self.spills.items():
-            '''
-            removes elements with oil_status.to_be_removed
-            '''
-            sc.model_step_is_done()
+        self._run_on_containers([(self._container_step_is_done, no_random)])
+
+    def _container_step_is_done(self, sc):
+        '''
+        removes elements with oil_status.to_be_removed
+        '''
+        sc.model_step_is_done()
 
-            # age remaining particles
-            sc['age'][:] = sc['age'][:] + self.time_step
+        # age remaining particles
+        age = sc.get_writable('age')
+        age[:] = age + self.time_step
 
     def write_output(self, valid, messages=None):
         output_info = {'step_num': self.current_time_step}
@@ -1037,6 +1162,80 @@ class Model(Serializable):
 
         return output_data
 
+    def write_output_post_run(self, outputters=None, num_workers=0):
+        '''
+        Write the output of the run that is in the cache again, after the run.
+
+        The cache is read once: each step is loaded, then handed to all the
+        outputters, rather than each outputter reading every step itself.
+
+        :param outputters=None: the outputters to write output with -- they
+            don't need to be in the model. If None, the outputters of the
+            model that are on are used.
+        :param num_workers=0: if more than 0, the outputters write each step
+            at the same time, in this many threads. They must not share
+            anything, like an output file. The arrays of the step they are
+            handed are read-only.
+
+        :returns: list of the output info dicts of the steps, like full_run()
+        '''
+        if self.current_time_step < 0:
+            raise GnomeRuntimeError('The model has not been run -- '
+                                    'there is no output in the cache')
+
+        if outputters is None:
+            outputters = [o for o in self.outputters if o.on]
+        else:
+            outputters = list(outputters)
+
+        # the cache is read once, and the loaded step shared
+        cache = gnome.utilities.cache.LoadedStepCache(self._cache)
+
+        for outputter in outputters:
+            outputter.prepare_for_model_run(model_start_time=self.start_time,
+                                            cache=cache,
+                                            uncertain=self.uncertain,
+                                            spills=self.spills,
+                                            model_time_step=self.time_step)
+
+        pool = ThreadPool(num_workers) if num_workers > 0 else None
+
+        output_data = []
+        try:
+            for (step_num, time_step, model_time,
+                 last_step) in post_run_steps(cache, self.start_time,
+                                              self.current_time_step + 1):
+                def write_step(outputter):
+                    if time_step is not None:
+                        outputter.prepare_for_model_step(time_step,
+                                                         model_time)
+
+                    return outputter.write_output(step_num, last_step)
+
+                if pool is None:
+                    outputs = map(write_step, outputters)
+                else:
+                    outputs = pool.map(write_step, outputters)
+
+                output_info = {'step_num': step_num}
+                for outputter, output in zip(outputters, outputs):
+                    if output is not None:
+                        output_info[outputter.__class__.__name__] = output
+
+                output_data.append(output_info)
+
+            for outputter in outputters:
+                outputter.finish_output()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+            for outputter in outputters:
+                outputter.cache = self._cache
+
+        return output_data
+
     def _add_to_environ_collec(self, obj_added):
         '''
         if an environment object exists in obj_added, but not in the Model's
@@ -1232,6 +1431,7 @@ class Model(Serializable):
                                      uncertain=self.uncertain,
                                      spills=self.spills)
         nc_out.write_output(self.current_time_step)
+        nc_out.close_files()
         if zipname is not None:
             with zipfile.ZipFile(os.path.join(saveloc, zipname), 'a',
                                  compression=zipfile.ZIP_DEFLATED,
@@ -1624,18 +1824,20 @@ class Model(Serializable):
             ucert = 1
         return self.spills.items()[ucert][prop_name]
 
-    def get_spill_data(self, target_properties, conditions, ucert=0):
+    def get_spill_data(self, target_properties, conditions, ucert=0,
+                       step_num=None):
         """
         Convenience method to allow user to write an expression to filter
         raw spill data
 
         Example case::
 
-          get_spill_data('position && mass',
-                         'position > 50 && spill_num == 1 || status_codes == 1'
-                         )
+          get_spill_data('positions && mass',
+                         'positions[:, 2] > 50 && spill_num == 1 || '
+                         'status_codes == in_water')
 
-        WARNING: EXPENSIVE! USE AT YOUR OWN RISK ON LARGE num_elements!
+        The expression is evaluated with numpy masks over the data arrays;
+        see gnome.utilities.query for the syntax.
 
         Example spill element properties are below. This list may not contain
         all properties tracked by the model.
@@ -1643,62 +1845,29 @@ class Model(Serializable):
         'positions', 'next_positions', 'last_water_positions', 'status_codes',
         'spill_num', 'id', 'mass', 'age'
 
-        """
+        :param target_properties: names of the data arrays to return, as a
+            list, or a string separated by '&&' or ','
+        :param conditions: the query expression
+        :param ucert=0: 0 for the forecast spills, 1 or 'ucert' for the
+            uncertain spills
+        :param step_num=None: if given, query the data for this step from the
+            cache, rather than the current data
 
+        :returns: dict of {property name: array of the selected elements}
+        """
         if ucert == 'ucert':
             ucert = 1
 
-        def elem_val(prop, index):
-            '''
-            Gets the column containing the information on one element
-            '''
-            val = self.spills.items()[ucert].data_arrays[prop][index]
-            return val
-
-        def test_phrase(phrase):
-            for sub_cond in phrase:
-                cond = sub_cond.rsplit()
-                prop_val = elem_val(cond[0], i)
-                op = cond[1]
-                test_num = cond[2]
-                if test(prop_val, op, test_num):
-                    return True
-
-            return False
-
-        def test(elem_value, op, test_val):
-            if op in {'<', '<=', '>', '>=', '=='}:
-                return eval(str(int(elem_value)) + op + test_val)
-
-        def num(s):
-            try:
-                return int(s)
-            except ValueError:
-                return float(s)
-
-        conditions = conditions.rsplit('&&')
-        conditions = [str(cond).rsplit('||') for cond in conditions]
+        if isinstance(target_properties, basestring):
+            target_properties = [prop.strip() for prop in
+                                 re.split('&&|,', target_properties)]
 
-        sc = self.spills.items()[ucert]
-        result = {}
-
-        for t in target_properties:
-            result[t] = []
-
-        for i in range(0, len(sc)):
-            test_result = True
-
-            for phrase in conditions:
-                if not test_phrase(phrase):
-                    test_result = False
-                    break
-
-            if test_result:
-                for k in result.keys():
-                    n = elem_val(k, i)
-                    result[k].append(n)
+        if step_num is None:
+            sc = self.spills.items()[ucert]
+        else:
+            sc = self._cache.load_timestep(step_num).items()[ucert]
 
-        return result
+        return SpillDataQuery(conditions).select(sc, target_properties)
 
     def add_env(self, env, quash=False):
         for item in env:
@@ -122,6 +122,10 @@ class CurrentMoversBase(CyMover):
 
         return points
 
+    def draws_random(self, sc):
+        'the C++ movers only draw random numbers for the uncertain elements'
+        return sc.uncertain
+
 
 class CatsMoverSchema(CurrentMoversBaseSchema):
     '''static schema for CatsMover'''
@@ -19,6 +19,7 @@ from gnome.cy_gnome.cy_rise_velocity_mover import CyRiseVelocityMover
 from gnome import AddLogger
 from gnome.utilities.inf_datetime import InfTime, MinusInfTime
 from gnome.utilities.projections import FlatEarthProjection
+from gnome.utilities.cell_hints import null_hints
 
 
 class ProcessSchema(MappingSchema):
@@ -223,6 +224,17 @@ class Mover(Process):
 
         return delta
 
+    def draws_random(self, sc):
+        """
+        True if get_move() draws random numbers for spill container sc.
+
+        The model uses it to draw the random numbers for the forecast and
+        the uncertain containers in the same order when it moves them at the
+        same time. Movers that draw none, or only for the uncertain
+        container, override it.
+        """
+        return True
+
 
 class PyMover(Mover):
     def __init__(self,
@@ -261,6 +273,25 @@ class PyMover(Mover):
     def is_data_on_cells(self):
         return self.data.grid.infer_location(self.data.u.data) != 'node'
 
+    def draws_random(self, sc):
+        'the python movers only interpolate the environment'
+        return False
+
+    def cell_hints(self, sc, vel_field, hint_name):
+        """
+        context manager that makes the grid of vel_field look for the
+        elements near the cells they were found in last time -- the
+        hint_name data array of sc. Does nothing if the grid doesn't
+        support it.
+        """
+        grid = getattr(vel_field, 'grid', None)
+
+        if hint_name in sc and hasattr(grid, 'cell_hints'):
+            # the grid updates the hints in place
+            return grid.cell_hints(sc.get_writable(hint_name))
+        else:
+            return null_hints()
+
     def get_delta_Euler(self, sc, time_step, model_time, pos, vel_field):
         vels = vel_field.at(pos, model_time,
                             extrapolate=self.extrapolate)
@@ -141,6 +141,8 @@ class PyCurrentMover(movers.PyMover, serializable.Serializable):
         (super(PyCurrentMover, self)
          .__init__(default_num_method=default_num_method, **kwargs))
 
+        self.array_types.add('current_cell_hint')
+
     def _attach_default_refs(self, ref_dict):
         pass
         return serializable.Serializable._attach_default_refs(self, ref_dict)
@@ -282,7 +284,9 @@ class PyCurrentMover(movers.PyMover, serializable.Serializable):
         positions = sc['positions']
         pos = positions[:]
 
-        res = method(sc, time_step, model_time_datetime, pos, self.current)
+        with self.cell_hints(sc, self.current, 'current_cell_hint'):
+            res = method(sc, time_step, model_time_datetime, pos,
+                         self.current)
 
         if res.shape[1] == 2:
             deltas = np.zeros_like(positions)
@@ -123,7 +123,8 @@ class PyWindMover(movers.PyMover, serializable.Serializable):
 
         self.array_types.update({'windages',
                                  'windage_range',
-                                 'windage_persist'})
+                                 'windage_persist',
+                                 'wind_cell_hint'})
 
     @classmethod
     def from_netCDF(cls,
@@ -190,7 +191,7 @@ class PyWindMover(movers.PyMover, serializable.Serializable):
 
         rand.random_with_persistance(sc['windage_range'][:, 0],
                                      sc['windage_range'][:, 1],
-                                     sc['windages'],
+                                     sc.get_writable('windages'),
                                      sc['windage_persist'],
                                      time_step)
 
@@ -222,7 +223,9 @@ class PyWindMover(movers.PyMover, serializable.Serializable):
         positions = sc['positions']
         pos = positions[:]
 
-        deltas = method(sc, time_step, model_time_datetime, pos, self.wind)
+        with self.cell_hints(sc, self.wind, 'wind_cell_hint'):
+            deltas = method(sc, time_step, model_time_datetime, pos,
+                            self.wind)
         deltas[:, 0] *= sc['windages']
         deltas[:, 1] *= sc['windages']
 
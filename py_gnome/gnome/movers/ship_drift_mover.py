@@ -166,7 +166,7 @@ class ShipDriftMover(Mover, serializable.Serializable):
 
         rand.random_with_persistance(sc['windage_range'][:, 0],
                                      sc['windage_range'][:, 1],
-                                     sc['windages'],
+                                     sc.get_writable('windages'),
                                      sc['windage_persist'],
                                      time_step)
 
@@ -138,3 +138,7 @@ class SimpleMover(Mover, serializable.Serializable):
             delta = proj.meters_to_lonlat(delta, positions)
 
         return delta
+
+    def draws_random(self, sc):
+        'only the uncertain elements get the random moves'
+        return sc.uncertain
@@ -78,6 +78,10 @@ class RiseVelocityMover(CyMover, serializable.Serializable):
         return (self.delta.view(dtype=world_point_type)
                 .reshape((-1, len(world_point))))
 
+    def draws_random(self, sc):
+        'the rise velocities are set when the elements are released'
+        return False
+
 
 class TamocRiseVelocityMover(RiseVelocityMover):
     def __init__(self, *args, **kwargs):
@@ -149,7 +149,7 @@ class WindMoversBase(CyMover):
         if self.active:
             random_with_persistance(sc['windage_range'][:, 0],
                                     sc['windage_range'][:, 1],
-                                    sc['windages'],
+                                    sc.get_writable('windages'),
                                     sc['windage_persist'],
                                     time_step)
 
@@ -174,6 +174,13 @@ class WindMoversBase(CyMover):
         return (self.delta.view(dtype=world_point_type)
                 .reshape((-1, len(world_point))))
 
+    def draws_random(self, sc):
+        '''
+        the windages are drawn in prepare_for_model_step(), and the C++
+        mover only draws random numbers for the uncertain elements
+        '''
+        return sc.uncertain
+
     def _state_as_str(self):
         '''
             Returns a string containing properties of object.
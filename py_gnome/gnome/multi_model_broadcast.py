@@ -18,6 +18,7 @@ from zmq.eventloop import ioloop, zmqstream
 from gnome import GnomeId
 from gnome.environment import Wind
 from gnome.outputters import WeatheringOutput
+from gnome.utilities.shared_ring import SharedRing
 
 
 class ModelConsumer(mp.Process):
@@ -36,16 +37,19 @@ class ModelConsumer(mp.Process):
              )
         - Attempt to perform the registered command.  Registered commands
           are defined as private methods of this class.
-        - Returns the results in a results queue
+        - Returns the results in a results queue.  If there is a shared
+          memory ring, the numpy arrays in the results are passed in it,
+          and only their descriptors are pickled.
 
     '''
     def __init__(self, task_port, model,
-                 ipc_folder='.'):
+                 ipc_folder='.', ring=None):
         mp.Process.__init__(self)
 
         self.task_port = task_port
         self.model = model
         self.ipc_folder = ipc_folder
+        self.ring = ring
 
     def run(self):
         # remove any root handlers else we get IOErrors for shared file
@@ -98,6 +102,9 @@ class ModelConsumer(mp.Process):
                 cmd, args = cmd[:2]
                 res = getattr(self, '_' + cmd)(**args)
 
+                if self.ring is not None:
+                    res = self.ring.pack(res)
+
                 self.stream.send_unicode(dumps(res))
             except Exception:
                 self.stream.send_unicode(dumps(sys.exc_info()))
@@ -144,6 +151,9 @@ class ModelConsumer(mp.Process):
     def _get_spill_amounts(self):
         return [s.amount for s in self.model.spills]
 
+    def _get_spill_property(self, prop_name, ucert=0):
+        return self.model.get_spill_property(prop_name, ucert)
+
     def _set_wind_speed_uncertainty(self, up_or_down):
         winds = [e for e in self.model.environment
                  if isinstance(e, Wind)]
@@ -195,15 +205,22 @@ class ModelBroadcaster(GnomeId):
 
         More specifically, the model variations we are interested in are
         uncertainty variations.
+
+        The numpy arrays in the results of the consumers are passed back in
+        a shared memory ring buffer per consumer, of shared_memory_size
+        bytes.  Set it to 0 to pickle them with the rest of the results.
     '''
     def __init__(self, model,
                  wind_speed_uncertainties,
                  spill_amount_uncertainties,
-                 ipc_folder='.'):
+                 ipc_folder='.',
+                 shared_memory_size=16 * 2 ** 20):
         self.model = model
         self.ipc_folder = ipc_folder
+        self.shared_memory_size = shared_memory_size
         self.context = None
         self.consumers = []
+        self.rings = []
         self.tasks = []
         self.lookup = {}
 
@@ -266,11 +283,11 @@ class ModelBroadcaster(GnomeId):
 
         if idx is not None:
             self.tasks[idx].send(request)
-            return loads(self.tasks[idx].recv())
+            return self._recv(idx)
         elif uncertainty_values is not None:
             idx = self.lookup[uncertainty_values]
             self.tasks[idx].send(request)
-            return loads(self.tasks[idx].recv())
+            return self._recv(idx)
         else:
             out = []
 
@@ -283,15 +300,15 @@ class ModelBroadcaster(GnomeId):
                 [t.send(request) for t in self.tasks]
 
                 try:
-                    out = [loads(t.recv()) for t in self.tasks]
+                    out = [self._recv(i) for i in range(len(self.tasks))]
                 except zmq.Again:
                     self.logger.warning('Broadcaster command has timed out!')
                     self.stop()
                     out = None
             else:
-                for t in self.tasks:
+                for i, t in enumerate(self.tasks):
                     t.send(request)
-                    out.append(loads(t.recv()))
+                    out.append(self._recv(i))
 
             if timeout is not None:
                 [t.setsockopt(zmq.RCVTIMEO, time)
@@ -299,6 +316,18 @@ class ModelBroadcaster(GnomeId):
 
             return out
 
+    def _recv(self, idx):
+        '''
+            receive the result of a command from a subprocess, with the
+            arrays it passed in shared memory copied out of it.
+        '''
+        res = loads(self.tasks[idx].recv())
+
+        if self.rings[idx] is not None:
+            res = self.rings[idx].unpack(res)
+
+        return res
+
     def stop(self):
         if len(self.tasks) > 0:
             try:
@@ -317,6 +346,7 @@ class ModelBroadcaster(GnomeId):
             self.context.destroy()
 
             self.consumers = []
+            self.rings = []
             self.tasks = []
             self.lookup = {}
 
@@ -334,9 +364,18 @@ class ModelBroadcaster(GnomeId):
 
     def _spawn_consumers(self):
         for p in self.task_ports:
-            model_consumer = ModelConsumer(p, self.model, self.ipc_folder)
+            # the ring is shared with the consumer when it is started
+            if self.shared_memory_size > 0:
+                ring = SharedRing(self.shared_memory_size)
+            else:
+                ring = None
+
+            model_consumer = ModelConsumer(p, self.model, self.ipc_folder,
+                                           ring=ring)
             model_consumer.start()
+
             self.consumers.append(model_consumer)
+            self.rings.append(ring)
 
     def _spawn_tasks(self):
         self.context = zmq.Context()
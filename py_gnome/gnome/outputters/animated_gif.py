@@ -146,6 +146,6 @@ class Animation(Renderer):
         self.draw_timestamp(time_stamp)
         self.save_foreground_frame(self.animation, self.delay)
 
-    def write_output_post_run(self, **kwargs):
+    def finish_output(self):
         print 'closing animation'
         self.animation.close_anim()
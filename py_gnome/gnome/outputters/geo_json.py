@@ -10,7 +10,7 @@ from collections import Iterable
 import numpy as np
 
 from geojson import (Feature, FeatureCollection, dump,
-                     Point, MultiPolygon)
+                     MultiPolygon)
 
 from colander import SchemaNode, String, drop, Int, Bool
 
@@ -130,32 +130,34 @@ class TrajectoryGeoJsonOutput(Outputter, Serializable):
         uc_features = []
 
         for sc in self.cache.load_timestep(step_num).items():
-            position = self._dataarray_p_types(sc['positions'])
-            status = self._dataarray_p_types(sc['status_codes'])
-            mass = self._dataarray_p_types(sc['mass'])
-
             sc_type = 'uncertain' if sc.uncertain else 'forecast'
-            spill_num = self._dataarray_p_types(sc['spill_num'])
-
-            # break elements into multipoint features based on their
-            # status code
-            #   evaporated : 10
-            #   in_water : 2
-            #   not_released : 0
-            #   off_maps : 7
-            #   on_land : 3
-            #   to_be_removed : 12
-            for ix, pos in enumerate(position):
-                feature = Feature(geometry=Point(pos[:2]), id=ix,
-                                  properties={'status_code': status[ix],
-                                              'sc_type': sc_type,
-                                              'mass': mass[ix],
-                                              'spill_num': spill_num[ix]}
-                                  )
-                if sc.uncertain:
-                    uc_features.append(feature)
-                else:
-                    c_features.append(feature)
+
+            # the values of the features, made from the data arrays at once
+            columns = (self._dataarray_p_types(sc['positions'][:, 0]),
+                       self._dataarray_p_types(sc['positions'][:, 1]),
+                       self._dataarray_p_types(sc['status_codes']),
+                       self._dataarray_p_types(sc['spill_num']),
+                       self._dataarray_p_types(sc['mass']))
+
+            # same as Feature(geometry=Point(pos[:2]), id=ix,
+            #                 properties={...}) but without making the geojson
+            # objects, or checking the coordinates. The same features are
+            # returned to the web client and written to the file.
+            features = [{'type': 'Feature',
+                         'id': ix,
+                         'geometry': {'type': 'Point',
+                                      'coordinates': [lon, lat]},
+                         'properties': {'status_code': status,
+                                        'sc_type': sc_type,
+                                        'mass': mass,
+                                        'spill_num': spill_num}}
+                        for ix, (lon, lat, status, spill_num,
+                                 mass) in enumerate(zip(*columns))]
+
+            if sc.uncertain:
+                uc_features = features
+            else:
+                c_features = features
 
         c_geojson = FeatureCollection(c_features)
         uc_geojson = FeatureCollection(uc_features)
@@ -174,15 +176,18 @@ class TrajectoryGeoJsonOutput(Outputter, Serializable):
         return output_info
 
     def output_to_file(self, json_content, step_num):
-        file_format = 'geojson_{0:06d}.geojson'
-        filename = os.path.join(self.output_dir,
-                                file_format.format(step_num))
+        filename = self._output_filename(step_num)
 
         with open(filename, 'w+') as outfile:
             dump(json_content, outfile, indent=True)
 
         return filename
 
+    def _output_filename(self, step_num):
+        file_format = 'geojson_{0:06d}.geojson'
+
+        return os.path.join(self.output_dir, file_format.format(step_num))
+
     def _dataarray_p_types(self, data_array):
         '''
         return array as list with appropriate python dtype
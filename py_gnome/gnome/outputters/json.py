@@ -2,11 +2,17 @@
 JSON outputter
 Does not contain a schema for persistence yet
 '''
+from __future__ import absolute_import
+
 import copy
+import json
+import struct
 from collections import Iterable
 
 import numpy as np
 
+from colander import SchemaNode, Bool, drop
+
 from gnome.utilities.time_utils import date_to_sec
 from gnome.utilities.serializable import Serializable, Field
 
@@ -15,7 +21,8 @@ from gnome.persist import class_from_objtype
 
 from .outputter import Outputter, BaseSchema
 class SpillJsonSchema(BaseSchema):
-    pass
+    binary = SchemaNode(Bool(), missing=drop)
+    delta = SchemaNode(Bool(), missing=drop)
 
 
 class SpillJsonOutput(Outputter, Serializable):
@@ -45,13 +52,70 @@ class SpillJsonOutput(Outputter, Serializable):
             "step_num": <STEP_NUM>
             "timestamp": <TIMESTAMP>
         }
+
+    If binary is True, the lists for "certain" and "uncertain" have the
+    elements of each spill container as a string of bytes instead of a dict.
+    It starts with the length of a JSON header, as a little-endian uint32,
+    then the header, then the data of each column:
+    ::
+
+        {
+            "length": <LENGTH>,
+            "step_num": <STEP_NUM>,
+            "base_step": <STEP_NUM OF THE DELTAS, OR null>,
+            "columns": [{"name": "longitude",
+                         "dtype": "<f4",
+                         "offset": <BYTES FROM THE END OF THE HEADER>,
+                         "delta_length": <NUMBER OF DELTAS>},
+                        ...]
+        }
+
+    The columns are longitude, latitude, status, mass and spill_num, as
+    little-endian float32 and int16. The offsets are multiples of 4.
+
+    If delta is True too, the first delta_length values of a column are the
+    change from the values of the same elements in the output of base_step.
+    That is the last step output: the elements in it are at the start of
+    the arrays, in the same order. The changes are mostly small, so they
+    compress better. The values are float32 sums -- the previous value plus
+    the change is the new value exactly.
     '''
     _state = copy.deepcopy(Outputter._state)
+    _state += [Field('binary', update=True, save=True),
+               Field('delta', update=True, save=True)]
 
     # need a schema and also need to override save so output_dir
     # is saved correctly - maybe point it to saveloc
     _schema = SpillJsonSchema
 
+    # the columns of the binary output, and their dtypes
+    binary_columns = [('longitude', '<f4'),
+                      ('latitude', '<f4'),
+                      ('status', '<i2'),
+                      ('mass', '<f4'),
+                      ('spill_num', '<i2')]
+
+    # the columns that can be sent as the change from the last step
+    delta_columns = ('longitude', 'latitude', 'mass')
+
+    def __init__(self, binary=False, delta=False, **kwargs):
+        '''
+        :param bool binary=False: output the elements as column buffers
+            instead of lists
+        :param bool delta=False: in binary output, send the change from the
+            last step for the elements that were in it
+
+        use super to pass optional \*\*kwargs to base class __init__ method
+        '''
+        self.binary = binary
+        self.delta = delta
+
+        # (step_num, ids, columns) of the last binary output, for each
+        # spill container
+        self._last_output = {}
+
+        super(SpillJsonOutput, self).__init__(**kwargs)
+
     def write_output(self, step_num, islast_step=False):
         'dump data in geojson format'
         super(SpillJsonOutput, self).write_output(step_num,
@@ -67,6 +131,14 @@ class SpillJsonOutput(Outputter, Serializable):
         uncertain_scs = []
 
         for sc in self.cache.load_timestep(step_num).items():
+            if self.binary:
+                if sc.uncertain:
+                    uncertain_scs.append(self._binary_output(sc, step_num))
+                else:
+                    certain_scs.append(self._binary_output(sc, step_num))
+
+                continue
+
             position = sc['positions']
             longitude = np.around(position[:,0], 4).tolist()
             latitude = np.around(position[:,1], 4).tolist()
@@ -110,6 +182,108 @@ class SpillJsonOutput(Outputter, Serializable):
 
         return output_info
 
+    def _binary_output(self, sc, step_num):
+        '''
+        the elements of spill container sc in the binary format
+        '''
+        positions = sc['positions']
+        arrays = {'longitude': positions[:, 0],
+                  'latitude': positions[:, 1],
+                  'status': sc['status_codes'],
+                  'mass': sc['mass'],
+                  'spill_num': sc['spill_num']}
+
+        ids = sc['id']
+
+        # number of elements at the start that were in the last output
+        num_same = 0
+        base_step = None
+
+        last = self._last_output.get(sc.uncertain)
+        if self.delta and last is not None:
+            base_step, last_ids, last_columns = last
+
+            if (len(last_ids) <= len(ids) and
+                    np.array_equal(last_ids, ids[:len(last_ids)])):
+                num_same = len(last_ids)
+
+        header_columns = []
+        buffers = []
+        columns = {}
+        offset = 0
+
+        for name, dtype in self.binary_columns:
+            data = np.asarray(arrays[name]).astype(dtype)
+            columns[name] = data
+
+            delta_length = 0
+            if name in self.delta_columns and num_same > 0:
+                last_data = last_columns[name]
+                change = data[:num_same] - last_data
+
+                # only if adding it gives the value exactly
+                if np.array_equal(last_data + change, data[:num_same]):
+                    data = data.copy()
+                    data[:num_same] = change
+                    delta_length = num_same
+
+            header_columns.append({'name': name,
+                                   'dtype': dtype,
+                                   'offset': offset,
+                                   'delta_length': delta_length})
+
+            buf = data.tostring()
+            buf += '\0' * (-len(buf) % 4)
+
+            buffers.append(buf)
+            offset += len(buf)
+
+        self._last_output[sc.uncertain] = (step_num, ids.copy(), columns)
+
+        header = json.dumps({'length': len(sc),
+                             'step_num': step_num,
+                             'base_step': base_step if num_same else None,
+                             'columns': header_columns})
+        header += ' ' * (-len(header) % 4)
+
+        return struct.pack('<I', len(header)) + header + ''.join(buffers)
+
+    @classmethod
+    def read_binary_output(cls, payload, last=None):
+        '''
+        read the elements of a spill container from the binary output
+
+        :param payload: the bytes of the binary output
+        :param last: dict of the columns read from the output of the step the
+            changes are from, if it has changes
+
+        :returns: (header, dict of the column arrays)
+        '''
+        header_len = struct.unpack('<I', payload[:4])[0]
+        header = json.loads(payload[4:4 + header_len])
+
+        data_start = 4 + header_len
+        columns = {}
+
+        for col in header['columns']:
+            data = np.frombuffer(payload, dtype=col['dtype'],
+                                 count=header['length'],
+                                 offset=data_start + col['offset']).copy()
+
+            num = col['delta_length']
+            if num:
+                data[:num] += last[col['name']][:num]
+
+            columns[col['name']] = data
+
+        return header, columns
+
+    def rewind(self):
+        'forget the last output, so the next has no changes'
+        super(SpillJsonOutput, self).rewind()
+
+        self._last_output = {}
+
 
 class CurrentJsonSchema(BaseSchema):
     '''
@@ -3,6 +3,8 @@ kmz  outputter
 """
 import copy
 import os
+import time
+import zlib
 from datetime import timedelta, datetime
 import zipfile
 import base64
@@ -26,6 +28,66 @@ class KMZSchema(BaseSchema):
     filename = SchemaNode(String(), missing=drop)
 
 
+class _ZipEntryStream(object):
+    '''
+    A file in a zip file that is written a piece at a time, so all of it is
+    never in memory. It is written the way ZipFile.write() copies a file from
+    disk: the compressed data follows the header, then the header is written
+    again with the CRC and sizes.
+
+    Nothing else can be written to the zip file until it is closed.
+    '''
+    def __init__(self, zipf, arcname):
+        self.zipf = zipf
+
+        zinfo = zipfile.ZipInfo(arcname, time.localtime(time.time())[:6])
+        zinfo.external_attr = 0600 << 16
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.header_offset = zipf.fp.tell()
+        zinfo.CRC = 0
+        zinfo.file_size = 0
+        zinfo.compress_size = 0
+
+        self.zinfo = zinfo
+
+        # the size isn't known, so leave room for big ones
+        self._zip64 = zipf._allowZip64
+
+        zipf.fp.write(zinfo.FileHeader(self._zip64))
+
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                            zlib.DEFLATED, -15)
+
+    def write(self, data):
+        zinfo = self.zinfo
+
+        zinfo.file_size += len(data)
+        zinfo.CRC = zlib.crc32(data, zinfo.CRC) & 0xffffffff
+
+        data = self._compressor.compress(data)
+        zinfo.compress_size += len(data)
+
+        self.zipf.fp.write(data)
+
+    def close(self):
+        'finish the file, and add it to the zip file'
+        zinfo = self.zinfo
+        fp = self.zipf.fp
+
+        data = self._compressor.flush()
+        zinfo.compress_size += len(data)
+        fp.write(data)
+
+        position = fp.tell()
+        fp.seek(zinfo.header_offset, 0)
+        fp.write(zinfo.FileHeader(self._zip64))
+        fp.seek(position, 0)
+
+        self.zipf.filelist.append(zinfo)
+        self.zipf.NameToInfo[zinfo.filename] = zinfo
+        self.zipf._didModify = True
+
+
 class KMZOutput(Outputter, Serializable):
     '''
     class that outputs GNOME results in a kmz format.
@@ -57,6 +119,10 @@ class KMZOutput(Outputter, Serializable):
         self.filename = filename + ".kmz"
         self.kml_name = os.path.split(filename)[-1] + ".kml"
 
+        # the kmz file, and the kml in it, while they are written
+        self._kmz = None
+        self._kml = None
+
         super(KMZOutput, self).__init__(**kwargs)
 
     def prepare_for_model_run(self,
@@ -106,14 +172,21 @@ class KMZOutput(Outputter, Serializable):
         # shouldn't be required if the above worked!
         self._file_exists_error(self.filename)
 
-        # create a list to hold what will be the contents of the kml
-        self.kml = [kmz_templates.header_template
-                    .format(caveat=kmz_templates.caveat,
-                            kml_name=self.kml_name,
-                            valid_timestring=model_start_time.strftime(self.time_formatter),
-                            issued_timestring=datetime.now().strftime(self.time_formatter),
-                            )
-                    ]
+        # the kml is written to the kmz file a step at a time
+        self._kmz = zipfile.ZipFile(self.filename, 'w',
+                                    compression=zipfile.ZIP_DEFLATED,
+                                    allowZip64=True)
+        self._kmz.writestr('dot.png', base64.b64decode(DOT))
+        self._kmz.writestr('x.png', base64.b64decode(X))
+
+        self._kml = _ZipEntryStream(self._kmz, self.kml_name)
+        self._kml.write(kmz_templates.header_template
+                        .format(caveat=kmz_templates.caveat,
+                                kml_name=self.kml_name,
+                                valid_timestring=model_start_time.strftime(self.time_formatter),
+                                issued_timestring=datetime.now().strftime(self.time_formatter),
+                                )
+                        .encode('utf8'))
 
         # netcdf outputter has this --  not sure why
         # self._middle_of_run = True
@@ -126,7 +199,7 @@ class KMZOutput(Outputter, Serializable):
         if not self.on or not self._write_step:
             return None
 
-        # add to the kml list:
+        # add to the kml:
         for sc in self.cache.load_timestep(step_num).items():
             # loop through uncertain and certain LEs
             # extract the data
@@ -144,22 +217,16 @@ class KMZOutput(Outputter, Serializable):
             water_positions = positions[sc['status_codes'] == oil_status.in_water]
             beached_positions = positions[sc['status_codes'] == oil_status.on_land]
 
-            self.kml.append(kmz_templates.build_one_timestep(water_positions,
+            self._kml.write(kmz_templates.build_one_timestep(water_positions,
                                                              beached_positions,
                                                              start_time,
                                                              end_time,
                                                              sc.uncertain
-                                                             ))
-
-        if islast_step:  # now we really write the file:
-            self.kml.append(kmz_templates.footer)
+                                                             ).encode('utf8'))
 
-            with zipfile.ZipFile(self.filename, 'w',
-                                 compression=zipfile.ZIP_DEFLATED) as kmzfile:
-                kmzfile.writestr('dot.png', base64.b64decode(DOT))
-                kmzfile.writestr('x.png', base64.b64decode(X))
-                kmzfile.writestr(self.kml_name,
-                                 "".join(self.kml).encode('utf8'))
+        if islast_step:  # now we finish the file:
+            self._kml.write(kmz_templates.footer.encode('utf8'))
+            self._close_kmz()
 
         output_info = {'time_stamp': sc.current_time_stamp.isoformat(),
                        'output_filename': self.filename}
@@ -173,9 +240,43 @@ class KMZOutput(Outputter, Serializable):
         '''
         super(KMZOutput, self).rewind()
 
+        if self._kmz is not None:
+            # the run didn't get to the last step
+            self._close_kmz()
+            self.delete_output_files()
+
         self._middle_of_run = False
         self._start_idx = 0
 
+    def _close_kmz(self):
+        try:
+            self._kml.close()
+        finally:
+            self._kmz.close()
+
+        self._kmz = None
+        self._kml = None
+
+    def __deepcopy__(self, memo):
+        '''
+        the kmz file that is being written is not copied
+        '''
+        kmz, kml = self._kmz, self._kml
+        self._kmz = self._kml = None
+
+        try:
+            return super(KMZOutput, self).__deepcopy__(memo)
+        finally:
+            self._kmz, self._kml = kmz, kml
+
+    def __getstate__(self):
+        'the kmz file that is being written is not pickled'
+        odict = self.__dict__.copy()
+        odict['_kmz'] = None
+        odict['_kml'] = None
+
+        return odict
+
     def delete_output_files(self):
         '''
         deletes ouput files that may be around
@@ -1,6 +1,7 @@
 """
 templates for the kmz  outputter
 """
+import numpy as np
 
 caveat = ("This trajectory was produced by GNOME "
           "(General NOAA Operational Modeling Environment), "
@@ -113,6 +114,10 @@ point_template = """             <Point>
              </Point>
 """
 
+# point_template as a % format, so all the points of a step can be made with
+# one formatting
+point_format = point_template.replace('{:.6f}', '%.6f')
+
 
 timestep_header_template = """<Folder>
   <name>{date_string}:{certain}</name>
@@ -165,8 +170,7 @@ def build_one_timestep(floating_positions,
         data['status'] = status
         kml.append(one_run_header.format(**data))
 
-        for point in positions:
-            kml.append(point_template.format(*point[:2]))
+        kml.append(points_kml(positions))
 
         kml.append(one_run_footer)
 
@@ -175,6 +179,23 @@ def build_one_timestep(floating_positions,
     return "".join(kml)
 
 
+def points_kml(positions):
+    '''
+    the kml for the points at positions -- the same as point_template for
+    each one
+
+    :param positions: sequence of (longitude, latitude, ...) of the points
+    '''
+    positions = np.asarray(positions, dtype=np.float64)
+
+    if len(positions) == 0:
+        return ""
+
+    coords = positions[:, :2].ravel().tolist()
+
+    return (point_format * len(positions)) % tuple(coords)
+
+
 footer = """
   </Document>
 </kml>
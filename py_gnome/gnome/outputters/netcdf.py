@@ -98,10 +98,62 @@ class NetCDFOutputSchema(BaseSchema):
     netcdf_filename = SchemaNode(String(), missing=drop)
     all_data = SchemaNode(Bool(), missing=drop)
     compress = SchemaNode(Bool(), missing=drop)
+    buffer_steps = SchemaNode(Int(), missing=drop)
     _start_idx = SchemaNode(Int(), missing=drop)
     _middle_of_run = SchemaNode(Bool(), missing=drop)
 
 
+class _StepBuffer(object):
+    '''
+    The output of the time steps that haven't been written to one of the
+    files yet, and the open file they go in.
+    '''
+    def __init__(self, rootgrp):
+        self.rootgrp = rootgrp
+
+        # where the next steps written go in the file
+        self.time_idx = len(rootgrp.variables['time'])
+        self.data_idx = len(rootgrp.dimensions['data'])
+
+        self.clear()
+
+    def __len__(self):
+        return len(self.times)
+
+    def clear(self):
+        self.times = []
+        self.counts = []
+        self.arrays = {}
+        self.mass_balance = []
+
+    @property
+    def end_idx(self):
+        'where the data of the next step will go'
+        return self.data_idx + sum(self.counts)
+
+    def add(self, sc, var_names):
+        '''
+        add the data of spill container sc. The arrays are copied so the
+        cache can reuse them.
+        '''
+        self.times.append(sc.current_time_stamp)
+        self.counts.append(len(sc))
+
+        for var_name in var_names:
+            if var_name == 'longitude':
+                data = sc['positions'][:, 0]
+            elif var_name == 'latitude':
+                data = sc['positions'][:, 1]
+            elif var_name == 'depth':
+                data = sc['positions'][:, 2]
+            else:
+                data = sc[var_name]
+
+            self.arrays.setdefault(var_name, []).append(np.array(data))
+
+        self.mass_balance.append(dict(sc.mass_balance))
+
+
 class NetCDFOutput(Outputter, Serializable):
     """
     A NetCDFOutput object is used to write the model's data to a NetCDF file.
@@ -180,6 +232,7 @@ class NetCDFOutput(Outputter, Serializable):
                       Field('which_data', save=True, update=True),
                       # Field('netcdf_format', save=True, update=True),
                       Field('compress', save=True, update=True),
+                      Field('buffer_steps', save=True, update=True),
                       Field('_start_idx', save=True),
                       Field('_middle_of_run', save=True),
                       ])
@@ -189,6 +242,7 @@ class NetCDFOutput(Outputter, Serializable):
                  netcdf_filename,
                  which_data='standard',
                  compress=True,
+                 buffer_steps=10,
                  **kwargs):
         """
         Constructor for Net_CDFOutput object. It reads data from cache and
@@ -208,6 +262,12 @@ class NetCDFOutput(Outputter, Serializable):
             attributes
         :type which_data: string -- one of {'standard', 'most', 'all'}
 
+        :param buffer_steps=10: number of time steps of output that are kept
+            in memory, and written to the file together. The files stay open
+            for the whole run, and everything is written when the last step
+            is output, or the model is rewound.
+        :type buffer_steps: int
+
         Optional arguments passed on to base class (kwargs):
 
         :param cache: sets the cache object from which to read data. The model
@@ -260,12 +320,18 @@ class NetCDFOutput(Outputter, Serializable):
         else:
             raise ValueError('compress must be one of: {True, False}')
 
-        # 1k is about right for 1000LEs and one time step.
-        # up to 0.5MB tested better for large datasets, but
-        # we don't want to have far-too-large files for the
-        # smaller ones
-        # The default in netcdf4 is 1 -- which works really badly
-        self._chunksize = 1024
+        # None means the chunksize of the data variables is set from the
+        # number of elements in the spills in prepare_for_model_run
+        self._chunksize = None
+
+        if buffer_steps < 1:
+            raise ValueError('buffer_steps must be at least 1')
+
+        self.buffer_steps = buffer_steps
+
+        # the open files, and the output that hasn't been written to them,
+        # keyed by filename
+        self._buffers = {}
 
         # need to keep track of starting index for writing data since variable
         # number of particles are released
@@ -327,6 +393,10 @@ class NetCDFOutput(Outputter, Serializable):
 
     @property
     def chunksize(self):
+        '''
+        length of the chunks of the data variables. If None, it is set from
+        the number of elements in the spills.
+        '''
         return self._chunksize
 
     @chunksize.setter
@@ -368,6 +438,28 @@ class NetCDFOutput(Outputter, Serializable):
                                                  .format(self._model_start_time
                                                          .isoformat()))
 
+    def _data_chunksize(self, spills):
+        '''
+        length of the chunks of the data variables
+
+        A chunk of about one time step of elements is read or written at
+        once. 1k is about right for 1000LEs and one time step. Up to 0.5MB
+        tested better for large datasets, but we don't want to have
+        far-too-large files for the smaller ones.
+        The default in netcdf4 is 1 -- which works really badly
+        '''
+        if self._chunksize is not None:
+            return self._chunksize
+
+        num_elements = 0
+        for sc in spills.items():
+            if not sc.uncertain:
+                num_elements = sum([getattr(spill, 'num_elements', None) or 0
+                                    for spill in sc.spills])
+
+        # 64k elements is 0.5MB of float64
+        return int(min(max(num_elements, 1024), 64 * 1024))
+
     def _initialize_rootgrp(self, rootgrp, sc):
         'create dimensions for root group and set cf_attributes'
         # fixme: why remove the "T" ??
@@ -468,6 +560,8 @@ class NetCDFOutput(Outputter, Serializable):
 
         self._update_var_attributes(spills)
 
+        chunksize = self._data_chunksize(spills)
+
         for sc in self.sc_pair.items():
             if sc.uncertain:
                 file_ = self._u_netcdf_filename
@@ -476,8 +570,10 @@ class NetCDFOutput(Outputter, Serializable):
 
             self._file_exists_error(file_)
 
-            # create the netcdf files and write the standard stuff:
-            with nc.Dataset(file_, 'w', format=self._format) as rootgrp:
+            # create the netcdf files and write the standard stuff. They are
+            # kept open for writing the output
+            rootgrp = nc.Dataset(file_, 'w', format=self._format)
+            try:
                 self._initialize_rootgrp(rootgrp, sc)
 
                 # create a dict with dims {2: 'two', 3: 'three' ...}
@@ -488,9 +584,9 @@ class NetCDFOutput(Outputter, Serializable):
 
                 # create the time/particle_count variables
                 self._create_nc_var(rootgrp, 'time', np.float64,
-                                    ('time', ), (self._chunksize,))
+                                    ('time', ), (1024,))
                 self._create_nc_var(rootgrp, 'particle_count', np.int32,
-                                    ('time', ), (self._chunksize,))
+                                    ('time', ), (1024,))
 
                 self._update_arrays_to_output(sc)
 
@@ -500,7 +596,7 @@ class NetCDFOutput(Outputter, Serializable):
                         # these don't  map directly to an array_type
                         dt = world_point_type
                         shape = ('data', )
-                        chunksz = (self._chunksize,)
+                        chunksz = (chunksize,)
                     else:
                         # in prepare_for_model_run, nothing is released but
                         # numpy arrays are initialized with 0 elements so use
@@ -511,11 +607,11 @@ class NetCDFOutput(Outputter, Serializable):
 
                         if len(sc[var_name].shape) == 1:
                             shape = ('data',)
-                            chunksz = (self._chunksize,)
+                            chunksz = (chunksize,)
                         else:
                             y_sz = d_dims[sc[var_name].shape[1]]
                             shape = ('data', y_sz)
-                            chunksz = (self._chunksize, sc[var_name].shape[1])
+                            chunksz = (chunksize, sc[var_name].shape[1])
 
                     self._create_nc_var(rootgrp, var_name, dt, shape, chunksz)
 
@@ -533,6 +629,11 @@ class NetCDFOutput(Outputter, Serializable):
                                             dtype='float',
                                             shape=('time',),
                                             chunksz=(256,))
+            except Exception:
+                rootgrp.close()
+                raise
+
+            self._buffers[file_] = _StepBuffer(rootgrp)
 
         # need to keep track of starting index for writing data since variable
         # number of particles are released
@@ -588,6 +689,10 @@ class NetCDFOutput(Outputter, Serializable):
         """
         Write NetCDF output at the end of the step
 
+        The output is kept in memory until buffer_steps steps are buffered,
+        then they are written together. The files are closed after the last
+        step.
+
         :param int step_num: the model step number you want rendered.
         :param bool islast_step: Default is False.
                                  Flag that indicates that step_num is
@@ -599,57 +704,114 @@ class NetCDFOutput(Outputter, Serializable):
         """
         super(NetCDFOutput, self).write_output(step_num, islast_step)
 
-        if self.on is False or not self._write_step:
+        if self.on is False:
             return None
 
-        for sc in self.cache.load_timestep(step_num).items():
-            if sc.uncertain and self._u_netcdf_filename is not None:
-                file_ = self._u_netcdf_filename
-            else:
-                file_ = self.netcdf_filename
+        output = None
+        if self._write_step:
+            for sc in self.cache.load_timestep(step_num).items():
+                if sc.uncertain and self._u_netcdf_filename is not None:
+                    file_ = self._u_netcdf_filename
+                else:
+                    file_ = self.netcdf_filename
 
-            time_stamp = sc.current_time_stamp
+                time_stamp = sc.current_time_stamp
 
-            with nc.Dataset(file_, 'a') as rootgrp:
-                rg_vars = rootgrp.variables
-                idx = len(rg_vars['time'])
+                buf = self._buffer(file_)
+                buf.add(sc, self.arrays_to_output)
 
-                rg_vars['time'][idx] = nc.date2num(time_stamp,
-                                                   rg_vars['time'].units,
-                                                   rg_vars['time'].calendar)
-                pc = rg_vars['particle_count']
-                pc[idx] = len(sc)
+                if len(buf) >= self.buffer_steps:
+                    self._write_buffer(buf)
 
-                _end_idx = self._start_idx + pc[idx]
+                # set _start_idx for the next timestep
+                self._start_idx = buf.end_idx
 
-                # add the data:
-                for var_name in self.arrays_to_output:
-                    # special case positions:
-                    if var_name == 'longitude':
-                        rg_vars['longitude'][self._start_idx:_end_idx] = sc['positions'][:, 0]
-                    elif var_name == 'latitude':
-                        rg_vars['latitude'][self._start_idx:_end_idx] = sc['positions'][:, 1]
-                    elif var_name == 'depth':
-                        rg_vars['depth'][self._start_idx:_end_idx] = sc['positions'][:, 2]
-                    else:
-                        rg_vars[var_name][self._start_idx:_end_idx] = sc[var_name]
+            output = {'netcdf_filename': (self.netcdf_filename,
+                                          self._u_netcdf_filename),
+                      'time_stamp': time_stamp}
 
-                # write mass_balance data
-                if sc.mass_balance:
-                    grp = rootgrp.groups['mass_balance']
-                    for key, val in sc.mass_balance.iteritems():
-                        if key not in grp.variables:
-                            self._create_nc_var(grp,
-                                                key, 'float', ('time', ),
-                                                (self._chunksize,)
-                                                )
+        if islast_step:
+            self.close_files()
+
+        return output
+
+    def _buffer(self, file_):
+        'the _StepBuffer of file_ -- the file is opened if it is not open'
+        if file_ not in self._buffers:
+            self._buffers[file_] = _StepBuffer(nc.Dataset(file_, 'a'))
+
+        return self._buffers[file_]
+
+    def _write_buffer(self, buf):
+        'write the buffered steps to the file -- one slice of each variable'
+        if len(buf) == 0:
+            return
+
+        rg_vars = buf.rootgrp.variables
+
+        t_start = buf.time_idx
+        t_end = t_start + len(buf)
+
+        rg_vars['time'][t_start:t_end] = nc.date2num(buf.times,
+                                                     rg_vars['time'].units,
+                                                     rg_vars['time'].calendar)
+        rg_vars['particle_count'][t_start:t_end] = buf.counts
+
+        _start_idx = buf.data_idx
+        _end_idx = buf.end_idx
+
+        if _end_idx > _start_idx:
+            for var_name, arrays in buf.arrays.iteritems():
+                rg_vars[var_name][_start_idx:_end_idx] = np.concatenate(arrays)
+
+        # write mass_balance data
+        keys = []
+        for mass_balance in buf.mass_balance:
+            keys.extend([k for k in mass_balance if k not in keys])
+
+        if keys:
+            grp = buf.rootgrp.groups['mass_balance']
+
+            for key in keys:
+                if key not in grp.variables:
+                    self._create_nc_var(grp, key, 'float', ('time', ), (256,))
+
+                steps = [(t_start + i, mass_balance[key])
+                         for i, mass_balance in enumerate(buf.mass_balance)
+                         if key in mass_balance]
+
+                if len(steps) == len(buf):
+                    grp.variables[key][t_start:t_end] = [v for i, v in steps]
+                else:
+                    for idx, val in steps:
                         grp.variables[key][idx] = val
 
-        self._start_idx = _end_idx  # set _start_idx for the next timestep
+        buf.time_idx = t_end
+        buf.data_idx = _end_idx
+        buf.clear()
 
-        return {'netcdf_filename': (self.netcdf_filename,
-                                    self._u_netcdf_filename),
-                'time_stamp': time_stamp}
+    def flush(self):
+        '''
+        write the buffered output to the files, so they can be read in the
+        middle of a run
+        '''
+        for buf in self._buffers.values():
+            self._write_buffer(buf)
+            buf.rootgrp.sync()
+
+    def close_files(self):
+        '''
+        write the buffered output, and close the files
+
+        called after the last step is output, and by rewind()
+        '''
+        buffers, self._buffers = self._buffers, {}
+
+        for buf in buffers.values():
+            try:
+                self._write_buffer(buf)
+            finally:
+                buf.rootgrp.close()
 
     def clean_output_files(self):
         '''
@@ -659,6 +821,8 @@ class NetCDFOutput(Outputter, Serializable):
 
         here in case it needs to be called from elsewhere
         '''
+        self.close_files()
+
         try:
             os.remove(self.netcdf_filename)
         except OSError:
@@ -676,9 +840,30 @@ class NetCDFOutput(Outputter, Serializable):
         '''
         super(NetCDFOutput, self).rewind()
 
+        self.close_files()
+
         self._middle_of_run = False
         self._start_idx = 0
 
+    def __deepcopy__(self, memo):
+        '''
+        the open files are not copied -- the copy opens them again if it
+        writes any output
+        '''
+        buffers, self._buffers = self._buffers, {}
+
+        try:
+            return super(NetCDFOutput, self).__deepcopy__(memo)
+        finally:
+            self._buffers = buffers
+
+    def __getstate__(self):
+        'the open files are not pickled'
+        odict = self.__dict__.copy()
+        odict['_buffers'] = {}
+
+        return odict
+
     @classmethod
     def read_data(klass,
                   netcdf_file,
@@ -19,6 +19,37 @@ from gnome.persist import base_schema, extend_colander, validators
 from gnome.utilities.serializable import Serializable, Field
 
 
+def post_run_steps(cache, model_start_time, num_time_steps):
+    """
+    Goes through the steps of a run that is in the cache, the way
+    Model.step() does, for writing the output after the run.
+
+    :param cache: the cache the run is in
+    :param model_start_time: start time of the model run
+    :param num_time_steps: the number of steps in the run
+
+    :returns: generator of (step_num, time_step, model_time, islast_step)
+        tuples. time_step is the length of the step in seconds, for the
+        outputters' prepare_for_model_step() -- it is None for the first and
+        last steps, which are not prepared.
+    """
+    model_time = model_start_time
+
+    for step_num in range(num_time_steps):
+        time_stamp = (cache.load_timestep(step_num).items()[0]
+                      .current_time_stamp)
+
+        if step_num > 0 and step_num < num_time_steps - 1:
+            time_step = (time_stamp - model_time).seconds
+        else:
+            time_step = None
+
+        yield (step_num, time_step, model_time,
+               step_num == num_time_steps - 1)
+
+        model_time = time_stamp
+
+
 class BaseSchema(base_schema.ObjType, MappingSchema):
     'Base schema for all outputters - they all contain the following'
     on = SchemaNode(Bool(), missing=drop)
@@ -297,6 +328,15 @@ class Outputter(Serializable):
         self._write_step = True
         self._is_first_output = True
 
+    def finish_output(self):
+        """
+        Called by write_output_post_run() after the last step is written.
+
+        Override this to finish off output that is written over all the
+        steps, like closing an animation.
+        """
+        pass
+
     def write_output_post_run(self,
                               model_start_time,
                               num_time_steps,
@@ -335,28 +375,33 @@ class Outputter(Serializable):
             SpillContainerPair object
 
         Follows the iteration in Model().step() for each step_num
+
+        .. note:: to write the output of several outputters, use
+            Model.write_output_post_run(), which reads each step from the
+            cache once for all of them.
         """
         self.prepare_for_model_run(model_start_time, **kwargs)
 
-        model_time = model_start_time
-        last_step = False
-
-        for step_num in range(num_time_steps):
-            if (step_num > 0 and step_num < num_time_steps - 1):
-                next_ts = (self.cache.load_timestep(step_num).items()[0].
-                           current_time_stamp)
-                ts = next_ts - model_time
+        # here, since the cache imports the spills, which import outputters
+        from gnome.utilities.cache import LoadedStepCache
 
-                self.prepare_for_model_step(ts.seconds, model_time)
+        # each step is read from the cache once
+        cache = self.cache
+        self.cache = LoadedStepCache(cache)
 
-            if step_num == num_time_steps - 1:
-                last_step = True
+        try:
+            for (step_num, time_step, model_time,
+                 last_step) in post_run_steps(self.cache,
+                                              model_start_time,
+                                              num_time_steps):
+                if time_step is not None:
+                    self.prepare_for_model_step(time_step, model_time)
 
-            self.write_output(step_num, last_step)
+                self.write_output(step_num, last_step)
 
-            model_time = (self.cache.load_timestep(step_num)
-                          .items()[0]
-                          .current_time_stamp)
+            self.finish_output()
+        finally:
+            self.cache = cache
 
     # Some utilities for checking valid filenames, etc...
     def _check_filename(self, filename):
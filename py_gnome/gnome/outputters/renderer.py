@@ -646,9 +646,9 @@ class Renderer(Outputter, MapCanvas):
         return {'image_filename': image_filename,
                 'time_stamp': time_stamp}
 
-    def write_output_post_run(self, **kwargs):
-        super(Renderer, **kwargs)
-        if '.gif' in self.formats:
+    def finish_output(self):
+        'close the animation'
+        if 'gif' in self.formats:
             self.animation.close_anim()
 
     def _draw(self, step_num):
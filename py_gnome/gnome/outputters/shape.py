@@ -5,6 +5,8 @@ import copy
 import os
 import zipfile
 
+import numpy as np
+
 from colander import SchemaNode, String, drop
 import shapefile as shp
 
@@ -35,6 +37,17 @@ class ShapeOutput(Outputter, Serializable):
 
     time_formatter = '%m/%d/%Y %H:%M'
 
+    # (name, type, size) of the fields of the records of the elements
+    fields = [('Year', 'C', 50),
+              ('Month', 'C', 50),
+              ('Day', 'C', 50),
+              ('Hour', 'C', 50),
+              ('LE id', 'N', 50),
+              ('Depth', 'N', 50),
+              ('Mass', 'N', 50),
+              ('Age', 'N', 50),
+              ('Status_Code', 'N', 50)]
+
     def __init__(self, filename, **kwargs):
         '''
         :param str output_dir=None: output directory for shape files
@@ -48,6 +61,9 @@ class ShapeOutput(Outputter, Serializable):
         self.filename = filename
         self.filedir = os.path.dirname(filename)
 
+        self.w = None
+        self.w_u = None
+
         super(ShapeOutput, self).__init__(**kwargs)
 
     def prepare_for_model_run(self,
@@ -92,6 +108,7 @@ class ShapeOutput(Outputter, Serializable):
         if not self.on:
             return
 
+        self.w = self.w_u = None
         self.delete_output_files()
 
         # shouldn't be required if the above worked!
@@ -108,15 +125,8 @@ class ShapeOutput(Outputter, Serializable):
             w = shp.Writer(shp.POINT)
             w.autobalance = 1
 
-            w.field('Year', 'C')
-            w.field('Month', 'C')
-            w.field('Day', 'C')
-            w.field('Hour', 'C')
-            w.field('LE id', 'N')
-            w.field('Depth', 'N')
-            w.field('Mass', 'N')
-            w.field('Age', 'N')
-            w.field('Status_Code', 'N')
+            for name, type_, size in self.fields:
+                w.field(name, type_, size)
 
             if sc.uncertain:
                 self.w_u = w
@@ -131,49 +141,36 @@ class ShapeOutput(Outputter, Serializable):
         if not self.on or not self._write_step:
             return None
 
-        uncertain = False
-
         for sc in self.cache.load_timestep(step_num).items():
             curr_time = sc.current_time_stamp
-
-            if sc.uncertain:
-                uncertain = True
-
-                for k, p in enumerate(sc['positions']):
-                    self.w_u.point(p[0], p[1])
-                    self.w_u.record(curr_time.year,
-                                    curr_time.month,
-                                    curr_time.day,
-                                    curr_time.hour,
-                                    sc['id'][k],
-                                    p[2],
-                                    sc['mass'][k],
-                                    sc['age'][k],
-                                    sc['status_codes'][k])
-            else:
-                for k, p in enumerate(sc['positions']):
-                    self.w.point(p[0], p[1])
-                    self.w.record(curr_time.year,
-                                  curr_time.month,
-                                  curr_time.day,
-                                  curr_time.hour,
-                                  sc['id'][k],
-                                  p[2],
-                                  sc['mass'][k],
-                                  sc['age'][k],
-                                  sc['status_codes'][k])
+            positions = sc['positions']
+
+            w = self.w_u if sc.uncertain else self.w
+
+            # same as w.point() and w.record() for each element, but with
+            # the values made from the data arrays at once
+            for x, y in zip(positions[:, 0].tolist(),
+                            positions[:, 1].tolist()):
+                w.point(x, y)
+
+            w.records.extend(self._records(len(sc),
+                                           (curr_time.year,
+                                            curr_time.month,
+                                            curr_time.day,
+                                            curr_time.hour,
+                                            sc['id'],
+                                            positions[:, 2],
+                                            sc['mass'],
+                                            sc['age'],
+                                            sc['status_codes'])))
 
         if islast_step:  # now we really write the files:
-            if uncertain:
-                shapefilenames = [self.filename, self.filename + '_uncert']
-            else:
-                shapefilenames = [self.filename]
+            for w, fn in ((self.w, self.filename),
+                          (self.w_u, self.filename + '_uncert')):
+                if w is None:
+                    continue
 
-            for fn in shapefilenames:
-                if uncertain:
-                    self.w_u.save(fn)
-                else:
-                    self.w.save(fn)
+                w.save(fn)
 
                 zfilename = fn + '.zip'
 
@@ -190,11 +187,28 @@ class ShapeOutput(Outputter, Serializable):
 
                 zipf.close()
 
+            self.w = self.w_u = None
+
         output_info = {'time_stamp': sc.current_time_stamp.isoformat(),
                        'output_filename': self.filename + '.zip'}
 
         return output_info
 
+    @staticmethod
+    def _records(num, values):
+        '''
+        the records of num elements, as the writer keeps them
+
+        :param values: the value of each field -- an array with a value for
+            each element, or one value for all of them
+        :returns: list of the records -- tuples of the text of the values,
+            which is what the writer writes to the .dbf file for them
+        '''
+        columns = [np.asarray(value).astype(str) for value in values]
+
+        return zip(*[c.tolist() if c.ndim > 0 else [c.item()] * num
+                     for c in columns])
+
     def rewind(self):
         '''
         reset a few parameter and call base class rewind to reset
@@ -202,6 +216,8 @@ class ShapeOutput(Outputter, Serializable):
         '''
         super(ShapeOutput, self).rewind()
 
+        self.w = self.w_u = None
+
         self._middle_of_run = False
         self._start_idx = 0
 
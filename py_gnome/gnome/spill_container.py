@@ -58,6 +58,9 @@ class FateDataView(AddLogger):
         self.substance_id = substance_id
 
     def reset(self):
+        # the mask over the SC arrays each fate's data was made with
+        self._masks = {}
+
         self.surface_weather = {}
         self.subsurf_weather = {}
         self.skim = {}
@@ -92,9 +95,11 @@ class FateDataView(AddLogger):
             fate_mask = np.logical_and(sc['substance'] == self.substance_id,
                                        fate_mask)
 
+        self._masks[fate] = fate_mask
+
         if np.all(fate_mask):
             # no need to make a copy of array
-            setattr(self, fate, sc._data_arrays)
+            setattr(self, fate, sc.data_arrays)
         else:
             dict_to_update = getattr(self, fate)
             for at in array_types:
@@ -115,11 +120,64 @@ class FateDataView(AddLogger):
         '''
         # always add 'id' to array_types
         array_types.update({'id'})
-        self._set_data(sc, array_types,
-                       self._get_fate_mask(sc, fate),
-                       fate)
+
+        if (self, fate) in sc._unsynced_views:
+            # the data wasn't written back, so the mask hasn't changed --
+            # see update_sc()
+            self._add_arrays(sc, array_types, fate)
+        else:
+            self._set_data(sc, array_types,
+                           self._get_fate_mask(sc, fate),
+                           fate)
+
         return getattr(self, fate)
 
+    def _add_arrays(self, sc, array_types, fate):
+        '''
+        add the arrays that are not in the data yet, with the mask the data
+        was made with
+        '''
+        dict_to_update = getattr(self, fate)
+        fate_mask = self._masks[fate]
+
+        for at in array_types:
+            array = sc._array_name(at)
+            if array not in dict_to_update:
+                dict_to_update[array] = sc._data_arrays[array][fate_mask]
+
+    def _can_defer(self, sc, fate):
+        '''
+        True if writing back the data of fate can wait -- the SC defers the
+        updates, and the LEs in the data are the same ones after the update.
+        Otherwise the mask changes, and the data has to be written back now.
+        '''
+        d_to_sync = getattr(self, fate)
+
+        if not sc._defer_fate_sync or fate not in self._masks:
+            return False
+
+        if ('fate_status' in d_to_sync and
+                np.any(sc._data_arrays['fate_status'][self._masks[fate]] !=
+                       d_to_sync['fate_status'])):
+            return False
+
+        if ('mass' in d_to_sync and
+                (not np.all(d_to_sync['mass'] > 0.0) or
+                 np.any(np.isclose(d_to_sync['mass'], 0)))):
+            return False
+
+        return True
+
+    def write_back(self, sc, fate):
+        '''
+        write the data of fate into the SC arrays, with the mask it was
+        made with
+        '''
+        fate_mask = self._masks[fate]
+
+        for key, val in getattr(self, fate).iteritems():
+            SpillContainerData.get_writable(sc, key)[fate_mask] = val
+
     def update_sc(self, sc, fate='surface_weather'):
         '''
         update SC arrays with data viewer arrays for specified fate
@@ -140,6 +198,13 @@ class FateDataView(AddLogger):
         if d_to_sync is sc._data_arrays:
             return
 
+        if self._can_defer(sc, fate):
+            # written back when something else needs the SC arrays
+            if (self, fate) not in sc._unsynced_views:
+                sc._unsynced_views.append((self, fate))
+
+            return
+
         w_mask = self._get_fate_mask(sc, fate)
 
         if 'substance' in sc:
@@ -164,7 +229,7 @@ class FateDataView(AddLogger):
                               "reset_view")
 
         for key, val in d_to_sync.iteritems():
-            sc[key][w_mask] = val
+            sc.get_writable(key)[w_mask] = val
 
         if reset_view:
             setattr(self, fate, {})
@@ -220,6 +285,11 @@ class SpillContainerData(object):
         self.current_time_stamp = None
         self.mass_balance = {}
 
+        # names of data arrays whose buffers are shared with a snapshot
+        # (see snapshot_data_arrays()). They are handed out read-only, and
+        # copied before they are changed, so the snapshot is never modified.
+        self._shared = set()
+
         # following internal variable is used when comparing two SpillContainer
         # objects. When testing the data arrays are equal, use this tolerance
         # with numpy.allclose() method. Default is to make it 0 so arrays must
@@ -240,8 +310,31 @@ class SpillContainerData(object):
         example:  a_spill_container['positions'] give you the
                   (x,y,z positions array of the elements)
 
+        .. note:: an array that is shared with a snapshot is returned as a
+            read-only view. Use get_writable() to change it in place.
+
         :raises KeyError: raised if the data is not there
         """
+        array = self._data_arrays[data_name]
+
+        if data_name in self._shared:
+            array = array.view()
+            array.flags.writeable = False
+
+        return array
+
+    def get_writable(self, data_name):
+        """
+        Returns the data array data_name, to be changed in place.
+
+        If it is shared with a snapshot it is copied first, so the snapshot
+        keeps the values it has now.
+
+        :raises KeyError: raised if the data is not there
+        """
+        if data_name in self._shared:
+            self._unshare(data_name)
+
         return self._data_arrays[data_name]
 
     def __setitem__(self, data_name, array):
@@ -282,6 +375,7 @@ class SpillContainerData(object):
                                  'existing data_arrays.')
 
         self._data_arrays[data_name] = array
+        self._shared.discard(data_name)
 
     def __eq__(self, other):
         'Compare equality of two SpillContanerData objects'
@@ -295,14 +389,15 @@ class SpillContainerData(object):
         val_is_dict = []
         for key, val in self.__dict__.iteritems():
             'compare dict not including _data_arrays'
-            if isinstance(val, dict):
-                val_is_dict.append(key)
-            elif key == '_substances_spills' or key == '_fate_data_list':
+            if key in ('_substances_spills', '_fate_data_list', '_shared',
+                       '_buffers', '_unsynced_views'):
                 '''
                 this is just another view of the data - no need to write extra
                 code to check equality for this
                 '''
                 pass
+            elif isinstance(val, dict):
+                val_is_dict.append(key)
             elif val != other.__dict__[key]:
                 return False
 
@@ -361,8 +456,33 @@ class SpillContainerData(object):
     def data_arrays(self):
         'Returns a dict of the all the data arrays'
         # this is a property in case we want change the internal implementation
+        # the caller may modify the arrays, so none of them can be shared
+        for name in list(self._shared):
+            self._unshare(name)
+
         return self._data_arrays
 
+    def _unshare(self, data_name):
+        'replace a data array shared with a snapshot by a copy'
+        self._data_arrays[data_name] = self._data_arrays[data_name].copy()
+        self._shared.discard(data_name)
+
+    def snapshot_data_arrays(self):
+        """
+        Returns a new dict containing the current data arrays, without
+        copying them.
+
+        The arrays are copy-on-write: until the container changes an array,
+        sc[name] hands it out as a read-only view. It is copied by the
+        mutation paths -- get_writable(), __setitem__() and data_arrays --
+        so the arrays in the snapshot keep the values they have now. Arrays
+        that are only read, or that are replaced rather than modified -- by
+        releasing or removing elements -- are never copied.
+        """
+        self._shared.update(self._data_arrays)
+
+        return dict(self._data_arrays)
+
 
 class SpillContainer(AddLogger, SpillContainerData):
     """
@@ -378,7 +498,15 @@ class SpillContainer(AddLogger, SpillContainerData):
 
     positions = spill_container['positions'] : returns a (num_LEs, 3) array of
     world_point_types
+
+    Each data array is a view of the first num_released rows of a larger
+    buffer in the _buffers dict. The buffers have spare capacity, which is
+    doubled when it runs out, so releasing elements doesn't reallocate
+    every array every step.
     """
+    # smallest capacity allocated for the data array buffers
+    _min_capacity = 64
+
     def __init__(self, uncertain=False):
         super(SpillContainer, self).__init__(uncertain=uncertain)
         self.spills = OrderedCollection(dtype=gnome.spill.spill.BaseSpill)
@@ -386,12 +514,43 @@ class SpillContainer(AddLogger, SpillContainerData):
                                       ('add', 'replace', 'remove'))
         self.rewind()
 
+    def __getitem__(self, data_name):
+        """
+        Invoke base class __getitem__ method, after writing back the fate
+        data that update_from_fatedataview() deferred
+        """
+        if self._unsynced_views:
+            self._sync_fate_dataviews()
+
+        return SpillContainerData.__getitem__(self, data_name)
+
+    @property
+    def data_arrays(self):
+        'Returns a dict of the all the data arrays'
+        if self._unsynced_views:
+            self._sync_fate_dataviews()
+
+        return SpillContainerData.data_arrays.fget(self)
+
+    def get_writable(self, data_name):
+        """
+        Invoke base class get_writable method, after writing back the fate
+        data that update_from_fatedataview() deferred
+        """
+        if self._unsynced_views:
+            self._sync_fate_dataviews()
+
+        return SpillContainerData.get_writable(self, data_name)
+
     def __setitem__(self, data_name, array):
         """
         Invoke base class __setitem__ method so the _data_array is set
         correctly.  In addition, create the appropriate ArrayType if it wasn't
         created by the user.
         """
+        if self._unsynced_views:
+            self._sync_fate_dataviews()
+
         super(SpillContainer, self).__setitem__(data_name, array)
         if data_name not in self._array_types:
             shape = self._data_arrays[data_name].shape[1:]
@@ -409,6 +568,72 @@ class SpillContainer(AddLogger, SpillContainerData):
         # copy, cause we don't want to change the defaults!
         self._array_types = default_array_types.copy()
         self._data_arrays = {}
+        self._shared = set()
+        self._buffers = {}
+
+    def _to_new_buffer(self, data_name, array, capacity, dtype=None):
+        '''
+        copy array into a newly allocated buffer with room for capacity
+        elements. Returns a view of the buffer the same length as array.
+        '''
+        if dtype is None:
+            dtype = array.dtype
+
+        capacity = max(capacity, self._min_capacity)
+        buf = np.empty((capacity,) + array.shape[1:], dtype=dtype)
+        buf[:len(array)] = array
+
+        self._buffers[data_name] = buf
+
+        return buf[:len(array)]
+
+    def _has_buffer(self, data_name):
+        '''
+        True if the data array is still a view of its buffer -- it won't be
+        if it was replaced, by __setitem__ or split_element() for instance
+        '''
+        buf = self._buffers.get(data_name)
+
+        return (buf is not None and
+                self._data_arrays[data_name].base is buf)
+
+    def _append_to_buffer(self, data_name, a_append):
+        '''
+        append a_append to the end of the named data array. Done in place if
+        there is room in the buffer, otherwise the buffer's capacity is
+        doubled.
+
+        A snapshot (see snapshot_data_arrays()) only ever holds the rows
+        that were in the array when it was taken, so new rows can be written
+        after them even if the array is shared.
+        '''
+        array = self._data_arrays[data_name]
+        num = len(array)
+        new_num = num + len(a_append)
+        dtype = np.result_type(array.dtype, a_append.dtype)
+
+        if (not self._has_buffer(data_name) or
+                len(self._buffers[data_name]) < new_num or
+                self._buffers[data_name].dtype != dtype):
+            capacity = max(new_num, 2 * len(self._buffers.get(data_name, ())))
+            self._to_new_buffer(data_name, array, capacity, dtype)
+
+        buf = self._buffers[data_name]
+        buf[num:new_num] = a_append
+
+        return buf[:new_num]
+
+    def _unshare(self, data_name):
+        '''
+        copy a data array shared with a snapshot into a new buffer with the
+        same capacity
+        '''
+        array = self._data_arrays[data_name]
+        capacity = len(self._buffers.get(data_name, array))
+
+        self._data_arrays[data_name] = self._to_new_buffer(data_name, array,
+                                                           capacity)
+        self._shared.discard(data_name)
 
     def _reset__substances_spills(self):
         '''
@@ -431,14 +656,44 @@ class SpillContainer(AddLogger, SpillContainerData):
         # 'fate_status' is included if weathering is on
         self._fate_data_list = []
 
+        # see defer_fate_dataview_updates()
+        self._defer_fate_sync = False
+        self._unsynced_views = []
+
     def reset_fate_dataview(self):
         '''
         reset data arrays for each fate_dataviewer. Each substance that is not
         None has a fate_dataviewer object.
         '''
+        self._sync_fate_dataviews()
+
         for viewer in self._fate_data_list:
             viewer.reset()
 
+    def defer_fate_dataview_updates(self, defer=True):
+        '''
+        If defer is True, update_from_fatedataview() leaves the weathered
+        data in the fate dataviews, so the next weatherer works on the same
+        arrays, instead of writing them back to the data arrays for each
+        weatherer and substep.
+
+        The data is written back when the LEs in a view change, when the
+        data arrays are accessed, when the data for another fate is asked
+        for, and when defer is set back to False.
+        '''
+        if not defer:
+            self._sync_fate_dataviews()
+
+        self._defer_fate_sync = defer
+
+    def _sync_fate_dataviews(self):
+        'write back the fate data that update_from_fatedataview() deferred'
+        unsynced = self._unsynced_views
+        self._unsynced_views = []
+
+        for view, fate in unsynced:
+            view.write_back(self, fate)
+
     def _set_substancespills(self):
         '''
         _substances could change when spills are added/deleted
@@ -504,6 +759,8 @@ class SpillContainer(AddLogger, SpillContainerData):
         FateDataView(substance_id) object. The substance_id corresponds with
         self._substance_spills.s_id for each substance.
         '''
+        self._sync_fate_dataviews()
+
         self._fate_data_list = []
         for s_id, subs in zip(self._substances_spills.s_id,
                               self._substances_spills.substances):
@@ -625,7 +882,7 @@ class SpillContainer(AddLogger, SpillContainerData):
                                             initial_value=tuple([0] * self._oil_comp_array_len))
             else:
                 a_append = atype.initialize(num_released)
-            self._data_arrays[name] = np.r_[self._data_arrays[name], a_append]
+            self._data_arrays[name] = self._append_to_buffer(name, a_append)
 
     def _set_substance_array(self, subs_idx, num_rel_by_substance):
         '''
@@ -635,7 +892,8 @@ class SpillContainer(AddLogger, SpillContainerData):
         '''
         if 'substance' in self:
             if num_rel_by_substance > 0:
-                self['substance'][-num_rel_by_substance:] = subs_idx
+                self.get_writable('substance')[-num_rel_by_substance:] = \
+                    subs_idx
 
     def substancefatedata(self,
                           substance,
@@ -683,6 +941,10 @@ class SpillContainer(AddLogger, SpillContainerData):
         if self._substances_spills is None:
             self._set_substancespills()
 
+        if any([f != fate for _view, f in self._unsynced_views]):
+            # the data for this fate is made from the data arrays
+            self._sync_fate_dataviews()
+
         return zip(self.get_substances(complete=False),
                    [view.get_data(self, array_types, fate) for view in
                     self._fate_data_list])
@@ -866,6 +1128,8 @@ class SpillContainer(AddLogger, SpillContainerData):
             else:
                 self._data_arrays[name] = atype.initialize_null()
 
+            self._shared.discard(name)
+
     def release_elements(self, time_step, model_time):
         """
         Called at the end of a time step
@@ -918,7 +1182,7 @@ class SpillContainer(AddLogger, SpillContainerData):
                     spill.set_newparticle_values(num_rel,
                                                  model_time,
                                                  time_step,
-                                                 self._data_arrays)
+                                                 self.data_arrays)
                     num_rel_by_substance += num_rel
 
             # always reset data arrays else the changing arrays are stale
@@ -963,6 +1227,7 @@ class SpillContainer(AddLogger, SpillContainerData):
             data = np.insert(data, idx, split_elems[:-1], 0)
             data[idx + len(split_elems) - 1] = split_elems[-1]
             self._data_arrays[name] = data
+            self._shared.discard(name)
 
         # update fate_dataview which contains this LE
         # for now we only have one type of substance
@@ -986,9 +1251,24 @@ class SpillContainer(AddLogger, SpillContainerData):
                                  oil_status.to_be_removed)[0]
 
         if len(to_be_removed) > 0:
+            keep = np.ones(len(self), dtype=bool)
+            keep[to_be_removed] = False
+            num_kept = np.count_nonzero(keep)
+
+            # compact each array in one pass. Do it in place, unless the
+            # buffer is shared with a snapshot, in which case the remaining
+            # elements are copied to a new buffer instead
             for key in self._array_types.keys():
-                self._data_arrays[key] = np.delete(self[key], to_be_removed,
-                                                   axis=0)
+                array = self._data_arrays[key]
+                if self._has_buffer(key) and key not in self._shared:
+                    buf = self._buffers[key]
+                    buf[:num_kept] = array[keep]
+                    self._data_arrays[key] = buf[:num_kept]
+                else:
+                    self._data_arrays[key] = \
+                        self._to_new_buffer(key, array[keep],
+                                            len(self._buffers.get(key, array)))
+                    self._shared.discard(key)
 
     def __str__(self):
         return ('gnome.spill_container.SpillContainer\n'
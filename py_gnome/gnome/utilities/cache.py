@@ -9,7 +9,8 @@ import os
 import warnings
 import tempfile
 import shutil
-import copy
+import threading
+import Queue
 from multiprocessing import Lock
 
 import numpy
@@ -62,6 +63,93 @@ import atexit
 atexit.register(clean_up_cache)
 
 
+def _background_writer(queue, errors):
+    """
+    Worker loop for the background cache writer thread.
+
+    Pulls (write_function, args) pairs off the queue and calls them
+    until it gets a None sentinel.
+
+    This is a module level function rather than a method, and the write
+    functions are module level functions of the state they need, so the
+    thread never holds a reference to the ElementCache -- otherwise the
+    cache would never get garbage collected and cleaned up.
+
+    Any exception raised while writing is appended to errors, so it can
+    be re-raised in the calling thread by ElementCache.flush()
+    """
+    while True:
+        item = queue.get()
+        try:
+            if item is None:
+                return
+
+            write, args = item
+            write(*args)
+        except Exception, excp:
+            errors.append(excp)
+        finally:
+            # drop the references to the data
+            item = write = args = None
+            queue.task_done()
+
+
+def _write_npz(filename, data):
+    'write the data arrays for one spill container to an npz file'
+    np.savez(filename, **data)
+
+
+def _column_filename(cache_dir, name, uncertain=False):
+    'Returns the filename of the column file for the named data array'
+    if uncertain:
+        return os.path.join(cache_dir, 'column_{0}_uncert.dat'.format(name))
+    else:
+        return os.path.join(cache_dir, 'column_{0}.dat'.format(name))
+
+
+def _write_columns(cache_dir, files, index, alignment,
+                   step_num, uncertain, data):
+    """
+    append the data arrays for one spill container to the column files of
+    a MemmapElementCache
+
+    :param files: the open column files: {(name, uncertain): file}
+    :param index: the index of the steps in the files
+    :param alignment: the column data is aligned to this many bytes
+
+    Scalars, strings and object arrays (like the current_time_stamp and
+    the mass_balance data) are tiny, so they are kept in the index rather
+    than the column files.
+    """
+    entry = {}
+
+    for name, arr in data.iteritems():
+        arr = np.asarray(arr)
+
+        if (arr.ndim == 0 or arr.size == 0 or arr.dtype.hasobject or
+                arr.dtype.kind in ('S', 'U')):
+            entry[name] = arr
+            continue
+
+        key = (name, uncertain)
+        fh = files.get(key)
+        if fh is None:
+            fh = open(_column_filename(cache_dir, name, uncertain), 'wb')
+            files[key] = fh
+
+        offset = fh.tell()
+        padding = -offset % alignment
+        if padding:
+            fh.write('\0' * padding)
+            offset += padding
+
+        fh.write(np.ascontiguousarray(arr).data)
+
+        entry[name] = (offset, arr.dtype, arr.shape)
+
+    index[(step_num, uncertain)] = entry
+
+
 class ElementCache(object):
     """
     Cache for element data -- i.e. the data associated with the particles.
@@ -73,7 +161,8 @@ class ElementCache(object):
           the _cache_dir at the whim of the GC.
           We may want to manage this differently.
     """
-    def __init__(self, cache_dir=None, enabled=True):
+    def __init__(self, cache_dir=None, enabled=True,
+                 background_write=False, max_pending=4):
         """
         initialize a new cache object
 
@@ -81,6 +170,18 @@ class ElementCache(object):
                                should be stored.
                                If not provided, a temp dir will be created by
                                the python tempfile module
+
+        :param enabled=True: flag for whether to write the cache to disk.
+
+        :param background_write=False: if True, the disk writes are done in
+                                       a background thread, so the model can
+                                       compute the next step while the
+                                       previous one is being written.
+
+        :param max_pending=4: maximum number of steps waiting to be written
+                              by the background writer. save_timestep()
+                              blocks when the queue is full, so memory use
+                              stays bounded if the disk can't keep up.
         """
         self.create_new_dir(cache_dir)
 
@@ -91,10 +192,20 @@ class ElementCache(object):
         # flag for whether to enable disk cache
         self.enabled = enabled
 
+        self.background_write = background_write
+        self.max_pending = max_pending
+
+        # background writer is started lazily on the first write
+        self._queue = None
+        self._writer = None
+        self._write_errors = []
+
         self.lock = Lock()
 
     def __del__(self):
         'Clear out the cache when this object is deleted'
+        self._stop_writer()
+
         with self.lock:
             if os.path.isdir(self._cache_dir):
                 shutil.rmtree(self._cache_dir)
@@ -121,6 +232,81 @@ class ElementCache(object):
             self._cache_dir = cache_dir
         return True
 
+    def _start_writer(self):
+        'start the background writer thread if it is not already running'
+        if self._writer is None or not self._writer.is_alive():
+            self._queue = Queue.Queue(maxsize=self.max_pending)
+            self._writer = threading.Thread(target=_background_writer,
+                                            args=(self._queue,
+                                                  self._write_errors),
+                                            name='ElementCacheWriter')
+            self._writer.daemon = True
+            self._writer.start()
+
+    def _stop_writer(self):
+        'write out anything pending, then shut down the writer thread'
+        if self._writer is not None:
+            if self._writer.is_alive():
+                self._queue.put(None)
+                self._writer.join()
+
+            self._writer = None
+            self._queue = None
+
+    def _write(self, step_num, uncertain, data):
+        """
+        write one step of data to disk -- either directly or by handing it
+        off to the background writer
+        """
+        write, args = self._write_job(step_num, uncertain, data)
+
+        if self.background_write:
+            self._start_writer()
+
+            # blocks if max_pending steps are already waiting
+            self._queue.put((write, args))
+        else:
+            write(*args)
+
+    def _write_job(self, step_num, uncertain, data):
+        """
+        Returns the (write_function, args) that write the data arrays for
+        one spill container to disk. The args hold the state needed, not
+        the cache, so the background writer doesn't keep the cache alive.
+        """
+        return _write_npz, (self._make_filename(step_num, uncertain), data)
+
+    def _load_from_disk(self, step_num, uncertain=False):
+        """
+        load the data arrays for one spill container from disk
+
+        :returns: dict of arrays, or None if the step is not in the cache
+        """
+        try:
+            return dict(np.load(self._make_filename(step_num, uncertain)))
+        except IOError:
+            return None
+
+    def flush(self):
+        """
+        Block until all the pending background writes are on disk.
+
+        This is the barrier that needs to be passed before anything reads
+        the disk cache, or removes it. It is a no-op if the background
+        writer is not being used.
+
+        Raises a CacheError if any of the background writes failed.
+        """
+        if self._queue is not None:
+            self._queue.join()
+
+        if self._write_errors:
+            excp = self._write_errors[0]
+            del self._write_errors[:]
+
+            raise CacheError('Problem writing to the cache: {0!r}'
+                             .format(excp))
+
     def save_timestep(self, step_num, spill_container_pair):
         """
         add a time step of data to the cache
@@ -129,7 +315,9 @@ class ElementCache(object):
         :param spill_container: the spill container at this step
         """
         for sc in spill_container_pair.items():
-            data = copy.deepcopy(sc.data_arrays)
+            # the arrays are shared with the spill container until it
+            # modifies them -- no need to copy them here
+            data = sc.snapshot_data_arrays()
 
             self._set_weathering_data(sc, data)
 
@@ -145,11 +333,10 @@ class ElementCache(object):
                 self.recent = {step_num: [data, None]}
 
             # write the data if enabled
-            # could be threaded -- data is a copy, so doesn't need to be
-            #                      re-used by anything
+            # data is a snapshot, so it can be handed to the background
+            # writer -- it won't be changed by anything
             if self.enabled:
-                filename = self._make_filename(step_num, sc.uncertain)
-                np.savez(filename, **data)
+                self._write(step_num, sc.uncertain, data)
 
     def load_timestep(self, step_num):
         """
@@ -159,35 +346,22 @@ class ElementCache(object):
         """
         # look first in in-memory cache.
         try:
-            # make a copy because we pop out the current_time_stamp
-            # make these changes to the copy so the self.recent does not change
-
-            (data_arrays, u_data_arrays) = copy.deepcopy(self.recent[step_num])
-
-            # copy.deepcopy(self.recent[step_num]) converts
-            # 'current_time_stamp' to datetime object
-            # To be consistent with np.load() operation below,
-            # make this an array.
-            if 'current_time_stamp' in data_arrays:
-                data_arrays['current_time_stamp'] = \
-                    np.array(data_arrays['current_time_stamp'])
-                if u_data_arrays:
-                    u_data_arrays['current_time_stamp'] = \
-                        np.array(u_data_arrays['current_time_stamp'])
+            # make new dicts because we pop out the current_time_stamp
+            # the arrays themselves are returned as read-only views, so
+            # self.recent does not change
+            (data_arrays, u_data_arrays) = \
+                [self._read_only(data) for data in self.recent[step_num]]
         except KeyError:
             # not in the recent dict: try to load from disk
-            try:
-                data_arrays = \
-                    dict(np.load(self._make_filename(step_num)))
-            except IOError:
+            # make sure any pending writes are there first
+            self.flush()
+
+            data_arrays = self._load_from_disk(step_num)
+            if data_arrays is None:
                 raise CacheError('step: {0} is not in the cache'
                                  .format(step_num))
 
-            try:
-                u_data_arrays = \
-                    dict(np.load(self._make_filename(step_num, True)))
-            except IOError:
-                u_data_arrays = None
+            u_data_arrays = self._load_from_disk(step_num, True)
 
         # HOWEVER, loading numpy arrays
         #     data_arrays = dict(np.load(self._make_filename(step_num)))
@@ -221,6 +395,18 @@ class ElementCache(object):
 
         return scp
 
+    def _read_only(self, data):
+        'Returns a dict of read-only views of the arrays in data'
+        if data is None:
+            return None
+
+        views = {}
+        for name, arr in data.iteritems():
+            views[name] = arr.view()
+            views[name].flags.writeable = False
+
+        return views
+
     def _set_weathering_data(self, sc, data):
         'add mass balance data to arrays'
         if sc.mass_balance:
@@ -254,7 +440,173 @@ class ElementCache(object):
         # clean out the in-memory cache
         self.recent = {}
 
+        # let the background writer finish before the files are removed
+        # any write errors don't matter anymore
+        if self._queue is not None:
+            self._queue.join()
+        del self._write_errors[:]
+
         # clean out the disk cache
         if os.path.isdir(self._cache_dir):
             shutil.rmtree(self._cache_dir)
         os.mkdir(self._cache_dir)
+
+
+class MemmapElementCache(ElementCache):
+    """
+    ElementCache that stores the steps in memory mapped column files,
+    rather than one npz file per step.
+
+    Each data array gets a single file, per spill container, that every
+    step is appended to. An in-memory index holds the offset, dtype and
+    shape of each step's array in the file, so load_timestep() can return
+    read-only views into the memory mapped file -- no decompression, and
+    no copy of the data.
+
+    The outputters re-read every step after a run, so this saves a lot of
+    time in write_output_post_run().
+
+    .. note:: The arrays returned by load_timestep() are read-only.
+    """
+    # column data is aligned to this many bytes in the files
+    _alignment = 16
+
+    def __init__(self, *args, **kwargs):
+        # {(step_num, uncertain): {name: (offset, dtype, shape) or array}}
+        self._index = {}
+
+        # open file handles and memory maps: {(name, uncertain): obj}
+        self._files = {}
+        self._maps = {}
+
+        super(MemmapElementCache, self).__init__(*args, **kwargs)
+
+    def __del__(self):
+        self._stop_writer()
+        self._close_files()
+
+        super(MemmapElementCache, self).__del__()
+
+    def _column_filename(self, name, uncertain=False):
+        'Returns the filename of the column file for the named data array'
+        return _column_filename(self._cache_dir, name, uncertain)
+
+    def _close_files(self):
+        'close the column files, and clear the index that refers to them'
+        for fh in self._files.values():
+            fh.close()
+
+        # any views handed out keep their own reference to the memory map
+        self._files = {}
+        self._maps = {}
+        self._index = {}
+
+    def _write_job(self, step_num, uncertain, data):
+        'append the data arrays for one spill container to the column files'
+        return _write_columns, (self._cache_dir, self._files, self._index,
+                                self._alignment, step_num, uncertain, data)
+
+    def _load_from_disk(self, step_num, uncertain=False):
+        """
+        get the data arrays for one spill container as read-only views
+        into the column files
+
+        :returns: dict of arrays, or None if the step is not in the cache
+        """
+        try:
+            entry = self._index[(step_num, uncertain)]
+        except KeyError:
+            return None
+
+        data = {}
+        for name, val in entry.iteritems():
+            if isinstance(val, tuple):
+                data[name] = self._get_view(name, uncertain, *val)
+            else:
+                data[name] = val.copy()
+
+        return data
+
+    def _get_view(self, name, uncertain, offset, dtype, shape):
+        'read-only view of an array in a column file'
+        key = (name, uncertain)
+        nbytes = dtype.itemsize * int(np.prod(shape))
+
+        buf = self._maps.get(key)
+        if buf is None or len(buf) < offset + nbytes:
+            # file has grown since it was mapped
+            buf = np.memmap(self._column_filename(name, uncertain),
+                            dtype=np.uint8, mode='r')
+            self._maps[key] = buf
+
+        return (buf[offset:offset + nbytes]
+                .view(dtype=dtype, type=np.ndarray)
+                .reshape(shape))
+
+    def flush(self):
+        """
+        Block until all the pending writes are on disk -- for this cache
+        that includes the file buffers of the column files.
+        """
+        super(MemmapElementCache, self).flush()
+
+        for fh in self._files.values():
+            fh.flush()
+
+    def rewind(self):
+        'Rewinds the cache -- clearing out everything'
+        if self._queue is not None:
+            self._queue.join()
+
+        self._close_files()
+
+        super(MemmapElementCache, self).rewind()
+
+
+class LoadedStepCache(object):
+    """
+    Wraps a cache so the last step loaded is kept, and loading it again
+    returns the same SpillContainerPairData, rather than reading it again.
+
+    Used when writing output after a run, so a step is read from the cache
+    once, and shared by all the outputters.
+
+    .. note:: the data of the step is shared, maybe between threads, so
+        its arrays are made read-only.
+    """
+    def __init__(self, cache):
+        """
+        :param cache: the cache the steps are loaded from
+        """
+        self.cache = cache
+
+        self._step_num = None
+        self._step = None
+
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        'everything else comes from the wrapped cache'
+        if name == 'cache':
+            # not set yet -- while it is being copied
+            raise AttributeError(name)
+
+        return getattr(self.cache, name)
+
+    def load_timestep(self, step_num):
+        """
+        Returns the SpillContainerPairData of step_num -- it is only loaded
+        from the cache if it isn't the last step that was loaded
+
+        :param step_num: the step number you want to load.
+        """
+        with self.lock:
+            if step_num != self._step_num:
+                self._step = self.cache.load_timestep(step_num)
+                self._step_num = step_num
+
+                for sc in self._step.items():
+                    for arr in sc.data_arrays.itervalues():
+                        arr.flags.writeable = False
+
+            return self._step
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+"""
+cell_hints.py
+
+Locating elements on a grid, starting from the cell each element was in
+last time.
+
+Every at() call of a gridded environment object locates all the elements
+on the grid with a global cell tree search. Elements only move a cell or
+so per time step, so HintedCellTree first tests the cell the element was
+last found in, then the rings of cells around it, and only falls back to
+the cell tree for the elements that aren't found there.
+
+The hints are a per-element array of face indexes (-1 for unknown), kept
+in the SpillContainer, that is updated in place with the cells found. The
+hints set on a tree are per thread, so the forecast and uncertain
+containers can be moved at the same time with their own hints.
+"""
+import threading
+
+import numpy as np
+import scipy.sparse
+
+
+def pad_faces(faces):
+    """
+    (M, k) intp array of the node indexes of the faces, with the unused
+    ones (-1, or masked) of the short faces of mixed grids replaced with
+    their first node -- a zero length edge doesn't change the point in
+    polygon test
+    """
+    faces = np.ma.filled(faces, -1).astype(np.intp)
+
+    return np.where(faces < 0, faces[:, :1], faces)
+
+
+def points_in_faces(nodes, faces, points, face_idx):
+    """
+    point in polygon test of each point against the matching face
+
+    :param nodes: (N, 2) array of node coordinates
+    :param faces: (M, k) array of the node indexes of the faces, padded
+                  with pad_faces()
+    :param points: (n, 2) array of points
+    :param face_idx: (n,) array of face indexes
+    :returns: (n,) bool array
+    """
+    vertices = nodes[faces[face_idx]]
+    x0 = vertices[..., 0]
+    y0 = vertices[..., 1]
+    x1 = np.roll(x0, -1, axis=1)
+    y1 = np.roll(y0, -1, axis=1)
+
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crosses = (((y0 > y) != (y1 > y)) &
+                   (x < (x1 - x0) * (y - y0) / (y1 - y0) + x0))
+
+    return crosses.sum(axis=1) % 2 == 1
+
+
+def search_candidates(nodes, faces, points, candidates):
+    """
+    test each point against its row of candidate faces
+
+    :param candidates: (n, w) array of face indexes, padded with -1
+    :returns: (found, face) -- found is True for the points that are
+              in one of their candidates, and face is the first
+              candidate they are in.
+    """
+    num, width = candidates.shape
+
+    point_idx = np.repeat(np.arange(num), width)
+    face_idx = candidates.ravel()
+    valid = face_idx >= 0
+
+    hits = np.zeros((num * width,), dtype=np.bool)
+    hits[valid] = points_in_faces(nodes, faces, points[point_idx[valid]],
+                                  face_idx[valid])
+    hits = hits.reshape(num, width)
+
+    found = hits.any(axis=1)
+    face = candidates[np.arange(num), hits.argmax(axis=1)]
+
+    return found, face
+
+
+class HintedCellTree(object):
+    """
+    Wraps a cell_tree2d.CellTree, and uses the cell hints, if set, in
+    locate().
+
+    Attributes not defined here are looked up on the wrapped tree.
+    """
+    def __init__(self, tree, nodes, faces, search_rings=2):
+        """
+        :param tree: the cell tree to wrap
+        :param nodes: (N, 2) array of node coordinates
+        :param faces: (M, k) array of the node indexes of each face. For
+                      mixed grids, the unused ones are -1, or masked.
+        :param search_rings=2: how many rings of neighboring cells are
+                               searched before the global search
+        """
+        self.tree = tree
+        self.search_rings = search_rings
+
+        # the hints of the thread's container
+        self._local = threading.local()
+
+        # a CellLookupTable to use instead of the tree for the global search
+        self.lookup = None
+
+        self.nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+
+        faces = np.ma.filled(faces, -1).astype(np.intp)
+        self.num_faces = len(faces)
+
+        self.faces = pad_faces(faces)
+        self.neighbors = self._build_neighbors(faces)
+
+    def __getattr__(self, name):
+        if name in ('tree', '_local'):
+            raise AttributeError(name)
+
+        return getattr(self.tree, name)
+
+    def __getstate__(self):
+        'the hints are not copied or pickled'
+        state = self.__dict__.copy()
+        del state['_local']
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def hints(self):
+        'the cell hints set by the thread, or None'
+        return getattr(self._local, 'hints', None)
+
+    @hints.setter
+    def hints(self, hints):
+        self._local.hints = hints
+
+    def _build_neighbors(self, faces):
+        """
+        (M + 1, n) array of the faces that share a node with each face,
+        padded with -1. The extra last row is all -1, so indexing with a
+        -1 face gives no neighbors.
+        """
+        face_idx, corner = np.nonzero(faces >= 0)
+        node_idx = faces[face_idx, corner]
+
+        incidence = scipy.sparse.csr_matrix(
+            (np.ones(len(face_idx), dtype=np.int8), (face_idx, node_idx)),
+            shape=(self.num_faces, max(node_idx.max() + 1, len(self.nodes))))
+
+        adjacent = (incidence * incidence.T).tocsr()
+        adjacent.setdiag(0)
+        adjacent.eliminate_zeros()
+
+        counts = np.diff(adjacent.indptr)
+        neighbors = np.empty((self.num_faces + 1, max(counts.max(), 1)),
+                             dtype=np.intp)
+        neighbors[:] = -1
+
+        rows = np.repeat(np.arange(self.num_faces), counts)
+        cols = np.arange(len(adjacent.indices)) - np.repeat(adjacent.indptr[:-1],
+                                                            counts)
+        neighbors[rows, cols] = adjacent.indices
+
+        return neighbors
+
+    def points_in_faces(self, points, faces):
+        """
+        point in polygon test of each point against the matching face
+
+        :param points: (N, 2) array of points
+        :param faces: (N,) array of face indexes
+        :returns: (N,) bool array
+        """
+        return points_in_faces(self.nodes, self.faces, points, faces)
+
+    def _global_locate(self, points):
+        'the cell lookup table if there is one, else the cell tree'
+        if self.lookup is not None:
+            return self.lookup.locate(points)
+
+        return self.tree.locate(points)
+
+    def locate(self, points):
+        """
+        locate the points -- same as CellTree.locate(), but the points are
+        searched for near the hinted cells first, if hints are set and
+        are the same length as points. The hints are updated with the
+        results.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        hints = self.hints
+
+        if hints is None or points.ndim != 2 or len(points) != len(hints):
+            return self._global_locate(points)
+
+        points = points[:, :2]
+        result = np.empty((len(points),), dtype=np.intp)
+        result[:] = -1
+
+        hint = np.asarray(hints, dtype=np.intp)
+        hint = np.where((hint >= 0) & (hint < self.num_faces), hint, -1)
+
+        todo = np.nonzero(hint >= 0)[0]
+        candidates = hint[todo, None]
+
+        for ring in range(self.search_rings + 1):
+            if len(todo) == 0:
+                break
+
+            if ring > 0:
+                candidates = (self.neighbors[candidates]
+                              .reshape(len(candidates), -1))
+
+            found, face = self._search(points[todo], candidates)
+
+            result[todo[found]] = face[found]
+            todo = todo[~found]
+            candidates = candidates[~found]
+
+        # the rest get the global search
+        missed = np.nonzero(result < 0)[0]
+        if len(missed) > 0:
+            result[missed] = self._global_locate(
+                np.ascontiguousarray(points[missed]))
+
+        hints[:] = result
+
+        return result
+
+    def _search(self, points, candidates):
+        """
+        test each point against its row of candidate faces
+
+        :returns: (found, face) -- found is True for the points that are
+                  in one of their candidates, and face is the first
+                  candidate they are in.
+        """
+        return search_candidates(self.nodes, self.faces, points, candidates)
+
+
+class null_hints(object):
+    'a context manager that does nothing -- for grids without cell hints'
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class cell_hints(object):
+    """
+    context manager that sets the hints of the hinted cell trees, and
+    unsets them on exit
+    """
+    def __init__(self, trees, hints):
+        self.trees = trees
+        self.hints = hints
+
+    def __enter__(self):
+        for tree in self.trees:
+            tree.hints = self.hints
+
+        return self
+
+    def __exit__(self, *args):
+        for tree in self.trees:
+            tree.hints = None
+
+        return False
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+"""
+cell_lookup.py
+
+A lookup table for locating points on the faces of a grid.
+
+Locating points on a large curvilinear or unstructured grid is a cell tree
+search per point. CellLookupTable overlays a regular lon/lat lattice on the
+grid, and stores the faces that overlap each lattice cell. Locating a point
+is then indexing the lattice, and a point in polygon test against the few
+faces stored for its cell.
+
+The faces of the cells are stored in compressed sparse row form: the
+faces of cell c are indices[indptr[c]:indptr[c + 1]], so a cell that
+overlaps many faces doesn't make the table bigger for all the others.
+
+The table only depends on the grid, so it is built once and saved next to
+the grid file, in a "<grid file>.<name>_lookup" dir. It is loaded memory
+mapped, so the uncertainty worker processes share it too.
+"""
+import os
+import shutil
+import tempfile
+import hashlib
+
+import numpy as np
+
+from gnome.utilities.cell_hints import pad_faces, points_in_faces
+
+# bump this if the way the tables are built changes, so old tables
+# are not used
+_format_version = 2
+
+
+def grid_hash(nodes, faces):
+    'sha1 hex digest of the nodes and faces of a grid'
+    sha1 = hashlib.sha1(repr(_format_version))
+    sha1.update(np.ascontiguousarray(nodes, dtype=np.float64).tostring())
+    sha1.update(np.ascontiguousarray(np.ma.filled(faces, -1),
+                                     dtype=np.int64).tostring())
+
+    return sha1.hexdigest()
+
+
+class CellLookupTable(object):
+    """
+    The faces of a grid that overlap each cell of a regular lattice
+    """
+    def __init__(self, nodes, faces, indptr, indices, origin, cell_size,
+                 shape, chunk_size=65536):
+        """
+        Use build() or load() to make one
+
+        :param nodes: (N, 2) array of the node coordinates of the grid
+        :param faces: (M, k) array of the node indexes of the faces
+        :param indptr: (ny * nx + 1,) array -- the faces of lattice cell c
+                       are indices[indptr[c]:indptr[c + 1]]
+        :param indices: array of the face indexes of all the cells
+        :param origin: (x, y) of the lower left corner of the lattice
+        :param cell_size: (dx, dy) of the lattice cells
+        :param shape: (ny, nx) of the lattice
+        :param chunk_size=65536: number of points searched at once, to
+                                 bound the memory used
+        """
+        self.nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        self.faces = pad_faces(faces)
+
+        self.indptr = indptr
+        self.indices = indices
+        self.origin = tuple(origin)
+        self.cell_size = tuple(cell_size)
+        self.shape = tuple(int(n) for n in shape)
+
+        self.chunk_size = chunk_size
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(shape={0.shape}, '
+                'num_entries={1})'.format(self, len(self.indices)))
+
+    @classmethod
+    def build(cls, nodes, faces, cells_per_face=1.0, max_cells=2 ** 22):
+        """
+        build the table for a grid
+
+        :param nodes: (N, 2) array of the node coordinates of the grid
+        :param faces: (M, k) array of the node indexes of the faces. For
+                      mixed grids, the unused ones are -1, or masked.
+        :param cells_per_face=1.0: lattice cells per grid face. About one
+                                   face per cell keeps the candidate lists
+                                   short.
+        :param max_cells=2**22: maximum number of lattice cells
+        """
+        nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        padded = pad_faces(faces)
+
+        vertices = nodes[padded]
+        low = vertices.min(axis=1)
+        high = vertices.max(axis=1)
+
+        # faces with masked or nan nodes can't contain anything
+        valid = np.nonzero(np.isfinite(low).all(axis=1) &
+                           np.isfinite(high).all(axis=1))[0]
+        low = low[valid]
+        high = high[valid]
+
+        origin = low.min(axis=0)
+        extent = np.maximum(high.max(axis=0) - origin, 1e-12)
+
+        # about square cells
+        num_cells = int(min(max(len(valid) * cells_per_face, 1), max_cells))
+        nx = int(max(np.ceil(np.sqrt(num_cells * extent[0] / extent[1])), 1))
+        ny = int(max(np.ceil(num_cells / float(nx)), 1))
+        cell_size = extent / (nx, ny)
+
+        # the range of lattice cells of each face's bounding box
+        shape = np.array((nx, ny))
+        first = np.clip(np.floor((low - origin) / cell_size).astype(np.intp),
+                        0, shape - 1)
+        last = np.clip(np.floor((high - origin) / cell_size).astype(np.intp),
+                       0, shape - 1)
+
+        width = last[:, 0] - first[:, 0] + 1
+        counts = width * (last[:, 1] - first[:, 1] + 1)
+
+        # one entry per (face, lattice cell) pair
+        entry_face = np.repeat(np.arange(len(valid)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                counts)
+        cx = first[entry_face, 0] + k % width[entry_face]
+        cy = first[entry_face, 1] + k // width[entry_face]
+        cell = cy * nx + cx
+
+        order = np.argsort(cell, kind='mergesort')
+        cell = cell[order]
+        entry_face = valid[entry_face[order]]
+
+        cell_counts = np.bincount(cell, minlength=nx * ny)
+
+        indptr = np.zeros((nx * ny + 1,), dtype=np.int64)
+        np.cumsum(cell_counts, out=indptr[1:])
+
+        return cls(nodes, faces, indptr, entry_face.astype(np.int32),
+                   origin, cell_size, (ny, nx))
+
+    def lattice_cells(self, points):
+        """
+        index into the table of the lattice cell of each point, -1 for the
+        points off the lattice
+        """
+        (x0, y0), (dx, dy), (ny, nx) = self.origin, self.cell_size, self.shape
+
+        ix = np.floor((points[:, 0] - x0) / dx)
+        iy = np.floor((points[:, 1] - y0) / dy)
+
+        # the points on the top and right edges are in the last cells
+        ix[ix == nx] = nx - 1
+        iy[iy == ny] = ny - 1
+
+        with np.errstate(invalid='ignore'):
+            on_lattice = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+
+        return np.where(on_lattice, iy * nx + ix, -1).astype(np.intp)
+
+    def locate(self, points):
+        """
+        the face each point is in -- the same as CellTree.locate()
+
+        :param points: (N, 2) array of points, or a single (2,) point
+        :returns: (N,) array of face indexes, -1 for the points not on
+                  the grid, or an int for a single point
+        """
+        points = np.asarray(points, dtype=np.float64)
+        single = points.ndim == 1
+        points = points.reshape(-1, points.shape[-1])[:, :2]
+
+        result = np.empty((len(points),), dtype=np.intp)
+        result[:] = -1
+
+        for start in range(0, len(points), self.chunk_size):
+            chunk = points[start:start + self.chunk_size]
+            cells = self.lattice_cells(chunk)
+
+            idx = np.nonzero(cells >= 0)[0]
+            point_idx, face_idx = self._candidates(cells[idx])
+
+            # the first candidate face each point is in
+            hits = np.nonzero(points_in_faces(self.nodes, self.faces,
+                                              chunk[idx[point_idx]],
+                                              face_idx))[0]
+            hit_points, first = np.unique(point_idx[hits], return_index=True)
+
+            result[start + idx[hit_points]] = face_idx[hits[first]]
+
+        return int(result[0]) if single else result
+
+    def _candidates(self, cells):
+        """
+        the candidate faces of the lattice cells
+
+        :returns: (point_idx, face_idx) -- an entry for each face of each
+                  cell, in order, with the index into cells it is for
+        """
+        begin = np.asarray(self.indptr[cells], dtype=np.intp)
+        counts = np.asarray(self.indptr[cells + 1], dtype=np.intp) - begin
+
+        point_idx = np.repeat(np.arange(len(cells)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) -
+                                                      counts, counts)
+
+        face_idx = np.asarray(self.indices[begin[point_idx] + offsets],
+                              dtype=np.intp)
+
+        return point_idx, face_idx
+
+    def save(self, path, source=''):
+        """
+        save the table in the dir path
+
+        :param source: identifies what the table was built from -- load()
+                       only uses a table with the same source
+
+        It is written to a temp dir, then renamed, so other processes never
+        see a partially written table.
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+        temp_dir = tempfile.mkdtemp(dir=parent)
+
+        try:
+            np.save(os.path.join(temp_dir, 'indptr.npy'), self.indptr)
+            np.save(os.path.join(temp_dir, 'indices.npy'), self.indices)
+            np.savez(os.path.join(temp_dir, 'lattice.npz'),
+                     origin=np.asarray(self.origin, dtype=np.float64),
+                     cell_size=np.asarray(self.cell_size, dtype=np.float64),
+                     shape=np.asarray(self.shape),
+                     source=np.asarray(source))
+
+            os.rename(temp_dir, path)
+        finally:
+            if os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir)
+
+    @classmethod
+    def load(cls, path, nodes, faces, source=''):
+        """
+        load a saved table, memory mapped
+
+        :returns: the table, or None if there isn't one at path, or it was
+                  built from something other than source
+        """
+        try:
+            with np.load(os.path.join(path, 'lattice.npz')) as lattice:
+                if str(lattice['source']) != source:
+                    return None
+
+                origin = lattice['origin']
+                cell_size = lattice['cell_size']
+                shape = lattice['shape']
+
+            indptr = np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r')
+            indices = np.load(os.path.join(path, 'indices.npy'),
+                              mmap_mode='r')
+        except (IOError, KeyError, ValueError):
+            return None
+
+        return cls(nodes, faces, indptr, indices, origin, cell_size, shape)
+
+    @classmethod
+    def for_grid(cls, nodes, faces, path=None, **kwargs):
+        """
+        the table for a grid -- loaded from path if it was saved there for
+        the same nodes and faces, else built, and saved in path if it can be.
+
+        :param path=None: dir the table is kept in. None to not save it.
+
+        Other keyword arguments are passed on to build()
+        """
+        if path is None:
+            return cls.build(nodes, faces, **kwargs)
+
+        source = grid_hash(nodes, faces)
+
+        lookup = cls.load(path, nodes, faces, source)
+        if lookup is None:
+            lookup = cls.build(nodes, faces, **kwargs)
+
+            try:
+                lookup.save(path, source)
+            except (IOError, OSError):
+                # read only data dir, or out of space -- just don't save it
+                pass
+
+        return lookup
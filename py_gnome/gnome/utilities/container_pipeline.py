@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+"""
+container_pipeline.py
+
+Runs the steps of a model time step on the forecast and uncertain spill
+containers at the same time.
+
+The two containers don't share any data arrays, but they share the movers
+and weatherers, which keep some state between the calls for a container,
+and the random number generators. So the uncertain container follows the
+forecast one through the list of operations:
+
+ - it starts an operation only after the forecast container is done with it,
+   so an object is never used by both at once
+ - it starts an operation that draws random numbers only after the forecast
+   container is done with all the ones that do, so the random numbers are
+   drawn in the same order as when the containers are run one after the
+   other, and a seeded run gives the same results.
+
+The C++ movers release the GIL, and so do most numpy operations on large
+arrays, so the two containers can really run at the same time.
+"""
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+def no_random(sc):
+    'draws() for the operations that never draw random numbers'
+    return False
+
+
+def all_random(sc):
+    'draws() for the operations that draw random numbers for any container'
+    return True
+
+
+class ContainerPipeline(object):
+    """
+    Runs a list of (func, draws) operations on a pair of spill containers.
+
+    func(sc) does the operation on container sc, and draws(sc) is True if
+    func(sc) draws any random numbers.
+    """
+    def __init__(self):
+        self._pool = None
+
+    def __getstate__(self):
+        'the worker thread is not copied or pickled'
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPool(1)
+
+        return self._pool
+
+    def close(self):
+        'stop the worker thread'
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def run(self, ops, containers, concurrent=True):
+        """
+        do each of the operations on each of the containers
+
+        :param ops: sequence of (func, draws) tuples
+        :param containers: the forecast container, and the uncertain one if
+                           uncertainty is on.
+        :param concurrent=True: run the uncertain container in the worker
+                                thread. If False, the containers are run one
+                                after the other.
+
+        Errors raised by the operations are raised here.
+        """
+        ops = list(ops)
+        containers = list(containers)
+
+        if not concurrent or len(containers) < 2 or len(ops) == 0:
+            for sc in containers:
+                for func, _draws in ops:
+                    func(sc)
+
+            return
+
+        forecast, uncertain = containers
+
+        # evaluated up front so the worker only runs the operations
+        forecast_draws = [draws(forecast) for _func, draws in ops]
+        uncertain_draws = [draws(uncertain) for _func, draws in ops]
+
+        done = [threading.Event() for op in ops]
+        random_done = threading.Event()
+        aborted = []
+
+        last_draw = max([-1] + [i for i, d in enumerate(forecast_draws) if d])
+        if last_draw < 0:
+            random_done.set()
+
+        def run_uncertain():
+            for i, (func, _draws) in enumerate(ops):
+                done[i].wait()
+
+                if uncertain_draws[i]:
+                    random_done.wait()
+
+                if aborted:
+                    return
+
+                func(uncertain)
+
+        result = self.pool.apply_async(run_uncertain)
+
+        try:
+            for i, (func, _draws) in enumerate(ops):
+                func(forecast)
+
+                done[i].set()
+                if i == last_draw:
+                    random_done.set()
+        except:
+            # let the worker finish, without doing the rest
+            aborted.append(True)
+            random_done.set()
+
+            for event in done:
+                event.set()
+
+            result.wait()
+            raise
+
+        # raises the worker's error, if it had one
+        result.get()
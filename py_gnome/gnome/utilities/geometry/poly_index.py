@@ -0,0 +1,149 @@
+"""
+poly_index.py
+
+A uniform grid index for fast point in polygon tests of many points against
+the same polygon -- the map bounds and spillable areas of the maps.
+
+The bounding box of the polygon is split into a grid of cells, and each cell
+is classified once as inside, outside, or on the boundary (crossed by an
+edge of the polygon). A point test is then a bounding box test and a
+lookup of the cell -- only the points that fall in boundary cells need the
+exact point in polygon test.
+"""
+
+import numpy as np
+
+from gnome.utilities.geometry.cy_point_in_polygon import points_in_poly
+
+
+class PolygonGridIndex(object):
+    """
+    A grid of inside / outside / boundary cells over a polygon
+    """
+    OUTSIDE = 0
+    INSIDE = 1
+    BOUNDARY = 2
+
+    def __init__(self, polygon, max_cells=64):
+        """
+        :param polygon: the vertices of the polygon
+        :type polygon: Nx2 numpy array of floats
+
+        :param max_cells=64: number of cells along the longer side of the
+                             bounding box. The cells are close to square.
+        """
+        self.polygon = np.array(polygon, dtype=np.float64).reshape(-1, 2)
+
+        self.min = self.polygon.min(axis=0)
+        self.max = self.polygon.max(axis=0)
+
+        extent = self.max - self.min
+        if np.any(extent <= 0.0):
+            # degenerate polygon -- just do the bounding box test
+            self.cells = None
+            return
+
+        num_cells = np.maximum(np.round(extent / extent.max() * max_cells),
+                               1).astype(np.intp)
+        self.cell_size = extent / num_cells
+
+        self.cells = self._classify_cells(num_cells)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(<{1} vertices>, cells={2})'
+                .format(self, len(self.polygon),
+                        None if self.cells is None else self.cells.shape))
+
+    def matches(self, polygon):
+        'True if this is an index of polygon'
+        return np.array_equal(self.polygon, polygon)
+
+    def _cell_index(self, points, offset=0.0):
+        'the (i, j) indexes of the cells the points are in'
+        index = np.floor((points - self.min + offset) / self.cell_size)
+
+        return np.clip(index, 0, np.array(self.cells.shape) - 1).astype(np.intp)
+
+    def _classify_cells(self, num_cells):
+        self.cells = np.zeros(num_cells, dtype=np.uint8)
+
+        # split the edges into pieces no longer than half a cell, and mark
+        # the cells the bounding box of each piece touches -- slightly
+        # enlarged, so rounding can't leave an edge out of a cell.
+        # Each piece touches at most 2x2 cells.
+        start = self.polygon
+        end = np.roll(self.polygon, -1, axis=0)
+
+        num_pieces = np.ceil(np.abs((end - start) / self.cell_size)
+                             .max(axis=1) * 2).astype(np.intp)
+        num_pieces = np.maximum(num_pieces, 1)
+
+        counts = num_pieces + 1
+        edge = np.repeat(np.arange(len(start)), counts)
+        step = (np.arange(counts.sum()) -
+                np.repeat(np.cumsum(counts) - counts, counts))
+
+        t = (step / num_pieces[edge].astype(np.float64))[:, None]
+        points = start[edge] + t * (end - start)[edge]
+
+        # consecutive points on the same edge make a piece
+        same_edge = edge[:-1] == edge[1:]
+        piece_min = np.minimum(points[:-1], points[1:])[same_edge]
+        piece_max = np.maximum(points[:-1], points[1:])[same_edge]
+
+        eps = self.cell_size * 1e-6
+        lo = self._cell_index(piece_min, -eps)
+        hi = self._cell_index(piece_max, eps)
+
+        for i in (lo[:, 0], hi[:, 0]):
+            for j in (lo[:, 1], hi[:, 1]):
+                self.cells[i, j] = self.BOUNDARY
+
+        # the other cells are all in or all out -- test the centers
+        i, j = np.nonzero(self.cells != self.BOUNDARY)
+        centers = np.zeros((len(i), 3), dtype=np.float64)
+        centers[:, 0] = self.min[0] + (i + 0.5) * self.cell_size[0]
+        centers[:, 1] = self.min[1] + (j + 0.5) * self.cell_size[1]
+
+        if len(centers) > 0:
+            inside = points_in_poly(self.polygon, centers)
+            self.cells[i[inside], j[inside]] = self.INSIDE
+
+        return self.cells
+
+    def contains(self, points):
+        """
+        compute whether the points are in the polygon -- same results as
+        points_in_poly(polygon, points)
+
+        :param points: the points to test
+        :type points: Nx3 numpy array of (x, y, z) floats, or a single point
+
+        :returns: a boolean array the same length as points, or a python
+                  bool if a single point is passed in
+        """
+        points = np.asarray(points, dtype=np.float64)
+        scalar = (points.shape == (3,))
+        points = points.reshape(-1, 3)
+
+        xy = points[:, :2]
+        result = np.zeros((len(points),), dtype=np.bool)
+
+        candidates = np.nonzero(np.all((xy >= self.min) & (xy <= self.max),
+                                       axis=1))[0]
+
+        if self.cells is not None and len(candidates) > 0:
+            cell = self._cell_index(xy[candidates])
+            cell_class = self.cells[cell[:, 0], cell[:, 1]]
+
+            result[candidates[cell_class == self.INSIDE]] = True
+            candidates = candidates[cell_class == self.BOUNDARY]
+
+        if len(candidates) > 0:
+            result[candidates] = points_in_poly(
+                self.polygon, np.ascontiguousarray(points[candidates]))
+
+        if scalar:
+            return bool(result[0])
+        else:
+            return result
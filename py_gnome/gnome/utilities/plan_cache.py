@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""
+plan_cache.py
+
+Cache of the interpolation "plans" -- the face indexes and interpolation
+weights of a set of points -- of a grid.
+
+All the environment objects built from one file share one grid, but each
+one's at() memoizes the face indexes and interpolation weights under its
+own hash, so with currents, ice, temperature, etc. on the same grid the
+elements are located N times per step. The plans only depend on the grid
+and the points, so the grid keeps them, and every variable on it uses the
+same ones.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class InterpolationPlanCache(object):
+    """
+    An LRU cache of the results of the grid methods that only depend on
+    the points -- locate_faces() and interpolation_alphas().
+
+    The plans are keyed by the contents of the points, not the buffer:
+    numpy reuses freed buffers, so a buffer address says nothing about
+    what is in it.
+    """
+    def __init__(self, max_plans=8):
+        """
+        :param max_plans=8: number of plans to keep. A few sets of points
+                            are used each step -- one per RK stage.
+        """
+        self.max_plans = max_plans
+
+        self.hits = 0
+        self.misses = 0
+
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        'the plans and the lock are not copied or pickled'
+        return {'max_plans': self.max_plans}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self._plans)
+
+    @property
+    def cache_info(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'plans': len(self._plans)}
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    @staticmethod
+    def points_key(points):
+        points = np.ascontiguousarray(points, dtype=np.float64)
+
+        return (points.shape, hashlib.sha1(points.tostring()).digest())
+
+    @staticmethod
+    def _args_key(args, kwargs):
+        """
+        the arguments that change the result -- arrays are derived from
+        the points, and the private memoizing args don't matter.
+        """
+        args = tuple([None if isinstance(a, np.ndarray) else repr(a)
+                      for a in args])
+        kwargs = tuple(sorted([(k, repr(v)) for k, v in kwargs.items()
+                               if not k.startswith('_') and
+                               not isinstance(v, np.ndarray)]))
+
+        return args, kwargs
+
+    def get(self, name, points, args, kwargs, compute):
+        """
+        the plan for name(points, *args, **kwargs), computed with compute()
+        if it is not in the cache.
+
+        A copy of the cached arrays is returned, so callers can modify it.
+        """
+        key = (name, self.points_key(points), self._args_key(args, kwargs))
+
+        with self._lock:
+            plan = self._plans.pop(key, None)
+
+            if plan is not None:
+                # put it back as the most recently used
+                self._plans[key] = plan
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if plan is None:
+            plan = _copy(compute())
+
+            with self._lock:
+                self._plans[key] = plan
+
+                while len(self._plans) > self.max_plans:
+                    self._plans.popitem(last=False)
+
+        return _copy(plan)
+
+
+def _copy(plan):
+    if isinstance(plan, np.ndarray):
+        return plan.copy()
+    elif isinstance(plan, (tuple, list)):
+        return type(plan)([_copy(p) for p in plan])
+    else:
+        return plan
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+query.py
+
+Vectorized filtering of element data.
+
+A query expression is parsed once into a tree of functions that compute
+numpy boolean masks over the data arrays of a SpillContainer, so
+evaluating it does no per-element python work. It works the same on the
+live SpillContainers and on the SpillContainerData loaded from the
+ElementCache.
+
+Expression syntax::
+
+    status_codes == in_water && positions[:, 2] > 10 || age < 3600
+
+- comparisons: ``<  <=  >  >=  ==  !=``
+- an operand is a number, a data array name, a column of a vector data
+  array -- ``positions[:, 2]`` or ``positions[2]`` -- or the name of an
+  oil_status code -- ``in_water`` or ``oil_status.in_water``
+- ``||`` (or ``or``) and ``&&`` (or ``and``) combine comparisons.
+
+.. note:: For compatibility with the original Model.get_spill_data(),
+          ``||`` binds tighter than ``&&``, so the example above is:
+          ``in_water && (deep || young)``. Use parentheses to group things
+          differently.
+"""
+import re
+import operator
+
+import numpy as np
+
+from gnome.basic_types import oil_status
+
+
+_comparisons = {'<': operator.lt,
+                '<=': operator.le,
+                '>': operator.gt,
+                '>=': operator.ge,
+                '==': operator.eq,
+                '!=': operator.ne}
+
+_token_re = re.compile(r"""\s*(?:
+    (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?) |
+    (?P<compare><=|>=|==|!=|<|>) |
+    (?P<logic>&&|\|\|) |
+    (?P<paren>[()]) |
+    (?P<name>[A-Za-z_][\w.]*)\s*(?P<index>\[[^\]]*\])?
+    )""", re.VERBOSE)
+
+_index_re = re.compile(r'^\[\s*(?::\s*,)?\s*(\d+)\s*\]$')
+
+
+class QueryError(ValueError):
+    'Raised for an invalid query expression'
+    pass
+
+
+def _tokenize(expression):
+    'split the expression into a list of (kind, value) tuples'
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+
+    while pos < len(expression):
+        match = _token_re.match(expression, pos)
+        if match is None or match.end() == pos:
+            raise QueryError('invalid query expression at: "{0}"'
+                             .format(expression[pos:]))
+
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == 'index':
+            tokens.append(('name', (match.group('name'),
+                                    match.group('index'))))
+        elif kind == 'name' and match.group('name') in ('and', 'or'):
+            tokens.append(('logic',
+                           '&&' if match.group('name') == 'and' else '||'))
+        elif kind == 'name':
+            tokens.append(('name', (match.group('name'), None)))
+        else:
+            tokens.append((kind, match.group(kind)))
+
+    return tokens
+
+
+def _status_code(name):
+    'value of the oil_status code with this name, or None'
+    if name.startswith('oil_status.'):
+        name = name[len('oil_status.'):]
+
+    return getattr(oil_status, name, None)
+
+
+class SpillDataQuery(object):
+    """
+    A parsed query expression that can be applied to spill container data
+
+    Example::
+
+        query = SpillDataQuery('status_codes == on_land && age > 3600')
+        mask = query.mask(sc)
+        data = query.select(sc, ['id', 'positions'])
+    """
+    def __init__(self, conditions=None):
+        """
+        :param conditions: query expression. If None or empty, all elements
+                           are selected
+        :type conditions: string
+        """
+        self.conditions = conditions
+
+        if conditions is None or not conditions.strip():
+            self._mask = None
+        else:
+            self._tokens = _tokenize(conditions)
+            self._pos = 0
+
+            self._mask = self._parse_and()
+            if self._pos != len(self._tokens):
+                raise QueryError('unexpected "{0}" in query expression: "{1}"'
+                                 .format(self._tokens[self._pos][1],
+                                         conditions))
+
+            del self._tokens
+
+    def __repr__(self):
+        return '{0.__class__.__name__}({0.conditions!r})'.format(self)
+
+    # recursive descent parser -- each _parse_* method returns a function
+    # that takes the data and returns a mask, or an operand value.
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        else:
+            return (None, None)
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            raise QueryError('incomplete query expression: "{0}"'
+                             .format(self.conditions))
+        self._pos += 1
+
+        return token
+
+    def _parse_and(self):
+        terms = [self._parse_or()]
+        while self._peek() == ('logic', '&&'):
+            self._next()
+            terms.append(self._parse_or())
+
+        if len(terms) == 1:
+            return terms[0]
+
+        return lambda data: reduce(np.logical_and,
+                                   [term(data) for term in terms])
+
+    def _parse_or(self):
+        terms = [self._parse_atom()]
+        while self._peek() == ('logic', '||'):
+            self._next()
+            terms.append(self._parse_atom())
+
+        if len(terms) == 1:
+            return terms[0]
+
+        return lambda data: reduce(np.logical_or,
+                                   [term(data) for term in terms])
+
+    def _parse_atom(self):
+        if self._peek() == ('paren', '('):
+            self._next()
+            mask = self._parse_and()
+
+            if self._next() != ('paren', ')'):
+                raise QueryError('missing ")" in query expression: "{0}"'
+                                 .format(self.conditions))
+            return mask
+
+        left = self._parse_operand()
+
+        kind, op = self._next()
+        if kind != 'compare':
+            raise QueryError('expected a comparison, got "{0}" in query '
+                             'expression: "{1}"'.format(op, self.conditions))
+        compare = _comparisons[op]
+
+        right = self._parse_operand()
+
+        return lambda data: compare(left(data), right(data))
+
+    def _parse_operand(self):
+        kind, value = self._next()
+
+        if kind == 'number':
+            number = float(value) if re.search('[.eE]', value) else int(value)
+            return lambda data: number
+
+        if kind != 'name':
+            raise QueryError('unexpected "{0}" in query expression: "{1}"'
+                             .format(value, self.conditions))
+
+        name, index = value
+
+        if index is None:
+            code = _status_code(name)
+            if code is not None:
+                return lambda data: code
+
+            return lambda data: self._column(data, name)
+
+        match = _index_re.match(index)
+        if match is None:
+            raise QueryError('only a single column: "{0}[:, n]" can be used '
+                             'in a query expression'.format(name))
+        column = int(match.group(1))
+
+        return lambda data: self._column(data, name)[:, column]
+
+    def _column(self, data, name):
+        try:
+            return data[name]
+        except KeyError:
+            raise QueryError('"{0}" is not a data array or a status code'
+                             .format(name))
+
+    def mask(self, sc):
+        """
+        evaluate the query
+
+        :param sc: a SpillContainer, SpillContainerData, or dict of data
+                   arrays
+        :returns: boolean array the length of the data arrays
+        """
+        if isinstance(sc, dict):
+            num_elements = len(next(sc.itervalues(), ()))
+        else:
+            num_elements = len(sc)
+
+        if self._mask is None:
+            return np.ones(num_elements, dtype=bool)
+
+        mask = np.asarray(self._mask(sc), dtype=bool)
+        if mask.ndim == 0:
+            # comparison of constants
+            mask = np.repeat(mask, num_elements)
+        elif mask.ndim > 1:
+            raise QueryError('comparison on a vector data array -- '
+                             'select a column: "name[:, n]"')
+
+        return mask
+
+    def select(self, sc, target_properties):
+        """
+        evaluate the query and return the selected elements of the data
+        arrays named in target_properties
+
+        :param sc: a SpillContainer, SpillContainerData, or dict of data
+                   arrays
+        :param target_properties: names of the data arrays to return
+        :returns: dict of {name: array}
+        """
+        mask = self.mask(sc)
+
+        return dict([(name, sc[name][mask]) for name in target_properties])
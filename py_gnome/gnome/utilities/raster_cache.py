@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+
+"""
+raster_cache.py
+
+Persistent, content-addressed cache for the land rasters of the raster maps
+
+Rasterizing the land polygons of a map (and building the coarse layers
+from that) is slow for large rasters, and is repeated every time a map is
+created -- for every save file load, and every uncertainty worker process.
+
+This caches the raster layers, and the parameters of the projection, in a
+directory per raster. The directory name is a hash of the map file path
+and the raster parameters. A digest of the header, size and modification
+time of the map file, and of the layer files, is saved with the raster and
+checked when it is loaded, so a changed file never gets a stale raster --
+without reading the whole file or the layers. The layers are saved as .npy
+files and loaded memory mapped, so repeated loads and forked processes
+share the same pages.
+
+The maps don't use a cache unless they are given one, or the
+GNOME_RASTER_CACHE_DIR environment variable is set (see default_cache()).
+
+A RasterCache made without a dir uses a dir for the user in the system temp
+dir, that only the user can get to. A dir that other users can write to is
+never used. The layers are checked against the rasters they were saved
+from when they are written, and their shape and dtype when they are loaded.
+"""
+import os
+import stat
+import shutil
+import tempfile
+import getpass
+import hashlib
+
+import numpy as np
+
+# bump this if the way rasters are built changes, so old rasters
+# are not used
+_format_version = 3
+
+
+def default_cache():
+    """
+    The RasterCache the maps use if they are not given one: None, unless the
+    GNOME_RASTER_CACHE_DIR environment variable is set to the dir to use.
+    """
+    cache_dir = os.environ.get('GNOME_RASTER_CACHE_DIR')
+
+    if cache_dir:
+        return RasterCache(cache_dir)
+
+    return None
+
+
+def default_cache_dir():
+    'the dir in the system temp dir for the current user\'s rasters'
+    return os.path.join(tempfile.gettempdir(),
+                        'gnome_raster_cache-{0}'.format(getpass.getuser()))
+
+
+def is_private_dir(dirname):
+    """
+    True if dirname is a dir owned by the current user, that no one else
+    can write to -- so nothing in it was put there by another user
+    """
+    try:
+        st = os.lstat(dirname)
+    except OSError:
+        return False
+
+    if not stat.S_ISDIR(st.st_mode):
+        return False
+
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+
+    return not (st.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
+def array_hash(arr):
+    'sha1 hex digest of the data of an array'
+    return hashlib.sha1(np.ascontiguousarray(arr).view(np.uint8)).hexdigest()
+
+
+def file_digest(filename, header_size=64 * 1024):
+    """
+    sha1 hex digest of the header, size and modification time of a file --
+    it changes when the file does, without reading all of it
+    """
+    st = os.stat(filename)
+    sha1 = hashlib.sha1(repr((st.st_size, st.st_mtime)))
+
+    with open(filename, 'rb') as infile:
+        sha1.update(infile.read(header_size))
+
+    return sha1.hexdigest()
+
+
+def files_digest(filenames):
+    'sha1 hex digest of the size and modification time of some files'
+    stats = [os.stat(fn) for fn in filenames]
+
+    return hashlib.sha1(repr([(st.st_size, st.st_mtime)
+                              for st in stats])).hexdigest()
+
+
+class RasterCache(object):
+    """
+    A directory of cached raster map layers
+    """
+    def __init__(self, cache_dir=None):
+        """
+        :param cache_dir=None: directory to keep the rasters in. If None, a
+                               dir for the user in the system temp dir.
+
+        The dir is made if it isn't there, so only the user can get to it.
+        It is not used if other users can write to it.
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+
+        self.cache_dir = cache_dir
+
+    def _usable(self):
+        'True if the cache dir is there, and only the user can write to it'
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir, 0700)
+            except OSError:
+                return False
+
+        return is_private_dir(self.cache_dir)
+
+    def __repr__(self):
+        return '{0.__class__.__name__}({0.cache_dir!r})'.format(self)
+
+    def make_key(self, filename, *params):
+        """
+        Returns the key for a raster built from filename
+
+        :param filename: the data file the raster is built from. Its
+                         absolute path is hashed -- its contents are
+                         checked by load().
+        :param params: anything else the raster depends on -- raster size,
+                       bounds, etc. Their repr() is hashed.
+        """
+        sha1 = hashlib.sha1(os.path.abspath(filename))
+        sha1.update(repr((_format_version,) + params))
+
+        return sha1.hexdigest()
+
+    def _raster_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def _layer_filenames(raster_dir, num_layers):
+        return [os.path.join(raster_dir, 'layer_{0}.npy'.format(i))
+                for i in range(num_layers)]
+
+    @staticmethod
+    def _digest(filename, layer_filenames):
+        'the digest of the data file and the layer files of a raster'
+        return hashlib.sha1(file_digest(filename) +
+                            files_digest(layer_filenames)).hexdigest()
+
+    def load(self, key, filename):
+        """
+        load a cached raster
+
+        :param key: the key of the raster -- see make_key()
+        :param filename: the data file the raster is built from
+
+        :returns: (layers, viewport, image_size) or None if the raster is not
+                  in the cache, or the data file or the layer files have
+                  changed since it was saved. The layers are copy-on-write
+                  memory mapped arrays, finest last.
+        """
+        if not self._usable():
+            return None
+
+        raster_dir = self._raster_dir(key)
+
+        try:
+            with np.load(os.path.join(raster_dir, 'projection.npz')) as proj:
+                viewport = tuple(map(tuple, proj['viewport']))
+                image_size = tuple(proj['image_size'])
+                shapes = [tuple(shape) for shape in proj['shapes']]
+                digest = str(proj['digest'])
+
+            layer_filenames = self._layer_filenames(raster_dir, len(shapes))
+
+            if self._digest(filename, layer_filenames) != digest:
+                return None
+
+            # copy-on-write, because the land check code requires writable
+            # arrays -- nothing is written to them though
+            layers = [np.load(fn, mmap_mode='c') for fn in layer_filenames]
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+        for layer, shape in zip(layers, shapes):
+            if layer.dtype != np.uint8 or layer.shape != shape:
+                return None
+
+        return layers, viewport, image_size
+
+    def save(self, key, filename, layers, viewport, image_size):
+        """
+        save a raster in the cache, replacing the one that was there
+
+        :param key: the key of the raster -- see make_key()
+        :param filename: the data file the raster is built from
+        :param layers: the raster layers
+        :param viewport: ((min_lon, min_lat), (max_lon, max_lat)) of the
+                         raster
+        :param image_size: (w, h) size of the raster the projection was set
+                           up for
+
+        It is written to a temp dir, and the layers written are checked
+        against the ones given, then it is renamed, so other processes never
+        see a partially written raster.
+        """
+        if not self._usable():
+            # can't write to the cache dir, or shouldn't
+            return
+
+        raster_dir = self._raster_dir(key)
+
+        try:
+            temp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        except OSError:
+            # can't write to the cache dir -- don't cache this one
+            return
+
+        try:
+            layers = [np.ascontiguousarray(layer, dtype=np.uint8)
+                      for layer in layers]
+            layer_filenames = self._layer_filenames(temp_dir, len(layers))
+
+            for fn, layer in zip(layer_filenames, layers):
+                np.save(fn, layer)
+
+                if array_hash(np.load(fn, mmap_mode='r')) != array_hash(layer):
+                    return
+
+            # the file names in the digest don't matter, so the rename
+            # doesn't change it
+            np.savez(os.path.join(temp_dir, 'projection.npz'),
+                     viewport=np.asarray(viewport, dtype=np.float64),
+                     image_size=np.asarray(image_size),
+                     shapes=np.array([layer.shape for layer in layers]),
+                     digest=np.array(self._digest(filename,
+                                                  layer_filenames)))
+
+            if os.path.isdir(raster_dir):
+                # it is out of date -- the maps that have its layers mapped
+                # keep them
+                shutil.rmtree(raster_dir)
+
+            os.rename(temp_dir, raster_dir)
+        except (IOError, OSError):
+            # out of space, or another process saved the same raster first
+            pass
+        finally:
+            if os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir)
+
+    def clear(self):
+        'remove all the cached rasters'
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""
+shared_ring.py
+
+A ring buffer in shared memory, for passing the numpy arrays in the results
+of a child process to its parent without pickling them.
+
+The ModelBroadcaster sends every result from the ModelConsumer processes
+over zmq as a pickle, so the time to get the results of a step grows with
+the size of the arrays in them. With a SharedRing, the consumer copies the
+arrays into the shared memory, and only pickles small ArrayRef descriptors
+of where they are. The parent copies them back out when it unpacks the
+result.
+
+The parent and the child take turns -- the child only packs a result after
+the parent has unpacked the one before -- so there is no locking. A result
+only uses the part of the ring after the last one, so all the arrays in one
+result can be in the ring, if they fit.
+"""
+import ctypes
+import multiprocessing as mp
+from collections import namedtuple
+
+import numpy as np
+
+
+# where an array is in the ring
+ArrayRef = namedtuple('ArrayRef', 'offset dtype shape')
+
+# arrays are put at offsets that are a multiple of this
+_alignment = 64
+
+
+class SharedRing(object):
+    """
+    A shared memory ring buffer that the ndarrays in a result are put in.
+
+    Create it before the child process is started, so the child shares it.
+    """
+    def __init__(self, size=16 * 2 ** 20, min_bytes=4096):
+        """
+        :param size=16MB: size of the ring in bytes
+        :param min_bytes=4096: arrays smaller than this are just pickled
+        """
+        self.size = size
+        self.min_bytes = min_bytes
+
+        self._raw = mp.RawArray(ctypes.c_ubyte, size)
+        self._buffer = None
+        self._head = 0
+        self._used = 0
+
+    def __getstate__(self):
+        'the view of the shared memory is made again in the child'
+        state = self.__dict__.copy()
+        state['_buffer'] = None
+
+        return state
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(size={0.size}, '
+                'min_bytes={0.min_bytes})'.format(self))
+
+    @property
+    def buffer(self):
+        'the shared memory as a uint8 array'
+        if self._buffer is None:
+            self._buffer = np.frombuffer(self._raw, dtype=np.uint8)
+
+        return self._buffer
+
+    def pack(self, obj):
+        """
+        obj, with the ndarrays in it replaced by ArrayRefs to copies of them
+        in the ring. The dicts, lists and tuples in obj are searched for
+        arrays -- they are copied, obj is not changed.
+
+        Arrays that are too small, or don't fit in what is left of the ring
+        for this result, are left in place to be pickled.
+        """
+        self._used = 0
+
+        return self._pack(obj)
+
+    def unpack(self, obj):
+        """
+        obj, with the ArrayRefs in it replaced by copies of the arrays they
+        refer to. Call it before the child packs the next result.
+        """
+        if isinstance(obj, ArrayRef):
+            count = int(np.prod(obj.shape))
+
+            return (np.frombuffer(self.buffer, dtype=obj.dtype, count=count,
+                                  offset=obj.offset)
+                    .reshape(obj.shape).copy())
+        elif isinstance(obj, dict):
+            obj = obj.copy()
+            for k, v in obj.items():
+                obj[k] = self.unpack(v)
+
+            return obj
+        elif type(obj) is list:
+            return [self.unpack(v) for v in obj]
+        elif type(obj) is tuple:
+            return tuple([self.unpack(v) for v in obj])
+        else:
+            return obj
+
+    def _pack(self, obj):
+        if type(obj) is np.ndarray:
+            return self._put(obj)
+        elif isinstance(obj, dict):
+            obj = obj.copy()
+            for k, v in obj.items():
+                obj[k] = self._pack(v)
+
+            return obj
+        elif type(obj) is list:
+            return [self._pack(v) for v in obj]
+        elif type(obj) is tuple:
+            return tuple([self._pack(v) for v in obj])
+        else:
+            return obj
+
+    def _put(self, arr):
+        """
+        copy arr into the ring, and return its ArrayRef -- or arr if it
+        shouldn't or can't go in the ring
+        """
+        nbytes = arr.nbytes
+
+        if nbytes == 0 or nbytes < self.min_bytes or arr.dtype.hasobject:
+            return arr
+
+        offset = -(-self._head // _alignment) * _alignment
+        if offset + nbytes > self.size:
+            # wrap around to the start
+            offset = 0
+
+        # the bytes skipped at the end count as used
+        used = self._used + (offset - self._head) % self.size + nbytes
+        if used > self.size:
+            # would overwrite an array of this result
+            return arr
+
+        self.buffer[offset:offset + nbytes] = (np.ascontiguousarray(arr)
+                                               .reshape(-1).view(np.uint8))
+
+        self._used = used
+        self._head = (offset + nbytes) % self.size
+
+        return ArrayRef(offset, arr.dtype, arr.shape)
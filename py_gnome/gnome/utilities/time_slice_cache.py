@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+"""
+time_slice_cache.py
+
+An LRU cache of the time slices of a gridded data variable.
+
+The gridded environment objects read the two time slices that bracket the
+model time from the data variable -- usually a netCDF4 Variable -- on every
+call to at(). With RK4 movers and the weatherers that is many reads of the
+same two slices from disk per time step.
+
+TimeSliceCache wraps the data variable, and looks like it to the code that
+uses it: indexing with a single time index returns the decoded slice from
+the cache, reading it only on a miss. When a slice is used, the next one is
+read by a background thread, so it is in the cache by the time the model
+gets to it.
+"""
+import threading
+import Queue
+from collections import OrderedDict
+
+import numpy as np
+
+# guards reading the data of all the caches -- netCDF4 is not thread safe,
+# and the variables of different caches (the u and v of a current, say) are
+# often in the same file
+_read_lock = threading.Lock()
+
+# the prefetches of all the caches are done by one long-lived worker thread,
+# as the reads are done one at a time anyway. If more than this many are
+# waiting, the slice is not prefetched -- it is read when it is used.
+_max_pending_prefetches = 16
+
+# (thread, queue) of the prefetch worker, started on the first prefetch
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def _prefetch_worker(queue):
+    """
+    Worker loop of the prefetch thread: pulls (cache, index, pending)
+    off the queue, and reads the slice into the cache.
+    """
+    while True:
+        cache, index, pending = queue.get()
+
+        try:
+            cache._prefetch(index, pending)
+        finally:
+            # don't keep the last cache alive
+            cache = pending = None
+            queue.task_done()
+
+
+def _prefetch_queue():
+    'the queue of the prefetch worker -- started if it is not running'
+    global _prefetcher
+
+    with _prefetcher_lock:
+        if _prefetcher is None or not _prefetcher[0].is_alive():
+            # a new queue too -- a forked process gets the queue, but not
+            # the thread
+            queue = Queue.Queue(maxsize=_max_pending_prefetches)
+
+            thread = threading.Thread(target=_prefetch_worker,
+                                      args=(queue,),
+                                      name='TimeSlicePrefetcher')
+            thread.daemon = True
+            thread.start()
+
+            _prefetcher = (thread, queue)
+
+        return _prefetcher[1]
+
+
+class TimeSliceCache(object):
+    """
+    Wraps a data array with time as the first dimension, and caches the
+    most recently used time slices.
+
+    Indexing with anything other than a single time index first -- e.g.
+    ``data[:]`` or ``data[2:4]`` -- goes straight to the wrapped data.
+    Attributes not defined here are looked up on the wrapped data, so
+    ``shape``, ``dimensions``, ``units``, etc. all work.
+    """
+    def __init__(self, data, max_slices=4, prefetch=True):
+        """
+        :param data: the data to cache -- a netCDF4 Variable or anything that
+                     can be indexed like a numpy array.
+
+        :param max_slices=4: maximum number of time slices to keep
+
+        :param prefetch=True: if True, have the background prefetch
+                              thread read the next time slice when a
+                              slice is used.
+        """
+        self.data = data
+        self.max_slices = max_slices
+        self.prefetch = prefetch
+
+        self._reset()
+
+    def _reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+        self._slices = OrderedDict()
+        self._pending = {}
+
+        # guards the cache itself
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        'the cached slices, locks and counters are not copied or pickled'
+        return {'data': self.data,
+                'max_slices': self.max_slices,
+                'prefetch': self.prefetch}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def __getattr__(self, name):
+        # only called for the attributes not found on self
+        if name == 'data':
+            raise AttributeError(name)
+
+        return getattr(self.data, name)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}({0.data!r}, max_slices={0.max_slices})'
+                .format(self))
+
+    @property
+    def cache_info(self):
+        'hit / miss counters, and the time indexes of the cached slices'
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'prefetched': self.prefetched,
+                    'slices': self._slices.keys()}
+
+    def clear(self):
+        'remove all the cached slices'
+        with self._lock:
+            self._slices.clear()
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        index = key[0]
+        if isinstance(index, (int, long, np.integer)):
+            if index < 0:
+                index += len(self.data)
+
+            if 0 <= index < len(self.data):
+                time_slice = self.get_slice(int(index))
+
+                return time_slice[key[1:]] if len(key) > 1 else time_slice
+
+        # not a single time slice
+        with _read_lock:
+            return self.data[key]
+
+    def get_slice(self, index):
+        """
+        the time slice at index, read from the data if it is not in
+        the cache.
+
+        The slices are read-only, as they are shared by all the callers.
+        """
+        while True:
+            with self._lock:
+                time_slice = self._slices.pop(index, None)
+
+                if time_slice is not None:
+                    # put it back as the most recently used
+                    self._slices[index] = time_slice
+                    self.hits += 1
+                    break
+
+                pending = self._pending.get(index)
+                if pending is None:
+                    self.misses += 1
+
+            if pending is None:
+                time_slice = self._read(index)
+
+                with self._lock:
+                    self._store(index, time_slice)
+                break
+            else:
+                # being prefetched -- wait for it
+                pending.wait()
+
+        if self.prefetch:
+            self._start_prefetch(index + 1)
+
+        return time_slice
+
+    def _read(self, index):
+        with _read_lock:
+            time_slice = self.data[index]
+
+        if isinstance(time_slice, np.ndarray):
+            time_slice.flags.writeable = False
+
+        return time_slice
+
+    def _store(self, index, time_slice):
+        'add a slice, and drop the least recently used ones -- lock is held'
+        self._slices[index] = time_slice
+
+        while len(self._slices) > self.max_slices:
+            self._slices.popitem(last=False)
+
+    def _start_prefetch(self, index):
+        if index >= len(self.data):
+            return
+
+        with self._lock:
+            if index in self._slices or index in self._pending:
+                return
+
+            pending = self._pending[index] = threading.Event()
+
+        try:
+            _prefetch_queue().put_nowait((self, index, pending))
+        except Queue.Full:
+            # the worker is behind -- it is read when it is used
+            with self._lock:
+                del self._pending[index]
+
+            pending.set()
+
+    def _prefetch(self, index, pending):
+        try:
+            time_slice = self._read(index)
+
+            with self._lock:
+                self._store(index, time_slice)
+                self.prefetched += 1
+        except Exception:
+            # it is read again if it is needed, and the error raised then
+            pass
+        finally:
+            with self._lock:
+                del self._pending[index]
+
+            pending.set()
@@ -872,7 +872,7 @@ class ChemicalDispersion(CleanUpBase, Serializable):
             # if wave height > 6.4 m, we get negative results - log and
             # reset to 0 if this occurs
             # can efficiency go to 0? Is there a minimum threshold?
-            w = 0.3 * self.waves.get_value(points, model_time)[0]
+            w = 0.3 * self.get_waves(points, model_time)[0]
             efficiency = (0.241 + 0.587*w - 0.191*w**2 +
                           0.02616*w**3 - 0.0016 * w**4 -
                           0.000037*w**5)
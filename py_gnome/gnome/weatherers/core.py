@@ -35,6 +35,10 @@ class Weatherer(Process, Serializable):
     _state = copy.deepcopy(Process._state)
     _schema = WeathererSchema  # nothing new added so use this schema
 
+    # set by the model: the EnvironmentSnapshot of the current time step,
+    # shared by all the weatherers
+    env_snapshot = None
+
     def __init__(self, **kwargs):
         '''
         Base weatherer class; defines the API for all weatherers
@@ -110,10 +114,48 @@ class Weatherer(Process, Serializable):
         '''
         Wrapper for the weatherers so they can extrapolate
         '''
+        if self.env_snapshot is not None:
+            return self.env_snapshot.wind_speed(self.wind, points, model_time,
+                                                format, fill_value)
+
 #         new_model_time = self.check_time(wind, model_time)
         retval = self.wind.at(points, model_time, format=format)
         return retval.filled(fill_value) if isinstance(retval, np.ma.MaskedArray) else retval
 
+    def get_waves(self, points, model_time):
+        '''
+        wave height, peak period, whitecap fraction and dissipative wave
+        energy from self.waves -- from the environment snapshot if the
+        model set one
+        '''
+        if self.env_snapshot is not None:
+            return self.env_snapshot.waves(self.waves, points, model_time)
+
+        return self.waves.get_value(points, model_time)
+
+    def get_emulsification_wind(self, points, model_time):
+        'self.waves.get_emulsification_wind(), from the snapshot if set'
+        if self.env_snapshot is not None:
+            return self.env_snapshot.emulsification_wind(self.waves, points,
+                                                         model_time)
+
+        return self.waves.get_emulsification_wind(points, model_time)
+
+    def get_water(self, attr, unit=None, water=None):
+        '''
+        water property attr, in SI units if unit is None -- from the
+        snapshot if set
+
+        :param water=None: the Water object. Defaults to self.water.
+        '''
+        if water is None:
+            water = self.water
+
+        if self.env_snapshot is not None:
+            return self.env_snapshot.water(water, attr, unit)
+
+        return water.get(attr, unit)
+
     def check_time(self, wind, model_time):
         """
         Should have an option to extrapolate but for now we do by default
@@ -165,7 +165,8 @@ class Dissolution(Weatherer, Serializable):
         #        .format(substance.get_density(self.waves.water
         #                                      .get('temperature'))))
         # print 'avg_rhos = ', avg_rhos
-        water_rhos = np.zeros(avg_rhos.shape) + self.waves.water.get('density')
+        water_rhos = (np.zeros(avg_rhos.shape) +
+                      self.get_water('density', water=self.waves.water))
 
         k_w_i = Stokes.water_phase_xfer_velocity(water_rhos - avg_rhos,
                                                  droplet_avg_sizes)
@@ -288,7 +289,7 @@ class Dissolution(Weatherer, Serializable):
                                    points,
                                    model_time,
                                    water_phase_xfer_velocity):
-        wave_height = self.waves.get_value(points, model_time)[0]
+        wave_height = self.get_waves(points, model_time)[0]
         wind_speed = np.clip(self.get_wind_speed(points, model_time), 0.01, None)
         wave_period = PiersonMoskowitz.peak_wave_period(wind_speed)
 
@@ -390,7 +390,7 @@ class Emulsification(Weatherer, Serializable):
         '''
 
         ## higher of real or psuedo wind
-        wind_speed = self.waves.get_emulsification_wind(points, model_time)
+        wind_speed = self.get_emulsification_wind(points, model_time)
 
         # water uptake rate constant - get this from database
         K0Y = substance.get('k0y')
@@ -82,7 +82,7 @@ class Evaporation(Weatherer, Serializable):
     def _set_evap_decay_constant(self, points, model_time, data, substance, time_step):
         # used to compute the evaporation decay constant
         K = self._mass_transport_coeff(points, model_time)
-        water_temp = self.water.get('temperature', 'K')
+        water_temp = self.get_water('temperature', 'K')
 
         f_diff = 1.0
         if 'frac_water' in data:
@@ -212,7 +212,7 @@ class BlobEvaporation(Evaporation):
         # blobs released together
         # used to compute the evaporation decay constant
         K = self._mass_transport_coeff(model_time)
-        water_temp = self.water.get('temperature', 'K')
+        water_temp = self.get_water('temperature', 'K')
 
         f_diff = 1.0
         if 'frac_water' in data:
@@ -98,16 +98,19 @@ class NaturalDispersion(Weatherer):
                 continue
             points = data['positions']
             # from the waves module
-            waves_values = self.waves.get_value(points, model_time)
+            waves_values = self.get_waves(points, model_time)
             wave_height = waves_values[0]
             frac_breaking_waves = waves_values[2]
             disp_wave_energy = waves_values[3]
 
-            visc_w = self.waves.water.kinematic_viscosity
-            rho_w = self.waves.water.density
+            # the attributes themselves, not Water.get(): the values are
+            # always SI, whatever Water.units says
+            water = self.waves.water
+            visc_w = water.kinematic_viscosity
+            rho_w = water.density
 
             # web has different units
-            sediment = self.waves.water.get('sediment', unit='kg/m^3')
+            sediment = self.get_water('sediment', 'kg/m^3', water=water)
             V_entrain = constants.volume_entrained
             ka = constants.ka  # oil sticking term
 
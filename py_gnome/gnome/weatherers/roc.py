@@ -1151,7 +1151,7 @@ class Disperse(Response):
             zero_or_disp = np.isclose(sc['mass'][idxs], 0)
             new_status = sc['fate_status'][idxs]
             new_status[zero_or_disp] = bt_fate.disperse
-            sc['fate_status'][idxs] = new_status
+            sc.get_writable('fate_status')[idxs] = new_status
             self.oil_treated_this_timestep = 0
             self.disp_sprayed_this_timestep = 0
 
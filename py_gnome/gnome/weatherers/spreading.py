@@ -459,7 +459,7 @@ class FayGravityViscous(Weatherer, Serializable):
         if not self.active:
             return
 
-        water_kvis = self.water.get('kinematic_viscosity',
+        water_kvis = self.get_water('kinematic_viscosity',
                                     'square meter per second')
         for _, data in sc.itersubstancedata(self.array_types):
             if len(data['fay_area']) == 0:
@@ -607,7 +607,7 @@ class Langmuir(Weatherer, Serializable):
             return
 
         #return
-        rho_h2o = self.water.get('density', 'kg/m^3')
+        rho_h2o = self.get_water('density', 'kg/m^3')
         for _, data in sc.itersubstancedata(self.array_types):
             #if len(data['area']) == 0:
             if len(data['fay_area']) == 0:
@@ -450,18 +450,41 @@ elif sys.platform == "linux2":
     extensions.append(basic_types_ext)
     static_lib_files = []
 
+# extensions that use OpenMP (cython.parallel.prange)
+# without OpenMP they still build, and run single threaded
+# (the default clang on darwin doesn't support it)
+openmp_extensions = ['cy_land_check']
+
+if sys.platform == "win32":
+    openmp_compile_args = ['/openmp']
+    openmp_link_args = []
+elif sys.platform == "linux2":
+    openmp_compile_args = ['-fopenmp']
+    openmp_link_args = ['-fopenmp']
+else:
+    openmp_compile_args = []
+    openmp_link_args = []
+
 #
 # All other lib_gnome-based cython extensions.
 # These depend on the successful build of cy_basic_types
 #
 for mod_name in extension_names:
     cy_file = os.path.join("gnome/cy_gnome", mod_name + ".pyx")
+
+    if mod_name in openmp_extensions:
+        ext_compile_args = compile_args + openmp_compile_args
+        ext_link_args = link_args + openmp_link_args
+    else:
+        ext_compile_args = compile_args
+        ext_link_args = link_args
+
     extensions.append(Extension('gnome.cy_gnome.' + mod_name,
                                 [cy_file],
                                 language="c++",
                                 define_macros=macros,
-                                extra_compile_args=compile_args,
-                                extra_link_args=link_args,
+                                extra_compile_args=ext_compile_args,
+                                extra_link_args=ext_link_args,
                                 libraries=lib,
                                 library_dirs=libdirs,
                                 extra_objects=static_lib_files,
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""
+some code to profile locating points on a large curvilinear grid
+
+compares the cell lookup table to the cell tree search that the grids
+use by default.
+"""
+
+import time
+
+import numpy as np
+
+from cell_tree2d import CellTree
+
+from gnome.utilities.cell_lookup import CellLookupTable
+
+nx, ny = 500, 400
+
+i, j = np.meshgrid(np.arange(nx + 1, dtype=np.float64),
+                   np.arange(ny + 1, dtype=np.float64))
+r = 10 + j / 10.
+theta = i * np.pi / (2 * nx)
+
+nodes = np.column_stack(((r * np.cos(theta)).ravel(),
+                         (r * np.sin(theta)).ravel()))
+
+i, j = np.meshgrid(np.arange(nx), np.arange(ny))
+n0 = (j * (nx + 1) + i).ravel()
+faces = np.column_stack((n0, n0 + 1, n0 + nx + 2, n0 + nx + 1))
+
+print "%i faces" % len(faces)
+
+start = time.time()
+tree = CellTree(nodes, faces)
+print "building the cell tree: %.4f seconds" % (time.time() - start)
+
+start = time.time()
+lookup = CellLookupTable.build(nodes, faces)
+print "building the lookup table: %.4f seconds %r" % (time.time() - start,
+                                                      lookup)
+
+for num_points in (10000, 100000, 1000000):
+    # within the bounding box of the grid
+    points = np.column_stack((np.random.uniform(0, 50, num_points),
+                              np.random.uniform(0, 50, num_points)))
+
+    print "%i points:" % num_points
+
+    start = time.time()
+    tree_faces = tree.locate(points)
+    tree_time = time.time() - start
+
+    start = time.time()
+    lookup_faces = lookup.locate(points)
+    lookup_time = time.time() - start
+
+    # points right on an edge can go either way
+    agree = (tree_faces == lookup_faces).mean()
+
+    print ("   cell tree %.4f seconds, lookup table %.4f seconds, "
+           "%.4f%% agree" % (tree_time, lookup_time, agree * 100))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""
+some code to profile building the coarse land layers of a RasterMap
+
+compares the vectorized builder to the original loop over the coarse cells
+for 1M, 16M and 64M pixel rasters
+"""
+
+import time
+
+import numpy as np
+
+from gnome.map import RasterMap, coarsen_bitmap
+from gnome.utilities.projections import NoProjection
+
+
+def loop_coarsen_bitmap(bitmap, ratio):
+    'the original version -- one np.any() per coarse cell'
+    layer = np.zeros((-(-bitmap.shape[0] // ratio),
+                      -(-bitmap.shape[1] // ratio)), dtype=np.uint8)
+
+    for j in range(0, layer.shape[1]):
+        for i in range(0, layer.shape[0]):
+            layer[i, j] = np.any(bitmap[i * ratio:(i + 1) * ratio,
+                                        j * ratio:(j + 1) * ratio])
+
+    return layer
+
+
+def make_bitmap(num_pixels):
+    'a raster with some land on it -- a bit more than 1:1 aspect ratio'
+    w = int(np.sqrt(num_pixels * 1.3))
+    h = num_pixels // w
+
+    bitmap = np.zeros((w, h), dtype=np.uint8)
+    bitmap[w // 4:w // 2, h // 3:] = 1
+
+    return bitmap
+
+
+for num_pixels in (1024 * 1024, 4096 * 4096, 8192 * 8192):
+    bitmap = make_bitmap(num_pixels)
+
+    start = time.time()
+    rmap = RasterMap(bitmap, NoProjection())
+    vectorized = time.time() - start
+
+    start = time.time()
+    layers = [loop_coarsen_bitmap(bitmap, ratio)
+              for ratio in rmap.ratios[:-1]]
+    loop = time.time() - start
+
+    for layer, ratio in zip(layers, rmap.ratios):
+        assert np.array_equal(layer, coarsen_bitmap(bitmap, ratio))
+
+    print "%i pixels, ratios: %s" % (bitmap.size, rmap.ratios)
+    print "   RasterMap setup took %.3f seconds" % vectorized
+    print "   loop over coarse cells took %.3f seconds" % loop
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""
+some code to profile running a model with uncertainty
+
+compares moving the forecast and uncertain spill containers one after the
+other to moving them at the same time (Model.concurrent_containers)
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import gnome
+from gnome.basic_types import datetime_value_2d
+from gnome.model import Model
+from gnome.spill import point_line_release_spill
+from gnome.movers import RandomMover, WindMover, CatsMover
+from gnome.environment import Wind
+from gnome.utilities.remote_data import get_datafile
+
+cats_file = get_datafile(os.path.join(os.path.dirname(__file__), '..',
+                                      'unit_tests', 'sample_data',
+                                      'long_island_sound', 'tidesWAC.CUR'))
+
+
+def make_model(num_elements, concurrent):
+    start_time = datetime(2012, 9, 15, 12, 0)
+
+    model = Model(start_time=start_time,
+                  time_step=timedelta(minutes=15),
+                  duration=timedelta(hours=12),
+                  map=gnome.map.GnomeMap(),
+                  uncertain=True)
+    model.concurrent_containers = concurrent
+
+    model.spills += point_line_release_spill(num_elements=num_elements,
+                                             start_position=(-72.419992,
+                                                             41.202120, 0.0),
+                                             release_time=start_time)
+
+    series = np.array((start_time, (10, 45)),
+                      dtype=datetime_value_2d).reshape((1, ))
+
+    model.movers += RandomMover(diffusion_coef=100000)
+    model.movers += WindMover(Wind(timeseries=series,
+                                   units='meter per second'))
+    model.movers += CatsMover(cats_file)
+
+    return model
+
+
+for num_elements in (1000, 10000, 100000):
+    print "%i elements:" % num_elements
+
+    times = []
+    positions = []
+    for concurrent in (False, True):
+        model = make_model(num_elements, concurrent)
+
+        start = time.time()
+        model.full_run()
+        times.append(time.time() - start)
+
+        positions.append(model.spills.LE('positions', True).copy())
+
+    print ("   serial %.4f seconds, concurrent %.4f seconds, "
+           "same results: %s" % (times[0], times[1],
+                                 np.array_equal(*positions)))
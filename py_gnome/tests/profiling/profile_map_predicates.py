@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""
+some code to profile the land / water tests of a raster map on many points
+
+compares the array versions of on_land, in_water and
+allowable_spill_position to calling them one point at a time,
+as spill placement validation used to.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from gnome.map import MapFromBNA
+
+map_filename = os.path.join(os.path.dirname(__file__), '..', 'unit_tests',
+                            'sample_data', 'MapBounds_Island.bna')
+
+bna_map = MapFromBNA(map_filename, raster_cache=None)
+
+(min_lon, min_lat), (max_lon, max_lat) = (bna_map.map_bounds.min(axis=0),
+                                          bna_map.map_bounds.max(axis=0))
+
+for num_points in (1000, 10000, 100000):
+    points = np.zeros((num_points, 3), dtype=np.float64)
+    points[:, 0] = np.random.uniform(min_lon, max_lon, num_points)
+    points[:, 1] = np.random.uniform(min_lat, max_lat, num_points)
+
+    print "%i points:" % num_points
+
+    for name in ('on_land', 'in_water', 'allowable_spill_position'):
+        predicate = getattr(bna_map, name)
+
+        start = time.time()
+        result = predicate(points)
+        vectorized = time.time() - start
+
+        start = time.time()
+        one_at_a_time = [bool(predicate(point)) for point in points]
+        loop = time.time() - start
+
+        assert np.array_equal(result, one_at_a_time)
+
+        print "   %s: array %.4f seconds, one point at a time %.4f seconds" % \
+            (name, vectorized, loop)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+some code to profile writing a long run with many elements to NetCDF
+
+compares opening the file and writing every step on its own to keeping the
+file open and writing buffered steps (NetCDFOutput.buffer_steps)
+
+usage: profile_netcdf_output.py [num_steps [num_elements]]
+
+The default is 10000 steps of 100000 elements -- the files are tens of GB,
+so try it with fewer first.
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from gnome.outputters import NetCDFOutput
+
+
+class Spill(object):
+    def __init__(self, num_elements):
+        self.name = 'spill'
+        self.num_elements = num_elements
+
+
+class Container(dict):
+    'stands in for a spill container, with the standard data arrays'
+    uncertain = False
+
+    def __init__(self, num_elements):
+        super(Container, self).__init__()
+
+        self.spills = [Spill(num_elements)]
+        self.current_time_stamp = None
+        self.mass_balance = {'floating': 0.0}
+
+        self['positions'] = np.random.uniform(-1, 1, (num_elements, 3))
+        self['status_codes'] = np.ones((num_elements,), dtype=np.int16)
+        self['spill_num'] = np.zeros((num_elements,), dtype=np.int32)
+        self['id'] = np.arange(num_elements, dtype=np.uint32)
+        self['mass'] = np.ones((num_elements,))
+        self['age'] = np.zeros((num_elements,), dtype=np.int32)
+
+    def __len__(self):
+        return len(self['id'])
+
+
+class Cache(object):
+    '''
+    gives the container at the time of each step -- and stands in for the
+    SpillContainerPair in prepare_for_model_run
+    '''
+    def __init__(self, container, start_time, time_step):
+        self.container = container
+        self.start_time = start_time
+        self.time_step = time_step
+
+    def __iter__(self):
+        return iter(self.container.spills)
+
+    def items(self):
+        return [self.container]
+
+    def load_timestep(self, step_num):
+        sc = self.container
+        sc.current_time_stamp = self.start_time + step_num * self.time_step
+        sc['positions'] += 1e-4
+        sc['age'] += self.time_step.seconds
+        sc.mass_balance = {'floating': float(step_num)}
+
+        return self
+
+
+def run(num_steps, num_elements, buffer_steps, reopen):
+    start_time = datetime(2012, 9, 15, 12, 0)
+    cache = Cache(Container(num_elements), start_time, timedelta(minutes=15))
+
+    filename = os.path.join(tempfile.gettempdir(), 'profile_netcdf.nc')
+    o_put = NetCDFOutput(filename, buffer_steps=buffer_steps, cache=cache)
+
+    start = time.time()
+    o_put.prepare_for_model_run(model_start_time=start_time, spills=cache)
+
+    for step_num in range(num_steps):
+        o_put.write_output(step_num, step_num == num_steps - 1)
+
+        if reopen:
+            # like opening the file again for every step
+            o_put.close_files()
+
+    elapsed = time.time() - start
+
+    o_put.clean_output_files()
+
+    return elapsed
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    num_steps, num_elements = (args + [10000, 100000][len(args):])[:2]
+
+    print "%i steps of %i elements:" % (num_steps, num_elements)
+
+    print ("   file opened every step: %.2f seconds"
+           % run(num_steps, num_elements, 1, True))
+
+    for buffer_steps in (1, 10, 50):
+        print ("   file kept open, %i step buffer: %.2f seconds"
+               % (buffer_steps,
+                  run(num_steps, num_elements, buffer_steps, False)))
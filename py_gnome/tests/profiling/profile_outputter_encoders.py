@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+"""
+some code to profile the GeoJSON and shapefile outputters with many elements
+
+compares making a geojson Feature, or a shapefile.Writer point and record,
+for each element (the way the outputters used to) to making the output from
+the data arrays in bulk. Prints the throughput in elements per second.
+
+usage: profile_outputter_encoders.py [num_elements [num_steps]]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import shapefile as shp
+from geojson import Feature, FeatureCollection, Point, dump
+
+from gnome.outputters import TrajectoryGeoJsonOutput, ShapeOutput
+
+
+class Container(dict):
+    'stands in for a spill container, with the arrays the outputters use'
+    def __init__(self, num_elements, uncertain):
+        super(Container, self).__init__()
+
+        self.uncertain = uncertain
+        self.current_time_stamp = None
+
+        self['positions'] = np.random.uniform(-1, 1, (num_elements, 3))
+        self['status_codes'] = np.ones((num_elements,), dtype=np.int16)
+        self['spill_num'] = np.zeros((num_elements,), dtype=np.int32)
+        self['id'] = np.arange(num_elements, dtype=np.uint32)
+        self['mass'] = np.random.uniform(0, 10, num_elements)
+        self['age'] = np.zeros((num_elements,), dtype=np.int32)
+
+    def __len__(self):
+        return len(self['id'])
+
+
+class Cache(object):
+    '''
+    gives the containers at the time of each step -- and stands in for the
+    SpillContainerPair in prepare_for_model_run
+    '''
+    def __init__(self, num_elements, start_time, time_step):
+        self.containers = [Container(num_elements, False),
+                           Container(num_elements, True)]
+        self.start_time = start_time
+        self.time_step = time_step
+
+    def __iter__(self):
+        return iter([])
+
+    def items(self):
+        return self.containers
+
+    def load_timestep(self, step_num):
+        for sc in self.containers:
+            sc.current_time_stamp = (self.start_time +
+                                     step_num * self.time_step)
+            sc['positions'] += 1e-4
+            sc['age'] += self.time_step.seconds
+
+        return self
+
+
+def geojson_per_element(cache, step_num, output_dir, round_to=4):
+    'what TrajectoryGeoJsonOutput.write_output did'
+    collections = []
+    for sc in cache.load_timestep(step_num).items():
+        position = sc['positions'].round(round_to).tolist()
+        status = sc['status_codes'].tolist()
+        mass = sc['mass'].round(round_to).tolist()
+        spill_num = sc['spill_num'].tolist()
+
+        sc_type = 'uncertain' if sc.uncertain else 'forecast'
+
+        collections.append(FeatureCollection(
+            [Feature(geometry=Point(pos[:2]), id=ix,
+                     properties={'status_code': status[ix],
+                                 'sc_type': sc_type,
+                                 'mass': mass[ix],
+                                 'spill_num': spill_num[ix]})
+             for ix, pos in enumerate(position)]))
+
+    for fc in collections:
+        filename = os.path.join(output_dir,
+                                'geojson_{0:06d}.geojson'.format(step_num))
+
+        with open(filename, 'w+') as outfile:
+            dump(fc, outfile, indent=True)
+
+
+def shape_per_element(cache, num_steps, filename):
+    'what ShapeOutput.write_output did'
+    writers = []
+    for sc in cache.items():
+        w = shp.Writer(shp.POINT)
+        for name, type_, _size in ShapeOutput.fields:
+            w.field(name, type_)
+
+        writers.append(w)
+
+    for step_num in range(num_steps):
+        for w, sc in zip(writers, cache.load_timestep(step_num).items()):
+            curr_time = sc.current_time_stamp
+
+            for k, p in enumerate(sc['positions']):
+                w.point(p[0], p[1])
+                w.record(curr_time.year, curr_time.month, curr_time.day,
+                         curr_time.hour, sc['id'][k], p[2], sc['mass'][k],
+                         sc['age'][k], sc['status_codes'][k])
+
+    for w, suffix in zip(writers, ('', '_uncert')):
+        w.save(filename + suffix)
+
+
+def timed(func):
+    start = time.time()
+    func()
+
+    return time.time() - start
+
+
+def profile(num_elements, num_steps, output_dir):
+    start_time = datetime(2012, 9, 15, 12, 0)
+    time_step = timedelta(minutes=15)
+
+    # each element is output for the forecast and the uncertain container
+    total = 2 * num_elements * num_steps
+
+    def report(name, seconds):
+        print "   %-40s %10.0f elements/second" % (name, total / seconds)
+
+    cache = Cache(num_elements, start_time, time_step)
+    report('GeoJSON, a Feature per element',
+           timed(lambda: [geojson_per_element(cache, step, output_dir)
+                          for step in range(num_steps)]))
+
+    def geojson_bulk():
+        o_put = TrajectoryGeoJsonOutput(output_dir=output_dir, cache=cache)
+        o_put.prepare_for_model_run(model_start_time=start_time, spills=cache)
+
+        for step in range(num_steps):
+            o_put.write_output(step, step == num_steps - 1)
+
+    cache = Cache(num_elements, start_time, time_step)
+    report('GeoJSON, in bulk', timed(geojson_bulk))
+
+    filename = os.path.join(output_dir, 'profile_shape')
+
+    cache = Cache(num_elements, start_time, time_step)
+    report('shapefile, a point and record per element',
+           timed(lambda: shape_per_element(cache, num_steps, filename)))
+
+    def shape_bulk():
+        o_put = ShapeOutput(filename + '_bulk', cache=cache)
+        o_put.prepare_for_model_run(model_start_time=start_time, spills=cache)
+
+        for step in range(num_steps):
+            o_put.write_output(step, step == num_steps - 1)
+
+    cache = Cache(num_elements, start_time, time_step)
+    report('shapefile, in bulk', timed(shape_bulk))
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    num_elements, num_steps = (args + [50000, 10][len(args):])[:2]
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        print "%i elements, %i steps:" % (num_elements, num_steps)
+        profile(num_elements, num_steps, output_dir)
+    finally:
+        shutil.rmtree(output_dir)
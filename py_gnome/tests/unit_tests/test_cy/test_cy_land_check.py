@@ -14,7 +14,10 @@ Designed to be run with py.test
 import pytest
 
 import numpy as np
-from gnome.cy_gnome.cy_land_check import overlap_grid, find_first_pixel
+from gnome.basic_types import oil_status
+from gnome.cy_gnome.cy_land_check import (overlap_grid, find_first_pixel,
+                                          check_land_layers)
+from gnome.map import coarsen_bitmap
 
 
 class Test_overlap_grid:
@@ -269,6 +272,73 @@ def test_off_to_off(pt1, pt2):
     assert result is None
 
 
+def land_check_example(num_le=10000):
+    'a raster with some islands and random LE moves -- some off the raster'
+    raster = np.zeros((400, 300), dtype=np.uint8)
+    raster[100:140, 50:250] = 1
+    raster[300:302, :] = 1
+    raster[200:260, 200:215] = 1
+
+    np.random.seed(1)
+    positions = np.random.randint(-20, 420, (num_le, 2)).astype(np.int32)
+    end_positions = (positions +
+                     np.random.randint(-60, 60, (num_le, 2))).astype(np.int32)
+
+    # don't start on land
+    on_land = raster[np.clip(positions[:, 0], 0, 399),
+                     np.clip(positions[:, 1], 0, 299)] == 1
+    positions[on_land] = (-10, -10)
+
+    status_codes = np.zeros((num_le,), dtype=np.int16)
+    status_codes[:] = oil_status.in_water
+
+    last_water = np.zeros_like(positions)
+
+    return raster, positions, end_positions, status_codes, last_water
+
+
+@pytest.mark.parametrize('num_threads', [0, 2, 3])
+def test_check_land_layers_threads(num_threads):
+    """
+    the multi-threaded check gives the same results as the single
+    threaded one
+    """
+    (raster, positions, end_positions,
+     status_codes, last_water) = land_check_example()
+
+    ratios = np.array((16, 1), dtype=np.int32)
+    layers = [coarsen_bitmap(raster, 16), raster]
+
+    args = [a.copy() for a in (positions, end_positions,
+                               status_codes, last_water)]
+    check_land_layers(layers, ratios, *args, num_threads=1)
+
+    threaded_args = [a.copy() for a in (positions, end_positions,
+                                        status_codes, last_water)]
+    check_land_layers(layers, ratios, *threaded_args,
+                      num_threads=num_threads, chunk_size=64)
+
+    for expected, result in zip(args, threaded_args):
+        assert np.array_equal(expected, result)
+
+    # the ones that hit land end up on land, the others got moved
+    (positions, end_positions, status_codes, last_water) = args
+    hits = status_codes == oil_status.on_land
+    assert hits.any() and not hits.all()
+
+    assert np.all(raster[end_positions[hits, 0], end_positions[hits, 1]])
+    assert np.array_equal(positions[~hits], end_positions[~hits])
+
+
+def test_check_land_layers_no_les():
+    ratios = np.array((16, 1), dtype=np.int32)
+    raster = np.zeros((20, 20), dtype=np.uint8)
+    empty = np.zeros((0, 2), dtype=np.int32)
+
+    check_land_layers([coarsen_bitmap(raster, 16), raster], ratios,
+                      empty, empty.copy(), np.zeros((0,), dtype=np.int16),
+                      empty.copy())
+
 # def test_outside_raster(self):
 #         """
 #         test LEs starting form outside the raster bounds
@@ -164,6 +164,43 @@ class TestTSprop:
         assert (u.at(corners, t1, extrapolate=True) == np.array([2])).all()
         assert (u.at(corners, t5, extrapolate=True) == np.array([10])).all()
 
+    def test_at_times(self):
+        dates = np.array([dt.datetime(2000, 1, 1, 0),
+                          dt.datetime(2000, 1, 1, 2),
+                          dt.datetime(2000, 1, 1, 4)])
+        u = TimeSeriesProp(name='u', units='m/s', time=dates,
+                           data=np.array([2., 4., 8.]))
+        v = TimeSeriesProp(name='v', units='m/s', time=dates,
+                           data=np.array([1., 1., 0.]))
+
+        points = np.array(((1, 1), (2, 2), (3, 3)))
+        times = [dt.datetime(2000, 1, 1, 0),
+                 dt.datetime(2000, 1, 1, 1),
+                 dt.datetime(2000, 1, 1, 3, 30),
+                 dt.datetime(2000, 1, 1, 4)]
+
+        values = u.at_times(points, times)
+        assert values.shape == (4, 3, 1)
+        for t, value in zip(times, values):
+            assert np.allclose(value, u.at(points, t))
+
+        # unit conversion
+        assert np.allclose(u.at_times(points, times, units='km/hr'),
+                           values * 3.6)
+
+        # extrapolation
+        with pytest.raises(ValueError):
+            u.at_times(points, [dt.datetime(1999, 12, 31, 23)])
+        assert np.allclose(u.at_times(points, [dt.datetime(2000, 1, 1, 5)],
+                                      extrapolate=True), 8.)
+
+        # vector
+        vp = TSVectorProp(name='vp', units='m/s', time=dates,
+                          variables=[u, v])
+        values = vp.at_times(points, times)
+        assert values.shape == (4, 3, 2)
+        assert np.allclose(values[:, :, 1:], v.at_times(points, times))
+
 # class TestTSVectorProp:
 #
 #     def test_construction(self, u, v):
@@ -362,6 +399,47 @@ class TestGridVectorProp:
 
         assert all(np.isclose(gvp.at(points, time)[:, 1], np.cos(points[:, 0] / 2) / 2))
 
+    def test_data_vectors(self):
+        curr_file = os.path.join(s_data, '3D_circular.nc')
+        gvp = VectorVariable.from_netCDF(filename=curr_file,
+                                         varnames=['tvx', 'tvy'])
+        u = gvp.variables[0].data[:]
+        v = gvp.variables[1].data[:]
+        num_slices = u.shape[0]
+
+        vectors = gvp.get_data_vectors()
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (2, num_slices, u[0].size)
+        assert np.allclose(vectors[0], u.reshape(num_slices, -1))
+        assert np.allclose(vectors[1], v.reshape(num_slices, -1))
+
+        # one slice at a time
+        slices = list(gvp.iter_data_vectors())
+        assert len(slices) == num_slices
+        for i, vector in enumerate(slices):
+            assert np.array_equal(vector, vectors[:, i])
+
+        assert np.array_equal(gvp.get_data_vector(-1), vectors[:, -1])
+        with pytest.raises(IndexError):
+            gvp.get_data_vector(num_slices)
+
+        decimated = gvp.get_data_vectors(stride=2)
+        assert decimated.shape[1:] == (num_slices,
+                                       gvp.get_data_vector(0, stride=2)
+                                       .shape[1])
+
+        # no time slices
+        gvp.variables[0].data = u[:0]
+        gvp.variables[1].data = v[:0]
+
+        vectors = gvp.get_data_vectors()
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (2, 0, u[0].size)
+
+        # decimated
+        vector = gvp.get_data_vector(0, stride=2)
+        assert np.allclose(vector[0], u[0, ::2, ::2].ravel())
+
     def test_gen_varnames(self):
         import netCDF4 as nc4
         from gnome.environment import GridCurrent, GridWind, IceVelocity
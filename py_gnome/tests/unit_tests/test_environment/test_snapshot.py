@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+"""
+tests for the environment snapshot shared by the weatherers
+"""
+import datetime
+
+import numpy as np
+
+from gnome.environment import (constant_wind, wind_from_values, Waves,
+                               Water, EnvironmentSnapshot)
+from gnome.weatherers import Evaporation
+
+
+model_time = datetime.datetime(2014, 12, 1, 0)
+
+
+class CountingWind(object):
+    'wraps a wind, and counts the calls to at()'
+    def __init__(self, wind):
+        self.wind = wind
+        self.calls = 0
+
+    def at(self, points, time, format='r'):
+        self.calls += 1
+        return self.wind.at(points, time, format=format)
+
+
+class CountingTimesWind(CountingWind):
+    'a CountingWind that has at_times(), and counts the calls to it'
+    def __init__(self, wind):
+        super(CountingTimesWind, self).__init__(wind)
+        self.times_calls = 0
+
+    def at_times(self, points, times, format='r'):
+        self.times_calls += 1
+        return self.wind.at_times(points, times, format=format)
+
+
+def points(num=10):
+    return np.zeros((num, 3), dtype=np.float64)
+
+
+def test_wind_speed():
+    snapshot = EnvironmentSnapshot()
+    wind = CountingWind(constant_wind(10, 45, 'm/s'))
+
+    speed = snapshot.wind_speed(wind, points(), model_time)
+    assert np.allclose(speed, 10.0)
+
+    # modifying it doesn't change the snapshot
+    speed[:] = 0.0
+    assert np.allclose(snapshot.wind_speed(wind, points(), model_time), 10.0)
+    assert wind.calls == 1
+
+    # other times and positions are computed
+    snapshot.wind_speed(wind, points(), model_time + datetime.timedelta(0, 900))
+    snapshot.wind_speed(wind, points(5), model_time)
+    assert wind.calls == 3
+
+    snapshot.clear()
+    snapshot.wind_speed(wind, points(), model_time)
+    assert wind.calls == 4
+
+
+def test_waves_and_water():
+    water = Water()
+    waves = Waves(constant_wind(10, 45, 'm/s'), water)
+    snapshot = EnvironmentSnapshot()
+
+    values = snapshot.waves(waves, points(), model_time)
+    expected = waves.get_value(points(), model_time)
+    for v, e in zip(values, expected):
+        assert np.allclose(v, e)
+
+    assert snapshot.water(water, 'temperature', 'K') == water.get('temperature',
+                                                                  'K')
+    assert snapshot.water(water, 'density') == water.get('density')
+
+    snapshot.waves(waves, points(), model_time)
+    snapshot.water(water, 'density')
+    assert snapshot.cache_info == {'hits': 2, 'misses': 3, 'values': 3}
+
+
+def test_weatherer():
+    wind = CountingWind(constant_wind(10, 45, 'm/s'))
+    evap = Evaporation(Water(), wind)
+
+    evap.get_wind_speed(points(), model_time)
+    evap.get_wind_speed(points(), model_time)
+    assert wind.calls == 2
+
+    evap.env_snapshot = EnvironmentSnapshot()
+    evap.get_wind_speed(points(), model_time)
+    evap.get_wind_speed(points(), model_time)
+    assert wind.calls == 3
+
+
+def test_wind_speed_substeps():
+    '''
+    the wind speed at all the substep times is found with one at_times()
+    call
+    '''
+    wind = CountingTimesWind(wind_from_values([(model_time, 5, 45),
+                                               (model_time +
+                                                datetime.timedelta(hours=1),
+                                                10, 45)]))
+    times = [model_time + datetime.timedelta(minutes=m)
+             for m in range(0, 60, 10)]
+
+    snapshot = EnvironmentSnapshot()
+    snapshot.set_times(times)
+
+    for t in times:
+        assert np.allclose(snapshot.wind_speed(wind, points(), t),
+                           wind.wind.at(points(), t, format='r'))
+
+    assert wind.times_calls == 1
+    assert wind.calls == 0
+
+    # another time is computed on its own
+    snapshot.wind_speed(wind, points(),
+                        model_time + datetime.timedelta(minutes=5))
+    assert wind.times_calls == 1
+    assert wind.calls == 1
+
+    # the times are dropped every step
+    snapshot.clear()
+    snapshot.wind_speed(wind, points(), model_time)
+    assert wind.times_calls == 1
+    assert wind.calls == 2
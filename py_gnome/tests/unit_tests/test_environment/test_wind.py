@@ -166,6 +166,21 @@ def test_at(_format, wind_circ):
                 assert np.isclose(val1[0], d_val0)
 
 
+@pytest.mark.parametrize("_format", ['r-theta','uv', 'r','theta','u','v'])
+def test_at_times(_format, wind_circ):
+    'at_times(...) is at(...) for each time'
+    wind = wind_circ['wind']
+    points = np.array([[0, 0], [1, 1], [2, 2]])
+    times = [rec['time'] for rec in wind_circ['rq']]
+
+    values = wind.at_times(points, times, format=_format)
+
+    assert values.shape == ((len(times),) +
+                            wind.at(points, times[0], format=_format).shape)
+    for t, value in zip(times, values):
+        assert np.allclose(value, wind.at(points, t, format=_format))
+
+
 @pytest.fixture(scope='module')
 def wind_rand(rq_rand):
     """
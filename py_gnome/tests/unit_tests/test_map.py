@@ -8,6 +8,7 @@ Designed to be run with py.test
 """
 from __future__ import division
 import os
+import shutil
 
 import numpy as np
 import pytest
@@ -15,6 +16,9 @@ import pytest
 import gnome.map
 from gnome.basic_types import oil_status, status_code_type
 from gnome.utilities.projections import NoProjection
+from gnome.utilities.raster_cache import (RasterCache,
+                                          default_cache as
+                                          default_raster_cache)
 
 from gnome.map import GnomeMap, MapFromBNA, RasterMap  # , MapFromUGrid
 
@@ -302,6 +306,17 @@ class Test_RasterMap:
         assert rmap._off_bitmap((-1000, -2000))
         assert rmap._off_bitmap((1000, 2000))
 
+    def test_land_check_threads(self):
+        'land hits are checked in the calling thread unless asked for more'
+        rmap = RasterMap(bitmap_array=self.raster,
+                         projection=NoProjection())
+        assert rmap.land_check_threads == 1
+
+        rmap = RasterMap(bitmap_array=self.raster,
+                         projection=NoProjection(),
+                         land_check_threads=4)
+        assert rmap.land_check_threads == 4
+
     def test_save_as_image(self, dump):
         """
         only tests that it doesn't crash -- you need to look at the
@@ -376,6 +391,86 @@ class Test_RasterMap:
         # outside polygon, off land:
         assert not gmap.allowable_spill_position((3.0, 3.0, 0.))
 
+    def test_array_predicates(self):
+        'the array versions match the single point versions'
+        poly = ((5, 2), (15, 2), (15, 10), (10, 10), (10, 5))
+        gmap = RasterMap(refloat_halflife=6, bitmap_array=self.raster,
+                         map_bounds=((-5, -5), (-5, 30),
+                                     (30, 30), (30, -5)),
+                         projection=NoProjection(),
+                         spillable_area=[poly])
+
+        # a grid of points, some off the bitmap and some off the map
+        x, y = np.mgrid[-8:34:1.5, -8:34:1.5]
+        points = np.c_[x.ravel(), y.ravel(), np.zeros(x.size)]
+
+        on_land = gmap.on_land(points)
+        in_water = gmap.in_water(points)
+        allowable = gmap.allowable_spill_position(points)
+
+        for arrays in (on_land, in_water, allowable):
+            assert arrays.dtype == np.bool
+            assert arrays.shape == (len(points),)
+
+        for i, point in enumerate(points):
+            assert on_land[i] == bool(gmap.on_land(point))
+            assert in_water[i] == gmap.in_water(point)
+            assert allowable[i] == gmap.allowable_spill_position(point)
+
+        assert on_land.any() and in_water.any() and allowable.any()
+        assert not (on_land & in_water).any()
+
+    def test__on_land_pixel_array(self):
+        gmap = RasterMap(bitmap_array=self.raster, projection=NoProjection())
+
+        pixels = np.array([(10, 6), (19, 11), (-1, 6), (20, 6), (6, 4)],
+                          dtype=np.int32)
+
+        assert np.array_equal(gmap._on_land_pixel_array(pixels),
+                              [True, False, False, False, True])
+
+
+@pytest.mark.parametrize(('shape', 'ratio'), [((64, 32), 16),
+                                              ((70, 45), 16),
+                                              ((100, 33), 32),
+                                              ((5, 7), 16)])
+def test_coarsen_bitmap(shape, ratio):
+    """
+    compare to the straightforward loop over the coarse cells
+    """
+    np.random.seed(1)
+    bitmap = (np.random.uniform(size=shape) > 0.995).astype(np.uint8)
+    bitmap[0, 0] = 2
+
+    layer = gnome.map.coarsen_bitmap(bitmap, ratio)
+
+    expected = np.zeros((-(-shape[0] // ratio), -(-shape[1] // ratio)),
+                        dtype=np.uint8)
+    for i in range(expected.shape[0]):
+        for j in range(expected.shape[1]):
+            expected[i, j] = np.any(bitmap[i * ratio:(i + 1) * ratio,
+                                           j * ratio:(j + 1) * ratio])
+
+    assert layer.dtype == np.uint8
+    assert layer.flags.c_contiguous
+    assert np.array_equal(layer, expected)
+
+
+def test_build_coarser_bitmaps():
+    bitmap = np.zeros((1500, 1000), dtype=np.uint8)
+    bitmap[1499, 999] = 1
+    bitmap[700:710, 10] = 1
+
+    rmap = RasterMap(bitmap_array=bitmap, projection=NoProjection())
+
+    assert list(rmap.ratios) == [32, 1]
+    assert rmap.layers[-1] is rmap.basebitmap
+    assert np.array_equal(rmap.layers[0],
+                          gnome.map.coarsen_bitmap(bitmap, 32))
+    assert rmap.layers[0].shape == (47, 32)
+    assert np.array_equal(np.nonzero(rmap.layers[0]), [[21, 22, 46],
+                                                       [0, 0, 31]])
+
 
 class TestRefloat:
 
@@ -659,6 +754,100 @@ def test_update_from_dict_MapFromBNA():
         assert u_json[key] == dict_[key]
 
 
+def test_raster_cache(tmpdir):
+    'a second map from the same file gets its raster from the cache'
+    raster_cache = RasterCache(str(tmpdir.join('rasters')))
+
+    gmap = MapFromBNA(testbnamap, raster_size=1024 * 1024,
+                      raster_cache=raster_cache)
+    assert len(tmpdir.join('rasters').listdir()) == 1
+
+    cached_map = MapFromBNA(testbnamap, raster_size=1024 * 1024,
+                            raster_cache=raster_cache)
+
+    assert isinstance(cached_map.basebitmap, np.memmap)
+    assert np.array_equal(cached_map.basebitmap, gmap.basebitmap)
+    assert len(cached_map.layers) == len(gmap.layers)
+    for layer, cached_layer in zip(gmap.layers, cached_map.layers):
+        assert np.array_equal(layer, cached_layer)
+    assert cached_map.projection == gmap.projection
+
+    # a different raster size is a different raster
+    MapFromBNA(testbnamap, raster_size=512 * 512, raster_cache=raster_cache)
+    assert len(tmpdir.join('rasters').listdir()) == 2
+
+
+def test_raster_cache_default(tmpdir, monkeypatch):
+    'the raster is only cached if GNOME_RASTER_CACHE_DIR is set'
+    monkeypatch.delenv('GNOME_RASTER_CACHE_DIR', raising=False)
+    assert default_raster_cache() is None
+
+    monkeypatch.setenv('GNOME_RASTER_CACHE_DIR', str(tmpdir.join('rasters')))
+    MapFromBNA(testbnamap, raster_size=512 * 512)
+
+    assert len(tmpdir.join('rasters').listdir()) == 1
+
+
+def test_raster_cache_checked(tmpdir):
+    '''
+    a cached raster that was changed is not used, and neither is a cache dir
+    other users can write to
+    '''
+    raster_cache = RasterCache(str(tmpdir.join('rasters')))
+
+    gmap = MapFromBNA(testbnamap, raster_size=512 * 512,
+                      raster_cache=raster_cache)
+    assert oct(os.stat(raster_cache.cache_dir).st_mode & 0777) == '0700'
+
+    (raster_dir,) = tmpdir.join('rasters').listdir()
+    layer_file = str(raster_dir.join('layer_1.npy'))
+
+    layer = np.load(layer_file)
+    layer[0, 0] ^= 1
+    np.save(layer_file, layer)
+
+    cached_map = MapFromBNA(testbnamap, raster_size=512 * 512,
+                            raster_cache=raster_cache)
+    assert not isinstance(cached_map.basebitmap, np.memmap)
+    assert np.array_equal(cached_map.basebitmap, gmap.basebitmap)
+
+    # the changed raster was replaced
+    assert len(tmpdir.join('rasters').listdir()) == 1
+    cached_map = MapFromBNA(testbnamap, raster_size=512 * 512,
+                            raster_cache=raster_cache)
+    assert isinstance(cached_map.basebitmap, np.memmap)
+    assert np.array_equal(cached_map.basebitmap, gmap.basebitmap)
+
+    raster_cache.clear()
+    os.mkdir(raster_cache.cache_dir)
+    os.chmod(raster_cache.cache_dir, 0777)
+
+    MapFromBNA(testbnamap, raster_size=512 * 512, raster_cache=raster_cache)
+    assert len(tmpdir.join('rasters').listdir()) == 0
+
+
+def test_raster_cache_changed_file(tmpdir):
+    'the cached raster of a map file that has changed is not used'
+    raster_cache = RasterCache(str(tmpdir.join('rasters')))
+    filename = str(tmpdir.join('test_map.bna'))
+    shutil.copy(testbnamap, filename)
+
+    MapFromBNA(filename, raster_size=512 * 512, raster_cache=raster_cache)
+
+    mtime = os.stat(filename).st_mtime
+    os.utime(filename, (mtime + 10, mtime + 10))
+
+    gmap = MapFromBNA(filename, raster_size=512 * 512,
+                      raster_cache=raster_cache)
+    assert not isinstance(gmap.basebitmap, np.memmap)
+    assert len(tmpdir.join('rasters').listdir()) == 1
+
+    cached_map = MapFromBNA(filename, raster_size=512 * 512,
+                            raster_cache=raster_cache)
+    assert isinstance(cached_map.basebitmap, np.memmap)
+    assert np.array_equal(cached_map.basebitmap, gmap.basebitmap)
+
+
 class Test_full_move:
     """
     A test to see if the full API is working for beaching
@@ -4,6 +4,7 @@
 test code for the model class
 '''
 import os
+import sys
 import shutil
 from datetime import datetime, timedelta
 
@@ -26,7 +27,11 @@ from gnome.spill import (Spill,
                          Release)
 from gnome.spill.elements import floating
 
-from gnome.movers import SimpleMover, RandomMover, WindMover, CatsMover
+from gnome.movers import (SimpleMover,
+                          RandomMover,
+                          WindMover,
+                          CatsMover,
+                          PyCurrentMover)
 
 from gnome.weatherers import (HalfLifeWeatherer,
                               Evaporation,
@@ -34,9 +39,20 @@ from gnome.weatherers import (HalfLifeWeatherer,
                               Burn,
                               Skimmer,
                               Emulsification)
-from gnome.outputters import Renderer, TrajectoryGeoJsonOutput
+from gnome.outputters import (Renderer,
+                               TrajectoryGeoJsonOutput,
+                               NetCDFOutput,
+                               KMZOutput)
+from gnome.outputters.animated_gif import Animation
+from gnome.exceptions import GnomeRuntimeError
+from gnome.utilities.cache import MemmapElementCache
 
-from conftest import sample_model_weathering, testdata, test_oil
+from conftest import (sample_model, sample_model_weathering,
+                      testdata, test_oil)
+
+sys.path.append(os.path.join(os.path.dirname(__file__),
+                             'test_environment', 'sample_data'))
+from gen_analytical_datasets import gen_sinusoid
 
 
 @pytest.fixture(scope='function')
@@ -538,6 +554,107 @@ def test_all_movers(start_time, release_delay, duration):
     assert num_steps_output == calculated_steps
 
 
+def _uncertain_run(concurrent):
+    '''
+    run a model with uncertainty, a map that refloats the elements and
+    movers that draw random numbers, and return the final positions
+    '''
+    start_time = datetime(2012, 9, 15, 12, 0)
+
+    gmap = gnome.map.MapFromBNA(testdata['MapFromBNA']['testmap'],
+                                refloat_halflife=1)  # hours
+
+    model = Model(start_time=start_time,
+                  time_step=timedelta(minutes=15),
+                  duration=timedelta(hours=3),
+                  map=gmap, uncertain=True)
+    model.concurrent_containers = concurrent
+
+    model.spills += point_line_release_spill(num_elements=100,
+                                             start_position=(-127.1, 47.93,
+                                                             0.0),
+                                             end_position=(-126.5, 48.1, 0.0),
+                                             release_time=start_time)
+
+    series = np.array((start_time, (10, 45)),
+                      dtype=datetime_value_2d).reshape((1, ))
+
+    model.movers += SimpleMover(velocity=(1., -1., 0.))
+    model.movers += RandomMover(diffusion_coef=100000)
+    model.movers += WindMover(Wind(timeseries=series,
+                                   units='meter per second'))
+
+    model.full_run()
+
+    return [(model.spills.LE('positions', uncertain).copy(),
+             model.spills.LE('status_codes', uncertain).copy())
+            for uncertain in (False, True)]
+
+
+def test_concurrent_containers():
+    '''
+    moving the forecast and uncertain containers at the same time gives the
+    same results as moving them one after the other
+    '''
+    serial = _uncertain_run(False)
+    concurrent = _uncertain_run(True)
+
+    for (s_pos, s_status), (c_pos, c_status) in zip(serial, concurrent):
+        assert np.array_equal(s_pos, c_pos)
+        assert np.array_equal(s_status, c_status)
+
+    # and the uncertain elements did go somewhere else
+    assert not np.array_equal(serial[0][0], serial[1][0])
+
+
+def _gridded_current_run(concurrent, filename):
+    '''
+    run a model with uncertainty and a gridded current, and return the
+    final positions and current cell hints
+    '''
+    start_time = datetime(2012, 9, 15, 12, 0)
+
+    model = Model(start_time=start_time,
+                  time_step=timedelta(minutes=15),
+                  duration=timedelta(hours=3),
+                  uncertain=True)
+    model.concurrent_containers = concurrent
+
+    model.spills += point_line_release_spill(num_elements=100,
+                                             start_position=(1.0, 0.5, 0.0),
+                                             end_position=(2.0, 0.9, 0.0),
+                                             release_time=start_time)
+
+    model.movers += PyCurrentMover(filename=filename)
+    model.movers += RandomMover(diffusion_coef=100000)
+
+    model.full_run()
+
+    return [(model.spills.LE('positions', uncertain).copy(),
+             model.spills.LE('current_cell_hint', uncertain).copy())
+            for uncertain in (False, True)]
+
+
+def test_concurrent_containers_gridded_current(tmpdir):
+    '''
+    the forecast and uncertain containers are located on the same grid
+    with their own cell hints when they are moved at the same time
+    '''
+    filename = os.path.join(tmpdir.strpath, 'staggered_sine_channel.nc')
+    gen_sinusoid(filename)
+
+    serial = _gridded_current_run(False, filename)
+    concurrent = _gridded_current_run(True, filename)
+
+    for (s_pos, s_hints), (c_pos, c_hints) in zip(serial, concurrent):
+        assert np.array_equal(s_pos, c_pos)
+        assert np.array_equal(s_hints, c_hints)
+
+    # the elements were found on the grid
+    assert np.all(serial[0][1] >= 0)
+    assert not np.array_equal(serial[0][0], serial[1][0])
+
+
 # 0 is infinite persistence
 
 @pytest.mark.parametrize('wind_persist', [-1, 900, 5])
@@ -743,6 +860,162 @@ def test_full_run(model, dump, traj_only):
     assert num_images == model.num_time_steps + 2
 
 
+def _cache_run(model):
+    '''
+    run the model, and check that the cache has the data of every step.
+    Returns the data arrays of each step, as they were in the model.
+    '''
+    model.spills += point_line_release_spill(
+        20,
+        start_position=(-127.1, 47.93, 0),
+        release_time=model.start_time,
+        end_release_time=model.start_time + model.duration,
+        end_position=(-126.5, 48.1, 0))
+    model.cache_enabled = True
+    model.rewind()
+
+    steps = []
+    for step in model:
+        steps.append([dict([(name, sc[name].copy())
+                            for name in ('positions', 'mass', 'id')])
+                      for sc in model.spills.items()])
+
+    # the recent step is kept in memory -- make sure the rest are read from
+    # disk
+    model._cache.recent = {}
+
+    for step_num, step in enumerate(steps):
+        cached = model._cache.load_timestep(step_num).items()
+
+        assert len(cached) == len(step)
+        for sc, arrays in zip(cached, step):
+            for name, array in arrays.iteritems():
+                assert np.array_equal(sc[name], array)
+
+    return steps
+
+
+def test_cache_background_write(sample_model_fcn):
+    'the cache is written while the model steps, and has the same data'
+    assert Model(cache_background_write=True).cache_background_write
+
+    model = sample_model_fcn['model']
+    assert not model.cache_background_write
+
+    model.cache_background_write = True
+    assert model._cache.background_write
+
+    steps = _cache_run(model)
+    assert len(steps) == model.num_time_steps
+
+    # the writer thread ran
+    assert model._cache._writer is not None
+
+
+def test_memmap_cache(sample_model_fcn, tmpdir):
+    '''
+    the steps are cached in memory mapped files, and the output is written
+    from them after the run
+    '''
+    assert Model(memmap_cache=True).memmap_cache
+
+    model = sample_model_fcn['model']
+    assert not model.memmap_cache
+
+    o_put = NetCDFOutput(tmpdir.join('memmap.nc').strpath)
+    model.outputters += o_put
+
+    model.memmap_cache = True
+    assert isinstance(model._cache, MemmapElementCache)
+    assert o_put.cache is model._cache
+
+    _cache_run(model)
+
+    results = model.write_output_post_run(
+        [KMZOutput(tmpdir.join('memmap').strpath)])
+
+    assert len(results) == model.num_time_steps
+    assert os.path.exists(tmpdir.join('memmap.kmz').strpath)
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_write_output_post_run(model, tmpdir, num_workers):
+    '''
+    the output is written from the cache after the run, and each step is
+    read from the cache once for all the outputters
+    '''
+    with raises(GnomeRuntimeError):
+        model.write_output_post_run()
+
+    model.full_run()
+
+    outputters = [NetCDFOutput(tmpdir.join('post_run.nc').strpath),
+                  KMZOutput(tmpdir.join('post_run').strpath),
+                  TrajectoryGeoJsonOutput(output_dir=tmpdir.mkdir('geojson')
+                                          .strpath)]
+
+    loaded = []
+    steps = []
+    load_timestep = model._cache.load_timestep
+
+    def counted_load(step_num):
+        loaded.append(step_num)
+        steps.append(load_timestep(step_num))
+        return steps[-1]
+
+    model._cache.load_timestep = counted_load
+
+    results = model.write_output_post_run(outputters,
+                                          num_workers=num_workers)
+
+    assert loaded == range(model.num_time_steps)
+
+    # the outputters share the steps, so they can't change them
+    for scp in steps:
+        for sc in scp.items():
+            assert not sc['positions'].flags.writeable
+
+    assert len(results) == model.num_time_steps
+    for step_num, output_info in enumerate(results):
+        assert output_info['step_num'] == step_num
+        assert 'NetCDFOutput' in output_info
+        assert 'TrajectoryGeoJsonOutput' in output_info
+
+    assert os.path.exists(outputters[0].netcdf_filename)
+    assert os.path.exists(outputters[1].filename)
+    assert (len(os.listdir(outputters[2].output_dir)) ==
+            model.num_time_steps)
+
+    # the outputters are left with the model's cache
+    for outputter in outputters:
+        assert outputter.cache is model._cache
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_write_output_post_run_animation(model, tmpdir, num_workers):
+    'the images are drawn after the run, and the animations finished'
+    model.full_run()
+
+    renderer = Renderer(output_dir=tmpdir.mkdir('renderer').strpath,
+                        image_size=(400, 300),
+                        formats=['png', 'gif'])
+    animation = Animation(output_dir=tmpdir.mkdir('animation').strpath,
+                          image_size=(400, 300),
+                          filename=tmpdir.join('post_run.gif').strpath)
+
+    results = model.write_output_post_run([renderer, animation],
+                                          num_workers=num_workers)
+
+    assert len(results) == model.num_time_steps
+    for output_info in results:
+        assert os.path.exists(output_info['Renderer']['image_filename'])
+
+    # finish_output() closed both animations -- a gif ends with a ';'
+    for filename in (renderer.anim_filename, animation.anim_filename):
+        with open(filename, 'rb') as gif:
+            assert gif.read()[-1] == ';'
+
+
 ''' Test Callbacks on OrderedCollections '''
 
 
@@ -1072,6 +1345,46 @@ def test_staggered_spills_weathering(sample_model_fcn, delay):
     assert np.isclose(exp_total_mass, sc.mass_balance['amount_released'])
 
 
+def _weathering_run(fuse_weathering):
+    '''
+    run a model with weatherers that change the fate of the elements, and
+    return the mass balance and the data arrays
+    '''
+    model = sample_model_weathering(sample_model(), test_oil)
+    model.fuse_weathering = fuse_weathering
+    model.map = gnome.map.GnomeMap()
+    model.weathering_substeps = 2
+
+    spill = model.spills[0]
+    model.weatherers += [Evaporation(),
+                         chemical_disperson_obj(spill, 1),
+                         burn_obj(spill),
+                         make_skimmer(spill)]
+    model.set_make_default_refs(True)
+
+    model.full_run()
+
+    sc = model.spills.items()[0]
+
+    return (dict(sc.mass_balance),
+            dict([(name, sc[name].copy()) for name in sc.data_arrays]))
+
+
+def test_fused_weathering():
+    '''
+    writing back the weathered data once, after the last weatherer, gives
+    the same results as writing it back after each one
+    '''
+    mb, arrays = _weathering_run(False)
+    f_mb, f_arrays = _weathering_run(True)
+
+    assert mb == f_mb
+
+    assert set(arrays) == set(f_arrays)
+    for name in arrays:
+        assert np.array_equal(arrays[name], f_arrays[name])
+
+
 @pytest.mark.parametrize(("s0", "s1"),
                          [(test_oil, test_oil),
                           (test_oil, "ARABIAN MEDIUM, EXXON")
@@ -353,6 +353,35 @@ def test_full_run():
         model_broadcaster.stop()
 
 
+@pytest.mark.timeout(30)
+@pytest.mark.parametrize('shared_memory_size', [0, 16 * 2 ** 20])
+def test_spill_property(shared_memory_size):
+    '''
+    the LE arrays are the same whether they are passed in shared memory or
+    pickled
+    '''
+    model = make_model()
+
+    model_broadcaster = ModelBroadcaster(model,
+                                         ('down', 'normal', 'up'),
+                                         ('down', 'normal', 'up'),
+                                         shared_memory_size=shared_memory_size)
+
+    try:
+        model_broadcaster.cmd('step', {})
+        model_broadcaster.cmd('step', {})
+
+        res = model_broadcaster.cmd('get_spill_property',
+                                    {'prop_name': 'positions'})
+
+        assert len(res) == 9
+        for r in res:
+            assert r.shape == (1000, 3)
+            assert np.all(r[:, :2] != 0.0)
+    finally:
+        model_broadcaster.stop()
+
+
 @pytest.mark.timeout(30)
 def test_cache_dirs():
     model = make_model()
@@ -8,6 +8,8 @@ from datetime import timedelta
 import numpy as np
 import pytest
 
+from geojson import Feature, FeatureCollection, Point, dumps
+
 from gnome.outputters import TrajectoryGeoJsonOutput
 from gnome.spill import SpatialRelease, Spill, point_line_release_spill
 from gnome.basic_types import oil_status
@@ -139,3 +141,44 @@ def test_geojson_multipoint_output(model):
                         atol=10 ** -round_to)
 
     model.outputters[-1].output_dir = odir
+
+
+def _features(model, uncertain, round_to):
+    '''
+    the FeatureCollection of the elements, made with a Feature for each
+    one, like TrajectoryGeoJsonOutput did before it made them in bulk
+    '''
+    sc_type = 'uncertain' if uncertain else 'forecast'
+
+    positions = model.spills.LE('positions', uncertain).round(round_to)
+    status = model.spills.LE('status_codes', uncertain).tolist()
+    mass = model.spills.LE('mass', uncertain).round(round_to).tolist()
+    spill_num = model.spills.LE('spill_num', uncertain).tolist()
+
+    return FeatureCollection([Feature(geometry=Point(pos[:2]), id=ix,
+                                      properties={'status_code': status[ix],
+                                                  'sc_type': sc_type,
+                                                  'mass': mass[ix],
+                                                  'spill_num': spill_num[ix]})
+                              for ix, pos in enumerate(positions.tolist())])
+
+
+def test_same_as_features(model):
+    '''
+    the output, and the files, are the same as when a Feature was made for
+    each element
+    '''
+    o_geojson = model.outputters[-1]
+    model.rewind()
+
+    for step in model:
+        output = step['TrajectoryGeoJsonOutput']
+
+        for uncertain, key in ((False, 'certain'), (True, 'uncertain')):
+            ref = _features(model, uncertain, o_geojson.round_to)
+
+            assert dumps(output[key], indent=True) == dumps(ref, indent=True)
+
+        # the uncertain features are written last
+        with open(output['output_filename']) as f:
+            assert f.read() == dumps(ref, indent=True)
@@ -3,6 +3,7 @@ tests for kmz outputter
 '''
 
 import os
+import zipfile
 from glob import glob
 from datetime import datetime, timedelta
 
@@ -132,6 +133,41 @@ def test_timesteps(model):
     model.full_run()
 
 
+def test_kmz_contents(model, output_filename):
+    'the kml is streamed into the kmz file, which has the images as well'
+    kmz = KMZOutput(output_filename)
+    model.outputters += kmz
+
+    model.full_run()
+
+    # nothing is left open once the run is done
+    assert kmz._kmz is None
+
+    with zipfile.ZipFile(kmz.filename) as kmzfile:
+        assert kmzfile.testzip() is None
+        assert sorted(kmzfile.namelist()) == sorted(['dot.png', 'x.png',
+                                                     kmz.kml_name])
+        kml = kmzfile.read(kmz.kml_name).decode('utf8')
+
+    assert kml.startswith('<?xml')
+    assert kml.endswith(kmz_templates.footer)
+
+    # two elements, certain and uncertain, for each step
+    assert kml.count('<Point>') == 2 * 2 * model.num_time_steps
+
+
+def test_rewind_partial_run(model, output_filename):
+    'a run that is rewound before the last step does not leave a kmz file'
+    kmz = KMZOutput(output_filename)
+    model.outputters += kmz
+
+    model.step()
+    assert os.path.exists(kmz.filename)
+
+    model.rewind()
+    assert not os.path.exists(kmz.filename)
+
+
 
 ## test the kml templates
 def test_element_template():
@@ -163,6 +199,17 @@ def test_on_timestep_kml():
     assert True
 
 
+@pytest.mark.parametrize('num', [0, 1, 5])
+def test_points_kml(num):
+    'the points are the same as point_template makes for each one'
+    positions = np.random.uniform(-180, 180, (num, 3))
+
+    expected = "".join([kmz_templates.point_template.format(*p[:2])
+                        for p in positions])
+
+    assert kmz_templates.points_kml(positions) == expected
+
+
 
 
 
@@ -489,6 +489,80 @@ def test_read_all_arrays(model):
         uncertain = True
 
 
+@pytest.mark.slow
+@pytest.mark.parametrize("buffer_steps", [1, 2, 100])
+def test_buffered_output(model, buffer_steps):
+    """
+    the buffered steps are all written, in the same place as when every step
+    is written, and the files are closed after the last step
+    """
+    model.rewind()
+
+    o_put = [model.outputters[outputter.id]
+             for outputter in model.outputters
+             if isinstance(outputter, NetCDFOutput)][0]
+
+    o_put.which_data = 'all'
+    o_put.buffer_steps = buffer_steps
+
+    _run_model(model)
+
+    assert o_put._buffers == {}
+
+    atol = 1e-5
+    rtol = 0
+
+    uncertain = False
+    for file_ in (o_put.netcdf_filename, o_put._u_netcdf_filename):
+        for step in range(model.num_time_steps):
+            scp = model._cache.load_timestep(step)
+
+            (nc_data, mb) = NetCDFOutput.read_data(file_, index=step,
+                                                   which_data='all')
+
+            assert (scp.LE('current_time_stamp', uncertain) ==
+                    nc_data['current_time_stamp'].item())
+            assert scp.LE('mass_balance', uncertain) == mb
+
+            assert np.allclose(scp.LE('positions', uncertain),
+                               nc_data['positions'], rtol, atol)
+            assert np.all(scp.LE('id', uncertain) == nc_data['id'])
+            assert np.all(scp.LE('mass', uncertain) == nc_data['mass'])
+
+        with pytest.raises(IndexError):
+            NetCDFOutput.read_data(file_, index=model.num_time_steps)
+
+        uncertain = True
+
+
+def test_flush(model):
+    """
+    the buffered output can be read after flush() in the middle of a run,
+    and rewind() closes the files
+    """
+    model.rewind()
+
+    o_put = [model.outputters[outputter.id]
+             for outputter in model.outputters
+             if isinstance(outputter, NetCDFOutput)][0]
+
+    o_put.buffer_steps = 10
+
+    model.step()
+    model.step()
+
+    o_put.flush()
+
+    with nc.Dataset(o_put.netcdf_filename) as data:
+        assert len(data.variables['time']) == 2
+        assert (data.variables['particle_count'][:].sum() ==
+                len(data.variables['id']))
+
+    model.rewind()
+
+    assert o_put._buffers == {}
+
+
 @pytest.mark.slow
 @pytest.mark.parametrize("output_ts_factor", [1, 2])
 def test_write_output_post_run(model, output_ts_factor):
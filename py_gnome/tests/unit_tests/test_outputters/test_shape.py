@@ -3,8 +3,13 @@ tests for kmz outputter
 '''
 
 import os
+import filecmp
+import zipfile
 from datetime import datetime, timedelta
 
+import numpy as np
+import shapefile
+
 import pytest
 from pytest import raises
 
@@ -130,3 +135,68 @@ def test_timesteps(model):
 
 
 
+
+
+def test_same_as_pyshp(output_dir):
+    '''
+    the records made from the data arrays at once are written the same as
+    the ones made for each element with shapefile.Writer.record()
+    '''
+    ref = shapefile.Writer(shapefile.POINT)
+    w = shapefile.Writer(shapefile.POINT)
+
+    for name, type_, size in ShapeOutput.fields:
+        ref.field(name, type_, size)
+        w.field(name, type_, size)
+
+    np.random.seed(1)
+    for step, num in enumerate((100, 0, 25)):
+        time = datetime(2012, 9, 15, 12) + timedelta(hours=step)
+
+        positions = np.random.uniform(-180, 180, (num, 3))
+        ids = np.arange(num, dtype=np.uint32)
+        mass = np.random.uniform(0, 1000, num)
+        age = np.arange(num, dtype=np.int32) * 900
+        status = np.ones((num,), dtype=np.int16)
+
+        for k, p in enumerate(positions):
+            ref.point(p[0], p[1])
+            ref.record(time.year, time.month, time.day, time.hour,
+                       ids[k], p[2], mass[k], age[k], status[k])
+
+            w.point(p[0], p[1])
+
+        w.records.extend(ShapeOutput._records(num,
+                                              (time.year, time.month,
+                                               time.day, time.hour,
+                                               ids, positions[:, 2], mass,
+                                               age, status)))
+
+    ref.save(os.path.join(output_dir, 'ref'))
+    w.save(os.path.join(output_dir, 'bulk'))
+
+    for suf in ('shp', 'shx', 'dbf'):
+        assert filecmp.cmp(os.path.join(output_dir, 'ref.' + suf),
+                           os.path.join(output_dir, 'bulk.' + suf),
+                           shallow=False)
+
+
+def test_uncertain_file(model):
+    '''
+    the forecast and uncertain elements are written to their own files
+    '''
+    filename = os.path.join(local_dirname(), "uncertain_file")
+
+    model.outputters += ShapeOutput(filename)
+    model.full_run()
+
+    for fn, uncertain in ((filename, False), (filename + '_uncert', True)):
+        with zipfile.ZipFile(fn + '.zip') as zipf:
+            zipf.extractall(local_dirname())
+
+        reader = shapefile.Reader(fn)
+        points = np.array([s.points[0] for s in reader.shapes()])
+
+        # the records of the last step are at the end
+        positions = model.spills.LE('positions', uncertain)
+        assert np.array_equal(points[-len(positions):], positions[:, :2])
@@ -0,0 +1,87 @@
+'''
+tests for the spill json outputter
+'''
+import numpy as np
+import pytest
+
+from gnome.outputters import SpillJsonOutput
+from gnome.spill import point_line_release_spill
+from gnome.movers import RandomMover
+
+
+@pytest.fixture(scope='function')
+def model(sample_model):
+    model = sample_model['model']
+    model.cache_enabled = True
+    model.uncertain = True
+
+    # released over the run, so elements are added to the outputs
+    model.spills += point_line_release_spill(20,
+                                             start_position=sample_model['release_start_pos'],
+                                             release_time=model.start_time,
+                                             end_release_time=model.start_time + model.duration,
+                                             end_position=sample_model['release_end_pos'])
+    model.movers += RandomMover()
+
+    model.rewind()
+
+    return model
+
+
+@pytest.mark.parametrize('json_', ['save', 'webapi'])
+def test_serialize_deserialize(json_):
+    o_put = SpillJsonOutput(binary=True, delta=True)
+
+    dict_ = o_put.deserialize(o_put.serialize(json_))
+    o_put2 = SpillJsonOutput.new_from_dict(dict_)
+    assert o_put2.binary
+    assert o_put2.delta
+
+
+@pytest.mark.parametrize('delta', [False, True])
+def test_binary_output(model, delta):
+    '''
+    the columns of the binary output have the data of the elements, and the
+    output has the same keys as the json output
+    '''
+    model.outputters += SpillJsonOutput(binary=True, delta=delta)
+
+    last = {}
+    num_deltas = 0
+
+    for step in model:
+        output = step['SpillJsonOutput']
+
+        assert (sorted(output.keys()) ==
+                ['certain', 'step_num', 'time_stamp', 'uncertain'])
+
+        for uncertain, key in ((False, 'certain'), (True, 'uncertain')):
+            assert len(output[key]) == 1
+
+            header, columns = SpillJsonOutput.read_binary_output(
+                output[key][0], last.get(uncertain))
+            last[uncertain] = columns
+
+            num_deltas += sum([c['delta_length'] for c in header['columns']])
+
+            positions = model.spills.LE('positions', uncertain)
+
+            assert header['step_num'] == output['step_num']
+            assert header['length'] == len(positions)
+
+            assert np.array_equal(columns['longitude'],
+                                  positions[:, 0].astype(np.float32))
+            assert np.array_equal(columns['latitude'],
+                                  positions[:, 1].astype(np.float32))
+            assert np.array_equal(columns['mass'],
+                                  model.spills.LE('mass', uncertain)
+                                  .astype(np.float32))
+            assert np.array_equal(columns['status'],
+                                  model.spills.LE('status_codes', uncertain))
+            assert np.array_equal(columns['spill_num'],
+                                  model.spills.LE('spill_num', uncertain))
+
+    if delta:
+        assert num_deltas > 0
+    else:
+        assert num_deltas == 0
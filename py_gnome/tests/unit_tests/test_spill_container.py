@@ -16,7 +16,8 @@ np = numpy
 
 from gnome.basic_types import (oil_status,
                                world_point_type,
-                               id_type)
+                               id_type,
+                               fate)
 from gnome import array_types
 from gnome.spill.elements import (ElementType,
                                   InitWindages,
@@ -238,6 +239,60 @@ def test_data_access():
                           dtype=world_point_type) * 3.0)
 
 
+def test_snapshot_data_arrays():
+    """
+    snapshot shares the arrays, but is not changed by the container
+    """
+    sc = sample_sc_release()
+    pos = sc['positions'].copy()
+
+    snapshot = sc.snapshot_data_arrays()
+    assert snapshot['positions'] is sc._data_arrays['positions']
+
+    sc.get_writable('positions')[:] += (3.0, 3.0, 3.0)
+    sc.data_arrays['mass'][:] = 0.0
+
+    assert np.array_equal(snapshot['positions'], pos)
+    assert np.array_equal(sc['positions'], pos + 3.0)
+    assert np.all(snapshot['mass'] > 0)
+    assert np.all(sc['mass'] == 0)
+
+    # arrays not changed are still shared
+    assert snapshot['spill_num'] is sc._data_arrays['spill_num']
+
+
+def test_read_after_snapshot():
+    """
+    reading the arrays after a snapshot doesn't copy them -- they are handed
+    out as read-only views until they are changed
+    """
+    sc = sample_sc_release()
+    snapshot = sc.snapshot_data_arrays()
+
+    for name in snapshot:
+        array = sc[name]
+
+        assert not array.flags.writeable
+        assert numpy.may_share_memory(array, snapshot[name])
+
+    with raises(ValueError):
+        sc['positions'][:] = 0.0
+
+    # nothing was copied
+    for name in snapshot:
+        assert sc._data_arrays[name] is snapshot[name]
+
+    # only the array that is changed is copied
+    sc.get_writable('positions')[:] = 5.0
+
+    assert sc['positions'].flags.writeable
+    assert np.all(snapshot['positions'] != 5.0)
+
+    for name in snapshot:
+        if name != 'positions':
+            assert sc._data_arrays[name] is snapshot[name]
+
+
 def test_set_data_array():
     """
     add data to a data array in the spill container
@@ -831,6 +886,35 @@ def test_eq_spill_container():
     assert not (sc2 != sc1)
 
 
+def test_eq_spill_container_capacity():
+    """
+    containers with the same data are equal, even if the buffers the data
+    arrays are in have different capacities
+    """
+    (sp1, sp2) = get_eq_spills()
+    sc1 = SpillContainer()
+    sc2 = SpillContainer()
+
+    sc1.spills.add(sp1)
+    sc2.spills.add(sp2)
+
+    sc1.prepare_for_model_run(windage_at)
+    sc1.release_elements(360, sp1.release.release_time)
+
+    sc2.prepare_for_model_run(windage_at)
+    sc2.release_elements(360, sp2.release.release_time)
+
+    for name, buf in sc2._buffers.items():
+        sc2._data_arrays[name] = sc2._to_new_buffer(name, sc2[name],
+                                                    4 * len(buf))
+
+    assert len(sc2._buffers['positions']) != len(sc1._buffers['positions'])
+
+    assert sc1 == sc2
+    assert sc2 == sc1
+    assert not (sc1 != sc2)
+
+
 def test_eq_allclose_spill_container():
     """
     test if two spill containers are equal within 1e-5 tolerance
@@ -989,6 +1073,50 @@ def test_model_step_is_done():
     assert np.count_nonzero(sc['spill_num'] == 1) == num_elements - 4
 
 
+def test_release_in_place():
+    """
+    data arrays are views into buffers with spare capacity, so releasing
+    more elements doesn't reallocate them
+    """
+    release_time = datetime(2012, 1, 1, 12)
+    sc = SpillContainer()
+    sc.spills += point_line_release_spill(10, (23.0, -78.5, 0.0),
+                                          release_time,
+                                          end_release_time=release_time +
+                                          timedelta(hours=1))
+    sc.prepare_for_model_run(windage_at)
+
+    sc.release_elements(360, release_time)
+    buf = sc._buffers['positions']
+    assert sc['positions'].base is buf
+    assert len(buf) > sc.num_released
+
+    sc.release_elements(360, release_time + timedelta(seconds=360))
+    assert sc._buffers['positions'] is buf
+    assert sc['positions'].base is buf
+    assert len(sc['positions']) == sc.num_released
+    assert np.all(sc['positions'] == (23.0, -78.5, 0.0))
+    assert np.all(sc['id'] == range(sc.num_released))
+
+
+def test_model_step_is_done_snapshot():
+    """
+    removing elements doesn't change a snapshot of the data
+    """
+    sc = sample_sc_release(num_elements=10)
+    status_codes = sc['status_codes'].copy()
+
+    snapshot = sc.snapshot_data_arrays()
+    sc.get_writable('status_codes')[::2] = oil_status.to_be_removed
+
+    sc.model_step_is_done()
+
+    assert sc.num_released == 5
+    assert np.array_equal(snapshot['status_codes'], status_codes)
+    assert np.array_equal(snapshot['id'], range(10))
+    assert np.array_equal(sc['id'], range(1, 10, 2))
+
+
 def test_SpillContainer_add_array_types():
     '''
     Test an array_type is dynamically added/subtracted from SpillContainer if
@@ -1246,6 +1374,56 @@ class TestSubstanceSpillsDataStructure():
                     assert array in data
                     assert np.all(data[array] == sc[array][mask])
 
+    def test_deferred_fate_updates(self):
+        '''
+        with the updates deferred, the weathered data is written back when
+        the data arrays are accessed
+        '''
+        sc = SpillContainer()
+        rel_time = datetime(2014, 1, 1, 12, 0, 0)
+        sc.spills += [point_line_release_spill(100, (1, 1, 1), rel_time,
+                                               element_type=floating(substance=test_oil),
+                                               amount=100,
+                                               units='kg'),
+                      point_line_release_spill(10, (0, 0, 0), rel_time,
+                                               element_type=floating(substance=None))]
+
+        at = {'mass', 'fate_status'}
+        sc.prepare_for_model_run(at)
+        sc.release_elements(900, rel_time)
+        sc['fate_status'][:] = fate.surface_weather
+
+        mask = sc['substance'] == 0
+        mass = sc['mass'].copy()
+
+        sc.reset_fate_dataview()
+        sc.defer_fate_dataview_updates()
+
+        for i in range(3):
+            for substance, data in sc.itersubstancedata(at):
+                data['mass'] *= 0.5
+
+            sc.update_from_fatedataview()
+
+        # the same data is used each time, and not written back yet
+        assert len(sc._unsynced_views) == 1
+        assert np.array_equal(sc._data_arrays['mass'], mass)
+
+        # until it is accessed
+        assert np.allclose(sc['mass'][mask], mass[mask] / 8)
+        assert np.array_equal(sc['mass'][~mask], mass[~mask])
+        assert len(sc._unsynced_views) == 0
+
+        # the LEs change, so the data is written back right away
+        for substance, data in sc.itersubstancedata(at):
+            data['fate_status'][:] = fate.skim
+
+        sc.update_from_fatedataview()
+        assert len(sc._unsynced_views) == 0
+        assert np.all(sc['fate_status'][mask] == fate.skim)
+
+        sc.defer_fate_dataview_updates(False)
+
 
 def test_split_element():
     '''
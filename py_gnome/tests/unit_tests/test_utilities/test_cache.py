@@ -7,6 +7,7 @@ designed to be run with py.test
 """
 
 import os
+import weakref
 
 import numpy as np
 
@@ -141,7 +142,7 @@ def test_write_and_read_back():
 
     # change things...
 
-    sc['positions'] += 1.1
+    sc.get_writable('positions')[:] += 1.1
     pos1 = sc['positions'].copy()
 
     # change time stamp
@@ -151,7 +152,7 @@ def test_write_and_read_back():
 
     # change things...
 
-    sc['positions'] *= 1.1
+    sc.get_writable('positions')[:] *= 1.1
     pos2 = sc['positions'].copy()
 
     # change time stamp
@@ -210,15 +211,15 @@ def test_write_and_read_back_uncertain():
 
     # change things...
 
-    sc['positions'] += 1.1
-    u_sc['positions'] += 1.1
+    sc.get_writable('positions')[:] += 1.1
+    u_sc.get_writable('positions')[:] += 1.1
     pos1 = sc['positions'].copy()
     u_pos1 = u_sc['positions'].copy()
     c.save_timestep(1, scp)
 
     # change things...
 
-    sc['positions'] *= 1.1
+    sc.get_writable('positions')[:] *= 1.1
     pos2 = sc['positions'].copy()
 
     # save it:
@@ -260,7 +261,7 @@ def test_read_back_from_memory():
 
     # change things...
 
-    sc['positions'] += 1.1
+    sc.get_writable('positions')[:] += 1.1
     c.save_timestep(1, scp)
 
     # clear the cache files (private API...)
@@ -319,15 +320,15 @@ def test_rewind():
 
     # change things and save again
 
-    sc['positions'] += 1.1
-    u_sc['positions'] += 1.1
+    sc.get_writable('positions')[:] += 1.1
+    u_sc.get_writable('positions')[:] += 1.1
     pos1 = sc['positions'].copy()
     u_pos1 = u_sc['positions'].copy()
     c.save_timestep(1, scp)
 
     # change things and save again
 
-    sc['positions'] *= 1.1
+    sc.get_writable('positions')[:] *= 1.1
     pos2 = sc['positions'].copy()
 
     # save it:
@@ -359,6 +360,154 @@ def test_rewind():
     c.save_timestep(0, scp)
 
 
+def test_background_write_and_read_back():
+    """
+    write to cache with the background writer, and read back from disk
+    """
+    c = cache.ElementCache(background_write=True, max_pending=1)
+
+    sc = sample_sc_release(num_elements=10, start_pos=(3.14, 2.72, 1.2))
+    u_sc = sample_sc_release(num_elements=10, start_pos=(4.14, 3.72, 2.2),
+                             uncertain=True)
+    scp = SpillContainerPairData(sc, u_sc)
+
+    positions = []
+    for step in range(4):
+        positions.append((sc['positions'].copy(), u_sc['positions'].copy()))
+        c.save_timestep(step, scp)
+
+        sc.get_writable('positions')[:] += 1.1
+        u_sc.get_writable('positions')[:] *= 1.1
+
+    c.flush()
+    for step in range(4):
+        assert os.path.isfile(c._make_filename(step))
+        assert os.path.isfile(c._make_filename(step, True))
+
+    # all but the last come from disk
+    for step, (pos, u_pos) in enumerate(positions):
+        scp = c.load_timestep(step)
+        assert np.array_equal(scp._spill_container['positions'], pos)
+        assert np.array_equal(scp._u_spill_container['positions'], u_pos)
+
+
+def test_background_write_rewind():
+    """
+    rewind waits for the background writer before clearing the cache
+    """
+    c = cache.ElementCache(background_write=True)
+
+    sc = sample_sc_release(num_elements=10, start_pos=(3.14, 2.72, 1.2))
+    scp = SpillContainerPairData(sc)
+
+    for step in range(3):
+        c.save_timestep(step, scp)
+
+    c.rewind()
+
+    assert os.listdir(c._cache_dir) == []
+    with pytest.raises(cache.CacheError):
+        c.load_timestep(0)
+
+
+def test_background_write_error():
+    """
+    errors in the writer thread are raised by flush()
+    """
+    c = cache.ElementCache(background_write=True)
+
+    sc = sample_sc_release(num_elements=10, start_pos=(3.14, 2.72, 1.2))
+    scp = SpillContainerPairData(sc)
+
+    cache.clean_up_cache(dir_name=c._cache_dir)
+    c.save_timestep(0, scp)
+
+    with pytest.raises(cache.CacheError):
+        c.flush()
+
+    # error is reported only once
+    c.flush()
+
+
+def test_background_write_delete():
+    """
+    the background writer doesn't keep the cache alive, even with writes
+    still waiting
+    """
+    c = cache.MemmapElementCache(background_write=True)
+    cache_dir = c._cache_dir
+
+    sc = sample_sc_release(num_elements=10, start_pos=(3.14, 2.72, 1.2))
+    scp = SpillContainerPairData(sc)
+
+    for step in range(3):
+        c.save_timestep(step, scp)
+
+    ref = weakref.ref(c)
+    del c
+
+    assert ref() is None
+    assert not os.path.isdir(cache_dir)
+
+
+def test_memmap_write_and_read_back():
+    """
+    write to the memory mapped cache and read back read-only views
+    """
+    c = cache.MemmapElementCache()
+
+    sc = sample_sc_release(num_elements=10, start_pos=(3.14, 2.72, 1.2))
+    u_sc = sample_sc_release(num_elements=10, start_pos=(4.14, 3.72, 2.2),
+                             uncertain=True)
+    scp = SpillContainerPairData(sc, u_sc)
+
+    positions = []
+    for step in range(4):
+        sc.current_time_stamp = dt + tdelta * step
+        positions.append((sc['positions'].copy(), u_sc['positions'].copy()))
+        c.save_timestep(step, scp)
+
+        sc.get_writable('positions')[:] += 1.1
+        u_sc.get_writable('positions')[:] *= 1.1
+
+    assert not os.path.exists(c._make_filename(0))
+    assert os.path.isfile(c._column_filename('positions'))
+    assert os.path.isfile(c._column_filename('positions', True))
+
+    # all but the last come from the column files
+    for step, (pos, u_pos) in enumerate(positions):
+        scp = c.load_timestep(step)
+        assert np.array_equal(scp._spill_container['positions'], pos)
+        assert np.array_equal(scp._u_spill_container['positions'], u_pos)
+        assert scp._spill_container.current_time_stamp == dt + tdelta * step
+
+    scp = c.load_timestep(0)
+    assert not scp._spill_container['positions'].flags.writeable
+
+
+def test_memmap_rewind():
+    c = cache.MemmapElementCache(background_write=True)
+
+    sc = sample_sc_release(num_elements=10, start_pos=(3.14, 2.72, 1.2))
+    scp = SpillContainerPairData(sc)
+
+    for step in range(3):
+        c.save_timestep(step, scp)
+
+    c.rewind()
+
+    assert os.listdir(c._cache_dir) == []
+    with pytest.raises(cache.CacheError):
+        c.load_timestep(0)
+
+    # make sure it works again:
+    for step in range(3):
+        c.save_timestep(step, scp)
+
+    assert np.array_equal(c.load_timestep(0)._spill_container['positions'],
+                          sc['positions'])
+
+
 #    assert False
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+tests for locating elements on a grid starting from the cell hints
+"""
+import numpy as np
+import pytest
+
+from gnome.utilities.cell_hints import HintedCellTree, cell_hints
+
+
+def quad_grid(nx=10, ny=8):
+    'a slightly skewed grid of quads, and its faces'
+    x, y = np.meshgrid(np.arange(nx + 1, dtype=np.float64),
+                       np.arange(ny + 1, dtype=np.float64))
+    x += 0.2 * y
+
+    nodes = np.column_stack((x.ravel(), y.ravel()))
+
+    i, j = np.meshgrid(np.arange(nx), np.arange(ny))
+    n0 = (j * (nx + 1) + i).ravel()
+    faces = np.column_stack((n0, n0 + 1, n0 + nx + 2, n0 + nx + 1))
+
+    return nodes, faces
+
+
+class BruteForceTree(object):
+    'stands in for a CellTree -- tests every face, and counts the points'
+    def __init__(self, nodes, faces):
+        self.hinted = HintedCellTree(self, nodes, faces)
+        self.num_located = 0
+
+    def locate(self, points):
+        points = np.asarray(points).reshape(-1, 2)
+        self.num_located += len(points)
+
+        result = np.empty((len(points),), dtype=np.intp)
+        result[:] = -1
+
+        for face in range(self.hinted.num_faces):
+            inside = self.hinted.points_in_faces(
+                points, np.array([face] * len(points), dtype=np.intp))
+            result[inside & (result < 0)] = face
+
+        return result
+
+
+@pytest.fixture
+def tree():
+    return BruteForceTree(*quad_grid())
+
+
+def random_points(num, seed=1):
+    np.random.seed(seed)
+    return np.column_stack((np.random.uniform(-1, 12, num),
+                            np.random.uniform(-1, 9, num)))
+
+
+def test_neighbors(tree):
+    neighbors = tree.hinted.neighbors
+
+    # corner cell has 3 neighbors, inner cells 8
+    assert sorted(neighbors[0][neighbors[0] >= 0]) == [1, 10, 11]
+    assert (neighbors[15] >= 0).sum() == 8
+
+    # the extra row for -1
+    assert np.all(neighbors[-1] == -1)
+
+
+def test_no_hints(tree):
+    points = random_points(100)
+
+    result = tree.hinted.locate(points)
+
+    assert np.array_equal(result, tree.locate(points))
+
+
+def test_hints(tree):
+    points = random_points(500)
+    expected = tree.locate(points)
+    tree.num_located = 0
+
+    hints = np.zeros((len(points),), dtype=np.int32)
+    hints[:] = -1
+
+    with cell_hints([tree.hinted], hints):
+        # first time: all global
+        assert np.array_equal(tree.hinted.locate(points), expected)
+        assert np.array_equal(hints, expected)
+        assert tree.num_located == len(points)
+
+        # move them a bit -- found near the hints
+        moved = points + 0.6
+        expected = tree.locate(moved)
+        previous = hints.copy()
+        tree.num_located = 0
+
+        assert np.array_equal(tree.hinted.locate(moved), expected)
+        assert np.array_equal(hints, expected)
+
+        # only the ones that were, or are now, off the grid need the
+        # global search
+        assert tree.num_located == ((expected < 0) | (previous < 0)).sum()
+
+    assert tree.hinted.hints is None
+
+
+def test_hints_different_length(tree):
+    points = random_points(50)
+    hints = np.zeros((10,), dtype=np.int32)
+
+    with cell_hints([tree.hinted], hints):
+        assert np.array_equal(tree.hinted.locate(points),
+                              tree.locate(points))
+
+    assert np.all(hints == 0)
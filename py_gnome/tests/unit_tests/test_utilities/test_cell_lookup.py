@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""
+tests for locating points on a grid with the cell lookup table
+"""
+import os
+
+import numpy as np
+import pytest
+
+from gnome.utilities.cell_hints import pad_faces, points_in_faces
+from gnome.utilities.cell_lookup import CellLookupTable, grid_hash
+
+
+def curvilinear_grid(nx=20, ny=15):
+    'a curved grid of quads, and its faces'
+    i, j = np.meshgrid(np.arange(nx + 1, dtype=np.float64),
+                       np.arange(ny + 1, dtype=np.float64))
+    r = 10 + j
+    theta = i * np.pi / (2 * nx)
+
+    nodes = np.column_stack(((r * np.cos(theta)).ravel(),
+                             (r * np.sin(theta)).ravel()))
+
+    i, j = np.meshgrid(np.arange(nx), np.arange(ny))
+    n0 = (j * (nx + 1) + i).ravel()
+    faces = np.column_stack((n0, n0 + 1, n0 + nx + 2, n0 + nx + 1))
+
+    return nodes, faces
+
+
+def brute_force_locate(nodes, faces, points):
+    result = np.empty((len(points),), dtype=np.intp)
+    result[:] = -1
+
+    padded = pad_faces(faces)
+    for face in range(len(faces)):
+        inside = points_in_faces(nodes, padded, points,
+                                 np.array([face] * len(points)))
+        result[inside & (result < 0)] = face
+
+    return result
+
+
+def random_points(num, seed=1):
+    np.random.seed(seed)
+    return np.column_stack((np.random.uniform(-1, 26, num),
+                            np.random.uniform(-1, 26, num)))
+
+
+@pytest.fixture
+def grid():
+    return curvilinear_grid()
+
+
+def test_locate(grid):
+    nodes, faces = grid
+    lookup = CellLookupTable.build(nodes, faces)
+    points = random_points(2000)
+
+    expected = brute_force_locate(nodes, faces, points)
+    assert (expected >= 0).sum() > 0
+    assert np.array_equal(lookup.locate(points), expected)
+
+    # in chunks
+    lookup.chunk_size = 100
+    assert np.array_equal(lookup.locate(points), expected)
+
+    # a single point
+    assert lookup.locate(points[0]) == expected[0]
+
+
+def test_mixed_faces():
+    'triangles in a quad grid, padded with -1'
+    nodes = np.array([(0., 0.), (1., 0.), (2., 0.),
+                      (0., 1.), (1., 1.), (2., 1.)])
+    faces = np.array([(0, 1, 4, 3), (1, 2, 5, -1), (1, 5, 4, -1)])
+    lookup = CellLookupTable.build(nodes, faces, cells_per_face=4)
+
+    points = np.array([(0.5, 0.5), (1.7, 0.3), (1.3, 0.7), (3., 3.)])
+    assert np.array_equal(lookup.locate(points), [0, 1, 2, -1])
+
+
+def test_crowded_cell():
+    'one big face overlapping many small ones only costs its own cells'
+    nodes, faces = curvilinear_grid()
+    big = np.array([(-1., -1.), (26., -1.), (26., 26.), (-1., 26.)])
+    nodes = np.vstack((nodes, big))
+    n = len(nodes)
+    faces = np.vstack((faces, [(n - 4, n - 3, n - 2, n - 1)]))
+
+    lookup = CellLookupTable.build(nodes, faces)
+    num_cells = lookup.shape[0] * lookup.shape[1]
+
+    assert len(lookup.indptr) == num_cells + 1
+    assert len(lookup.indices) == lookup.indptr[-1]
+    assert len(lookup.indices) < 2 * num_cells + 4 * len(faces)
+
+    points = random_points(2000)
+    assert np.array_equal(lookup.locate(points),
+                          brute_force_locate(nodes, faces, points))
+
+
+def test_save_load(grid, tmpdir):
+    nodes, faces = grid
+    path = os.path.join(str(tmpdir), 'grid.nc.face_lookup')
+    points = random_points(500)
+
+    lookup = CellLookupTable.for_grid(nodes, faces, path)
+    assert os.path.isdir(path)
+
+    loaded = CellLookupTable.load(path, nodes, faces, grid_hash(nodes, faces))
+    assert isinstance(loaded.indices, np.memmap)
+    assert loaded.shape == lookup.shape
+    assert np.array_equal(loaded.locate(points), lookup.locate(points))
+
+    # not for another grid
+    other_nodes = nodes * 2
+    assert CellLookupTable.load(path, other_nodes, faces,
+                                grid_hash(other_nodes, faces)) is None
+
+    other = CellLookupTable.for_grid(other_nodes, faces, path)
+    assert np.array_equal(other.locate(points * 2), lookup.locate(points))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""
+tests for running the operations of a time step on the forecast and
+uncertain containers at the same time
+"""
+import copy
+import threading
+
+import numpy as np
+
+import pytest
+
+from gnome.utilities.container_pipeline import (ContainerPipeline,
+                                                no_random, all_random)
+
+
+class Container(object):
+    'stands in for a spill container'
+    def __init__(self, uncertain):
+        self.uncertain = uncertain
+        self.values = []
+
+
+def uncertain_only(sc):
+    return sc.uncertain
+
+
+def make_ops(log, lock):
+    '''
+    operations that draw from the global generator for the containers their
+    draws() say they do, and log what they ran
+    '''
+    def op(name, draws):
+        def func(sc):
+            if draws(sc):
+                sc.values.append(np.random.uniform())
+
+            with lock:
+                log.append((name, sc.uncertain))
+
+        return (func, draws)
+
+    return [op('refloat', all_random),
+            op('simple', uncertain_only),
+            op('random', all_random),
+            op('python', no_random),
+            op('beach', no_random)]
+
+
+def run(concurrent):
+    log = []
+    containers = [Container(False), Container(True)]
+
+    np.random.seed(1)
+    ContainerPipeline().run(make_ops(log, threading.Lock()), containers,
+                            concurrent=concurrent)
+
+    return log, containers
+
+
+def test_serial():
+    log, _containers = run(False)
+
+    assert log == ([(n, False) for n in ('refloat', 'simple', 'random',
+                                         'python', 'beach')] +
+                   [(n, True) for n in ('refloat', 'simple', 'random',
+                                        'python', 'beach')])
+
+
+def test_same_random_numbers():
+    _log, serial = run(False)
+
+    for i in range(20):
+        _log, concurrent = run(True)
+
+        for s, c in zip(serial, concurrent):
+            assert s.values == c.values
+
+
+def test_order():
+    '''
+    the uncertain container does an operation after the forecast one
+    '''
+    for i in range(20):
+        log, _containers = run(True)
+
+        assert len(log) == 10
+        for name in ('refloat', 'simple', 'random', 'python', 'beach'):
+            assert log.index((name, False)) < log.index((name, True))
+
+
+def test_one_container():
+    log = []
+    container = Container(False)
+
+    ContainerPipeline().run(make_ops(log, threading.Lock()), [container])
+
+    assert len(log) == 5
+
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_error(fails):
+    '''
+    errors from either container are raised, and the uncertain one stops if
+    the forecast one fails
+    '''
+    done = []
+
+    def func(sc):
+        if sc.uncertain == fails:
+            raise ValueError('failed')
+
+    ops = [(func, no_random), (done.append, no_random)]
+
+    with pytest.raises(ValueError):
+        ContainerPipeline().run(ops, [Container(False), Container(True)])
+
+    if fails:
+        # the forecast container finished
+        assert len(done) == 1
+    else:
+        assert len(done) == 0
+
+
+def test_copy():
+    pipeline = ContainerPipeline()
+    pipeline.run([(no_random, no_random)], [Container(False),
+                                             Container(True)])
+
+    assert pipeline._pool is not None
+    assert copy.deepcopy(pipeline)._pool is None
+
+    pipeline.close()
+    assert pipeline._pool is None
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+tests of the grid index for point in polygon tests
+
+Designed to be run with py.test
+"""
+
+import pytest
+
+import numpy as np
+
+from gnome.utilities.geometry.cy_point_in_polygon import points_in_poly
+from gnome.utilities.geometry.poly_index import PolygonGridIndex
+
+# a concave polygon, with diagonal edges
+poly1 = np.array(((-5, -2), (3, -1), (5, -1), (5, 4), (3, 0), (0, 0),
+                  (-2, 2), (-5, 2)), dtype=np.float64)
+
+# map bounds -- points on the edges are on the map
+rectangle = np.array(((-127.5, 47.4), (-127.5, 48.3), (-126.1, 48.3),
+                      (-126.1, 47.4)), dtype=np.float64)
+
+
+def grid_points(polygon, num=101):
+    'a grid of points over (and a bit past) the bounding box, and the vertices'
+    (x_min, y_min), (x_max, y_max) = polygon.min(axis=0), polygon.max(axis=0)
+    dx, dy = (x_max - x_min) * 0.1, (y_max - y_min) * 0.1
+
+    x, y = np.meshgrid(np.linspace(x_min - dx, x_max + dx, num),
+                       np.linspace(y_min - dy, y_max + dy, num))
+
+    points = np.zeros((x.size + len(polygon), 3), dtype=np.float64)
+    points[:x.size, 0] = x.ravel()
+    points[:x.size, 1] = y.ravel()
+    points[x.size:, :2] = polygon
+
+    return points
+
+
+@pytest.mark.parametrize('polygon', [poly1, poly1[::-1].copy(), rectangle])
+@pytest.mark.parametrize('max_cells', [1, 7, 64])
+def test_contains(polygon, max_cells):
+    'same result as the point in polygon code'
+    index = PolygonGridIndex(polygon, max_cells)
+    points = grid_points(polygon)
+
+    result = index.contains(points)
+
+    assert result.dtype == np.bool
+    assert np.array_equal(result, points_in_poly(polygon, points))
+    assert result.any() and not result.all()
+
+
+def test_cells():
+    index = PolygonGridIndex(rectangle, 16)
+
+    # a rectangle: the edges are boundary, the rest inside
+    assert np.all(index.cells[1:-1, 1:-1] == index.INSIDE)
+    assert np.all(index.cells[0, :] == index.BOUNDARY)
+    assert np.all(index.cells[:, -1] == index.BOUNDARY)
+
+
+def test_single_point():
+    index = PolygonGridIndex(poly1)
+
+    assert index.contains((-3.0, 0.0, 0.0)) is True
+    assert index.contains((10.0, 0.0, 0.0)) is False
+
+
+def test_degenerate():
+    line = np.array(((0, 0), (1, 0)), dtype=np.float64)
+    index = PolygonGridIndex(line)
+
+    points = np.array(((0.5, 0, 0), (0.5, 1, 0)), dtype=np.float64)
+    assert np.array_equal(index.contains(points),
+                          points_in_poly(line, points))
+
+
+def test_matches():
+    index = PolygonGridIndex(poly1)
+
+    assert index.matches(poly1)
+    assert not index.matches(rectangle)
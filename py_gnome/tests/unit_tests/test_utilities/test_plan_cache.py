@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+tests for the cache of interpolation plans shared by the variables on a grid
+"""
+import copy
+
+import numpy as np
+
+from gnome.utilities.plan_cache import InterpolationPlanCache
+
+
+class Counter(object):
+    'stands in for a grid method -- counts the calls'
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, points):
+        self.calls += 1
+        return (np.arange(len(points)), np.ones((len(points), 3)))
+
+
+def points(seed=1, num=20):
+    np.random.seed(seed)
+    return np.random.uniform(0, 10, (num, 2))
+
+
+def test_shared():
+    cache = InterpolationPlanCache()
+    compute = Counter()
+    pts = points()
+
+    first = cache.get('locate_faces', pts, (), {}, lambda: compute(pts))
+
+    # a different array with the same points -- e.g. the next variable
+    second = cache.get('locate_faces', pts.copy(), (), {},
+                       lambda: compute(pts))
+
+    assert compute.calls == 1
+    assert np.array_equal(first[0], second[0])
+    assert cache.cache_info == {'hits': 1, 'misses': 1, 'plans': 1}
+
+    # callers get their own copy
+    second[0][:] = -1
+    third = cache.get('locate_faces', pts, (), {}, lambda: compute(pts))
+    assert np.array_equal(third[0], first[0])
+
+
+def test_key():
+    cache = InterpolationPlanCache()
+    compute = Counter()
+    pts = points()
+
+    cache.get('locate_faces', pts, (), {}, lambda: compute(pts))
+
+    # other points, method, or args are computed
+    cache.get('locate_faces', points(seed=2), (), {}, lambda: compute(pts))
+    cache.get('interpolation_alphas', pts, (), {}, lambda: compute(pts))
+    cache.get('locate_faces', pts, ('center',), {}, lambda: compute(pts))
+    assert compute.calls == 4
+
+    # the private args are not part of the key
+    cache.get('locate_faces', pts, (), {'_memo': False, '_hash': 'abc'},
+              lambda: compute(pts))
+    assert compute.calls == 4
+
+    # nor are the contents of array args -- they come from the points
+    cache.get('interpolation_alphas', pts, (np.arange(20),), {},
+              lambda: compute(pts))
+    cache.get('interpolation_alphas', pts, (np.zeros(20),), {},
+              lambda: compute(pts))
+    assert compute.calls == 5
+
+
+def test_lru():
+    cache = InterpolationPlanCache(max_plans=2)
+    compute = Counter()
+
+    for seed in (1, 2, 1, 3, 1, 2):
+        pts = points(seed)
+        cache.get('locate_faces', pts, (), {}, lambda: compute(pts))
+
+    # 2 was dropped by 3
+    assert compute.calls == 4
+    assert len(cache) == 2
+
+
+def test_copy():
+    cache = InterpolationPlanCache(max_plans=3)
+    pts = points()
+    cache.get('locate_faces', pts, (), {}, lambda: Counter()(pts))
+
+    cache2 = copy.deepcopy(cache)
+
+    assert cache2.max_plans == 3
+    assert len(cache2) == 0
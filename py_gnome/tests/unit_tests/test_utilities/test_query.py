@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+tests for the vectorized spill data query
+"""
+import numpy as np
+import pytest
+
+from gnome.basic_types import oil_status
+from gnome.spill_container import SpillContainerData
+from gnome.utilities.query import SpillDataQuery, QueryError
+
+
+def sample_data():
+    positions = np.zeros((6, 3), dtype=np.float64)
+    positions[:, 2] = np.arange(6) * 10.0
+
+    status_codes = np.array([oil_status.in_water] * 4 +
+                            [oil_status.on_land] * 2, dtype=np.int16)
+
+    return {'positions': positions,
+            'status_codes': status_codes,
+            'age': np.arange(6) * 1000,
+            'id': np.arange(6)}
+
+
+@pytest.mark.parametrize(('conditions', 'ids'),
+                         [(None, range(6)),
+                          ('', range(6)),
+                          ('age < 2500', [0, 1, 2]),
+                          ('age >= 2000 && age != 4000', [2, 3, 5]),
+                          ('age < 1000 || age > 4000', [0, 5]),
+                          ('age < 1000 or age > 4000', [0, 5]),
+                          ('status_codes == on_land', [4, 5]),
+                          ('status_codes == oil_status.in_water', range(4)),
+                          ('positions[:, 2] > 25', [3, 4, 5]),
+                          ('positions[2] <= 10.0', [0, 1]),
+                          ('30 < positions[:,2]', [4, 5]),
+                          # || binds tighter than && for compatibility
+                          ('age > 0 && id == 1 || status_codes == 3',
+                           [1, 4, 5]),
+                          ('(age > 0 and id == 1) or status_codes == 3',
+                           [1, 4, 5]),
+                          ('1 < 2', range(6)),
+                          ])
+def test_select(conditions, ids):
+    data = sample_data()
+
+    query = SpillDataQuery(conditions)
+    result = query.select(SpillContainerData(data), ['id', 'positions'])
+
+    assert np.array_equal(result['id'], ids)
+    assert np.array_equal(result['positions'], data['positions'][ids])
+
+    # a dict of arrays works as well
+    assert np.array_equal(query.mask(data), query.mask(SpillContainerData(data)))
+
+
+@pytest.mark.parametrize('conditions',
+                         ['age <',
+                          'age 100',
+                          'age < 100 &&',
+                          '(age < 100',
+                          'age < 100)',
+                          'age ~ 100',
+                          'positions[0:2] > 1',
+                          ])
+def test_invalid(conditions):
+    with pytest.raises(QueryError):
+        SpillDataQuery(conditions)
+
+
+@pytest.mark.parametrize('conditions',
+                         ['mass > 1',
+                          'positions > 1'])
+def test_invalid_data(conditions):
+    query = SpillDataQuery(conditions)
+
+    with pytest.raises(QueryError):
+        query.mask(sample_data())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+tests for passing the arrays in results through shared memory
+"""
+import multiprocessing as mp
+from collections import OrderedDict
+
+import numpy as np
+
+from gnome.utilities.shared_ring import SharedRing, ArrayRef
+
+
+def result(num=1000):
+    'like the output of a model step'
+    return {'step_num': 3,
+            'valid': True,
+            'positions': np.random.uniform(-100, 100, (num, 3)),
+            'WeatheringOutput': OrderedDict([('time_stamp', '2012-09-15'),
+                                             ('mass', np.arange(num))]),
+            'spills': [np.ones((num,)),
+                       (np.zeros((2,)), 'name')]}
+
+
+def check_same(r1, r2):
+    assert r1['step_num'] == r2['step_num']
+    assert np.array_equal(r1['positions'], r2['positions'])
+    assert r1['positions'].dtype == r2['positions'].dtype
+
+    assert isinstance(r2['WeatheringOutput'], OrderedDict)
+    assert (r1['WeatheringOutput'].keys() ==
+            r2['WeatheringOutput'].keys())
+    assert np.array_equal(r1['WeatheringOutput']['mass'],
+                          r2['WeatheringOutput']['mass'])
+
+    assert np.array_equal(r1['spills'][0], r2['spills'][0])
+    assert r2['spills'][1][1] == 'name'
+
+
+def test_round_trip():
+    ring = SharedRing(2 ** 20)
+    res = result()
+
+    packed = ring.pack(res)
+
+    assert isinstance(packed['positions'], ArrayRef)
+    assert isinstance(packed['WeatheringOutput']['mass'], ArrayRef)
+    assert isinstance(packed['spills'][0], ArrayRef)
+
+    # small arrays are left to be pickled
+    assert isinstance(packed['spills'][1][0], np.ndarray)
+
+    # the result itself is not changed
+    assert isinstance(res['positions'], np.ndarray)
+
+    check_same(res, ring.unpack(packed))
+
+
+def test_wrap_around():
+    ring = SharedRing(100000)
+
+    for i in range(20):
+        res = result()
+        check_same(res, ring.unpack(ring.pack(res)))
+
+
+def test_too_big():
+    ring = SharedRing(30000)
+    res = result()
+
+    packed = ring.pack(res)
+
+    # positions fill most of the ring, so the rest are pickled
+    assert isinstance(packed['positions'], ArrayRef)
+    assert isinstance(packed['WeatheringOutput']['mass'], np.ndarray)
+
+    check_same(res, ring.unpack(packed))
+
+    res = result(5000)
+    assert isinstance(ring.pack(res)['positions'], np.ndarray)
+
+
+def _child(ring, conn):
+    np.random.seed(2)
+    conn.send(ring.pack(result()))
+
+
+def test_child_process():
+    ring = SharedRing(2 ** 20)
+    parent_conn, child_conn = mp.Pipe()
+
+    proc = mp.Process(target=_child, args=(ring, child_conn))
+    proc.start()
+
+    packed = parent_conn.recv()
+    proc.join()
+
+    assert isinstance(packed['positions'], ArrayRef)
+
+    np.random.seed(2)
+    check_same(result(), ring.unpack(packed))
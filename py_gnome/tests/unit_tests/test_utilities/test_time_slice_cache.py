@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""
+tests for the time slice cache of the gridded variables
+"""
+import copy
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from gnome.utilities.time_slice_cache import TimeSliceCache
+
+
+class CountingArray(object):
+    'an array that counts how many times each time slice is read'
+    def __init__(self, data):
+        self._data = data
+        self.reads = [0] * len(data)
+        self.dimensions = ('time', 'y', 'x')
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def shape(self):
+        return self._data.shape
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            self.reads[key] += 1
+
+        return self._data[key].copy()
+
+
+class SharedFile(object):
+    '''
+    stands in for a file that several variables are read from -- keeps the
+    most reads that were going on at once
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reading = 0
+        self.max_reading = 0
+
+
+class FileArray(CountingArray):
+    'an array in a SharedFile'
+    def __init__(self, data, shared_file):
+        super(FileArray, self).__init__(data)
+        self.file = shared_file
+
+    def __getitem__(self, key):
+        with self.file.lock:
+            self.file.reading += 1
+            self.file.max_reading = max(self.file.max_reading,
+                                        self.file.reading)
+        try:
+            time.sleep(0.01)
+            return super(FileArray, self).__getitem__(key)
+        finally:
+            with self.file.lock:
+                self.file.reading -= 1
+
+
+@pytest.fixture
+def data():
+    return CountingArray(np.arange(5 * 4 * 3, dtype=np.float64)
+                         .reshape(5, 4, 3))
+
+
+def test_getitem(data):
+    cache = TimeSliceCache(data, prefetch=False)
+
+    assert np.array_equal(cache[1], data._data[1])
+    assert np.array_equal(cache[1, 2], data._data[1, 2])
+    assert np.array_equal(cache[1, :, 2], data._data[1, :, 2])
+    assert np.array_equal(cache[-1], data._data[-1])
+    assert np.array_equal(cache[:], data._data)
+    assert np.array_equal(cache[1:3, 0], data._data[1:3, 0])
+
+    # only read once
+    assert data.reads == [0, 1, 0, 0, 1]
+    assert cache.cache_info['hits'] == 2
+    assert cache.cache_info['misses'] == 2
+
+    # attributes of the data
+    assert cache.shape == (5, 4, 3)
+    assert cache.dimensions == ('time', 'y', 'x')
+    assert len(cache) == 5
+
+
+def test_read_only(data):
+    cache = TimeSliceCache(data, prefetch=False)
+
+    with pytest.raises(ValueError):
+        cache[0][0, 0] = 10.0
+
+
+def test_lru(data):
+    cache = TimeSliceCache(data, max_slices=2, prefetch=False)
+
+    cache[0]
+    cache[1]
+    cache[0]
+    cache[2]  # drops 1, the least recently used
+
+    assert sorted(cache.cache_info['slices']) == [0, 2]
+
+    cache[1]
+    assert data.reads == [1, 2, 1, 0, 0]
+
+
+def test_prefetch(data):
+    cache = TimeSliceCache(data, max_slices=3)
+
+    for i in range(len(data)):
+        assert np.array_equal(cache[i], data._data[i])
+
+    # everything after the first slice was prefetched
+    info = cache.cache_info
+    assert info['misses'] == 1
+    assert info['hits'] == 4
+    assert info['prefetched'] == 4
+    assert data.reads == [1] * 5
+
+
+def test_one_prefetch_thread(data):
+    '''
+    the prefetches of all the caches are done by the same worker thread
+    '''
+    caches = [TimeSliceCache(data, max_slices=3) for i in range(4)]
+
+    for i in range(len(data)):
+        for cache in caches:
+            assert np.array_equal(cache[i], data._data[i])
+
+    workers = [t for t in threading.enumerate()
+               if t.name == 'TimeSlicePrefetcher']
+    assert len(workers) == 1
+
+
+def test_copy(data):
+    cache = TimeSliceCache(data, prefetch=False)
+    cache[0]
+
+    cache2 = copy.deepcopy(cache)
+
+    assert cache2.cache_info == {'hits': 0, 'misses': 0, 'prefetched': 0,
+                                 'slices': []}
+    assert np.array_equal(cache2[0], cache[0])
+
+
+def test_one_read_at_a_time():
+    '''
+    two caches of variables in the same file -- like the u and v of a
+    current -- never read from it at the same time, even when prefetching
+    '''
+    shared_file = SharedFile()
+    u = TimeSliceCache(FileArray(np.zeros((20, 4, 3)), shared_file),
+                       max_slices=2)
+    v = TimeSliceCache(FileArray(np.ones((20, 4, 3)), shared_file),
+                       max_slices=2)
+
+    for i in range(20):
+        assert np.all(u[i] == 0.0)
+        assert np.all(v[i] == 1.0)
+        assert np.all(v[:1] == 1.0)
+
+    assert shared_file.max_reading == 1
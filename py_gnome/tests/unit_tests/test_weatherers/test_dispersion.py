@@ -6,7 +6,10 @@ from datetime import timedelta
 import pytest
 import numpy as np
 
-from gnome.environment import constant_wind, Water, Waves
+from gnome.environment import (constant_wind,
+                               Water,
+                               Waves,
+                               EnvironmentSnapshot)
 from gnome.weatherers import (NaturalDispersion,
                               Evaporation,
                               Emulsification)
@@ -63,6 +66,45 @@ def test_dispersion(oil, temp, num_elems, on):
         assert 'sedimentation' not in sc.mass_balance
 
 
+def _dispersed(water, snapshot):
+    'mass dispersed in one step with water, and with or without a snapshot'
+    waves = Waves(wind, water)
+    disp = NaturalDispersion(waves, water)
+    if snapshot:
+        disp.env_snapshot = EnvironmentSnapshot()
+
+    # the same elements for each water
+    (sc, time_step) = weathering_data_arrays(disp.array_types,
+                                             Water(),
+                                             element_type=floating(
+                                                 substance='oil_bahia'))[:2]
+    model_time = (sc.spills[0].release_time +
+                  timedelta(seconds=time_step))
+
+    disp.prepare_for_model_run(sc)
+    disp.prepare_for_model_step(sc, time_step, model_time)
+    disp.weather_elements(sc, time_step, model_time)
+
+    return sc.mass_balance['natural_dispersion']
+
+
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_dispersion_water_units(snapshot):
+    '''
+    the Water values are SI whatever its units are, so the units don't change
+    the dispersion
+    '''
+    nonsi_water = Water()
+    nonsi_water.units = dict(nonsi_water.units,
+                             density='g/cm^3',
+                             kinematic_viscosity='cSt')
+
+    dispersed = _dispersed(Water(), snapshot)
+
+    assert dispersed > 0
+    assert np.isclose(_dispersed(nonsi_water, snapshot), dispersed)
+
+
 @pytest.mark.parametrize(('oil', 'temp', 'num_elems'),
                          [('ABU SAFAH', 288.15, 3)])
 def test_dispersion_not_active(oil, temp, num_elems):